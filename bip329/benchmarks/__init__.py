@@ -0,0 +1,3 @@
+# file: __init__.py
+from .generator import LabelCorpusGenerator  # noqa: F401
+from .run import run_benchmarks  # noqa: F401
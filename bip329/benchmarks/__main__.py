@@ -0,0 +1,5 @@
+# file: __main__.py
+import sys
+from .run import main
+
+sys.exit(main())
@@ -0,0 +1,177 @@
+# file: generator.py
+import json
+import os
+import random
+from ..constants import VALID_TYPE_KEYS
+
+# Relative frequency of each record type in a typical wallet export:
+# outputs and addresses dominate, xpubs are rare.
+TYPE_WEIGHTS = {
+    "tx": 25,
+    "addr": 25,
+    "pubkey": 5,
+    "input": 15,
+    "output": 29,
+    "xpub": 1,
+}
+
+ORIGINS = (
+    "wpkh([d34db33f/84'/0'/0'])",
+    "wpkh([d34db33f/84'/0'/1'])",
+    "tr([d34db33f/86'/0'/0'])",
+    "sh(wpkh([a1b2c3d4/49'/0'/0']))",
+)
+
+WORDS = (
+    "coffee", "salary", "exchange", "cold storage", "donation", "rent", "change",
+    "Kaffee", "Miete", "café", "épargne", "пожертвование", "寄付", "💰", "₿", "⚡ zap",
+)
+
+CURRENCIES = ("USD", "EUR", "CHF", "GBP", "JPY")
+
+# Timestamps and rates repeat heavily in real exports (one per block or
+# per day), so they are drawn from small pools.
+TIME_POOL_SIZE = 512
+RATE_POOL_SIZE = 64
+
+INVALID_KINDS = (
+    "missing_ref", "unknown_type", "bad_height", "bad_time", "bad_rate",
+    "bad_spendable", "non_string_label", "malformed_json",
+)
+
+
+def _hex(rng, length):
+    return "%0*x" % (length, rng.getrandbits(length * 4))
+
+
+def _ref(rng, entry_type):
+    if entry_type == "tx":
+        return _hex(rng, 64)
+    if entry_type in ("input", "output"):
+        return f"{_hex(rng, 64)}:{rng.randint(0, 15)}"
+    if entry_type == "addr":
+        return "bc1q" + _hex(rng, 38)
+    if entry_type == "pubkey":
+        return "02" + _hex(rng, 64)
+    return "xpub661MyMwAqRbc" + _hex(rng, 95)
+
+
+def _label(rng, long_label_ratio):
+    if rng.random() < long_label_ratio:
+        # Longer than the suggested 255 character maximum
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 120)))
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+
+
+class LabelCorpusGenerator:
+    """
+    Deterministic generator of synthetic BIP-329 label records.
+
+    The same `seed` always produces the same corpus, so benchmark numbers
+    are comparable across runs and machines.
+
+    - `invalid_ratio` is the share of rows that fail validation in some way
+      (see INVALID_KINDS).
+    - `optional_ratio` is the probability that each optional field allowed
+      for a record type is present.
+    - `long_label_ratio` is the share of labels over 255 characters.
+    """
+
+    def __init__(self, seed=329, invalid_ratio=0.0, optional_ratio=0.5, long_label_ratio=0.01):
+        if not 0.0 <= invalid_ratio <= 1.0:
+            raise ValueError("invalid_ratio must be between 0 and 1")
+        self.seed = seed
+        self.invalid_ratio = invalid_ratio
+        self.optional_ratio = optional_ratio
+        self.long_label_ratio = long_label_ratio
+
+    def _pools(self, rng):
+        times = [f"20{rng.randint(15, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                 f"T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}Z"
+                 for _ in range(TIME_POOL_SIZE)]
+        rates = [{currency: round(rng.uniform(1000, 120000), 2)
+                  for currency in rng.sample(CURRENCIES, rng.randint(1, 3))}
+                 for _ in range(RATE_POOL_SIZE)]
+        return times, rates
+
+    def _record(self, rng, times, rates):
+        entry_type = rng.choices(VALID_TYPE_KEYS, weights=[TYPE_WEIGHTS[t] for t in VALID_TYPE_KEYS])[0]
+        record = {"type": entry_type, "ref": _ref(rng, entry_type), "label": _label(rng, self.long_label_ratio)}
+        if rng.random() < self.optional_ratio:
+            record["origin"] = rng.choice(ORIGINS)
+        present = rng.random
+        if entry_type == "output" and present() < self.optional_ratio:
+            record["spendable"] = rng.random() < 0.9
+        if entry_type in ("addr", "pubkey", "input", "output") and present() < self.optional_ratio:
+            record["keypath"] = f"/{rng.randint(0, 1)}/{rng.randint(0, 5000)}"
+        if entry_type in ("tx", "input", "output"):
+            if present() < self.optional_ratio:
+                record["height"] = rng.randint(500000, 900000)
+            if present() < self.optional_ratio:
+                record["time"] = rng.choice(times)
+            if present() < self.optional_ratio:
+                record["value"] = rng.randint(-10 ** 8, 10 ** 8) if entry_type == "tx" else rng.randint(546, 10 ** 8)
+        if entry_type == "tx":
+            if present() < self.optional_ratio:
+                record["fee"] = rng.randint(100, 100000)
+            if present() < self.optional_ratio:
+                record["rate"] = dict(rng.choice(rates))
+        if entry_type in ("input", "output") and present() < self.optional_ratio:
+            record["fmv"] = dict(rng.choice(rates))
+        if entry_type == "addr" and present() < self.optional_ratio:
+            start = rng.randint(500000, 900000)
+            record["heights"] = sorted(rng.sample(range(start, start + 5000), rng.randint(1, 50)))
+        return record
+
+    def _invalidate(self, rng, record):
+        kind = rng.choice(INVALID_KINDS)
+        if kind == "missing_ref":
+            del record["ref"]
+        elif kind == "unknown_type":
+            record["type"] = "future_type"
+        elif kind == "bad_height":
+            record["height"] = "not_an_int"
+        elif kind == "bad_time":
+            record["time"] = "2025/01/23 11:40:35"
+        elif kind == "bad_rate":
+            record["rate"] = {"FOO": -1}
+        elif kind == "bad_spendable":
+            record["spendable"] = "maybe"
+        elif kind == "non_string_label":
+            record["label"] = 12345
+        return kind, record
+
+    def iter_records(self, count):
+        """
+        Yield `(kind, record)` tuples, where `kind` is None for valid
+        records and one of INVALID_KINDS otherwise.
+        """
+        rng = random.Random(self.seed)
+        times, rates = self._pools(rng)
+        for _ in range(count):
+            record = self._record(rng, times, rates)
+            if rng.random() < self.invalid_ratio:
+                yield self._invalidate(rng, record)
+            else:
+                yield None, record
+
+    def records(self, count):
+        """Yield the label dicts of a `count` row corpus, skipping malformed JSON rows"""
+        for kind, record in self.iter_records(count):
+            if kind != "malformed_json":
+                yield record
+
+    def lines(self, count):
+        """Yield `count` JSONL lines, including malformed ones"""
+        for kind, record in self.iter_records(count):
+            line = json.dumps(record)
+            if kind == "malformed_json":
+                line = line[:-1]
+            yield line + "\n"
+
+    def write_file(self, path, count):
+        """Write a JSONL corpus of `count` lines to `path` and return its size in bytes"""
+        with open(path, "w", encoding="utf-8") as file:
+            for line in self.lines(count):
+                file.write(line)
+        return os.path.getsize(path)
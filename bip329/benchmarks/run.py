@@ -0,0 +1,172 @@
+# file: run.py
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from ..bip329_parser import BIP329_Parser
+from ..bip329_writer import BIP329JSONLWriter
+from ..bip329_writer import BIP329JSONLEncryptedWriter
+from ..encryption import decrypt_files
+from .generator import LabelCorpusGenerator
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+BENCHMARK_PASSPHRASE = "bip329-benchmark"
+
+
+def bench_parser_load_entries(generator, count, workdir):
+    path = os.path.join(workdir, "parser-input.jsonl")
+    generator.write_file(path, count)
+
+    def run():
+        return len(BIP329_Parser(path).load_entries())
+    return run
+
+
+def _write_all(writer, records):
+    written = 0
+    for record in records:
+        try:
+            writer.write_label(record)
+            written += 1
+        except (ValueError, AssertionError):
+            # Invalid rows are rejected by the writer; that cost is part of the benchmark
+            pass
+    return written
+
+
+def bench_writer_write_label(generator, count, workdir):
+    path = os.path.join(workdir, "writer-output.jsonl")
+    records = list(generator.records(count))
+
+    def run():
+        writer = BIP329JSONLWriter(path, remove_existing=True)
+        return _write_all(writer, records)
+    return run
+
+
+def bench_encrypted_writer(generator, count, workdir):
+    path = os.path.join(workdir, "encrypted-output.7z")
+    records = list(generator.records(count))
+
+    def run():
+        writer = BIP329JSONLEncryptedWriter(path, BENCHMARK_PASSPHRASE, remove_existing=True)
+        written = _write_all(writer, records)
+        writer.close()
+        return written
+    return run
+
+
+def bench_decrypt_files(generator, count, workdir):
+    archive = os.path.join(workdir, "decrypt-input.7z")
+    output_dir = os.path.join(workdir, "decrypted")
+    writer = BIP329JSONLEncryptedWriter(archive, BENCHMARK_PASSPHRASE, remove_existing=True)
+    written = _write_all(writer, generator.records(count))
+    writer.close()
+
+    def run():
+        shutil.rmtree(output_dir, ignore_errors=True)
+        decrypt_files(archive, output_dir, BENCHMARK_PASSPHRASE)
+        return written
+    return run
+
+
+BENCHMARKS = {
+    "parser.load_entries": bench_parser_load_entries,
+    "writer.write_label": bench_writer_write_label,
+    "encrypted_writer.write_label+close": bench_encrypted_writer,
+    "encryption.decrypt_files": bench_decrypt_files,
+}
+
+
+def measure(run, size, memory=True):
+    """
+    Time `run()` over a corpus of `size` rows and, if `memory` is set,
+    measure its peak allocation in a second pass. tracemalloc slows down
+    allocation-heavy code considerably, so it is never active while timing.
+    """
+    start = time.perf_counter()
+    accepted = run()
+    seconds = time.perf_counter() - start
+    result = {
+        "accepted_records": accepted,
+        "seconds": round(seconds, 6),
+        "records_per_second": round(size / seconds, 1) if seconds > 0 else None,
+        "peak_memory_bytes": None,
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, names=None, seed=329, invalid_ratio=0.05, memory=True, workdir=None):
+    """
+    Run the selected benchmarks for every corpus size and return a JSON
+    serializable report.
+    """
+    names = list(names or BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark: {name}")
+    generator = LabelCorpusGenerator(seed=seed, invalid_ratio=invalid_ratio)
+    report = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "invalid_ratio": invalid_ratio,
+        "results": [],
+    }
+    # Invalid rows would otherwise flood the log and dominate the timings
+    logging.disable(logging.WARNING)
+    try:
+        for size in sizes:
+            for name in names:
+                with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+                    run = BENCHMARKS[name](generator, size, tmp)
+                    result = {"benchmark": name, "size": size}
+                    result.update(measure(run, size, memory=memory))
+                    report["results"].append(result)
+    finally:
+        logging.disable(logging.NOTSET)
+    return report
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m bip329.benchmarks",
+        description="Measure BIP-329 parser, writer and encryption throughput.")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                            help="corpus sizes in records (default: %(default)s)")
+    arg_parser.add_argument("--benchmark", action="append", choices=sorted(BENCHMARKS),
+                            help="benchmark to run, may be repeated (default: all)")
+    arg_parser.add_argument("--seed", type=int, default=329)
+    arg_parser.add_argument("--invalid-ratio", type=float, default=0.05,
+                            help="share of invalid rows in the corpus (default: %(default)s)")
+    arg_parser.add_argument("--no-memory", action="store_true",
+                            help="skip the tracemalloc peak memory pass")
+    arg_parser.add_argument("--workdir", help="directory for temporary corpus files")
+    arg_parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = arg_parser.parse_args(argv)
+
+    report = run_benchmarks(sizes=args.sizes, names=args.benchmark, seed=args.seed,
+                            invalid_ratio=args.invalid_ratio, memory=not args.no_memory,
+                            workdir=args.workdir)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+            file.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
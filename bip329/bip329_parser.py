@@ -1,52 +1,202 @@
 # file: bip329_parser.py
+import contextlib
 import json
 import logging
+import re
+from time import perf_counter_ns
 from .constants import BOOL_KEYS
+from .constants import INTEGER_FIELD_RANGES
+from .constants import CANONICAL_FIELD_ORDER
 from .constants import VALID_REQUIRED_KEYS
 from .constants import VALID_TYPE_KEYS
 from .constants import VALID_FIELDS_BY_TYPE
 from .constants import MANDATORY_KEYS_ERROR
 from .constants import OPTIONAL_FIELDS
+from .compression import open_compressed
+from .compression import resolve_compression
+from .origin import parse_origin
 from .validation_utils import validate_rate_field
 from .validation_utils import validate_fmv_field
+from .validation_utils import validate_heights_field
+from .validation_utils import validate_integer_field
 from .validation_utils import validate_iso8601_time
 from .validation_utils import validate_label_length
 
+# Values of "type"/"ref" keys in a raw line; only exact for lines without
+# escapes, where every JSON string appears verbatim between quotes
+TYPE_VALUE = re.compile(r'"type"\s*:\s*"([^"]*)"')
+REF_VALUE = re.compile(r'"ref"\s*:\s*"([^"]*)"')
+
 
 class BIP329_Parser:
-    def __init__(self, jsonl_path, allow_boolsy=False, replace_non_utf8=False):
+    def __init__(self, jsonl_path, allow_boolsy=False, replace_non_utf8=False, stats=None, compression='auto',
+                 types=None, refs=None, fields=None, verify_origin=False, line_offset=0):
+        """
+        `jsonl_path` may also be an open text file object such as `sys.stdin`.
+
+        Compressed files are decompressed while streaming: `compression` is
+        'gzip', 'xz', 'zstd' (needs the `zstandard` package), None for plain
+        text, or 'auto' (default) to detect it from the magic bytes or the
+        file extension.
+
+        Pass a `StageStats` instance as `stats` to accumulate per-stage
+        timings ('read', 'decode', 'validate') of `load_entries`.
+
+        `types` and `refs` restrict the entries returned to the given record
+        types and refs. Lines are pre-scanned for a matching "type"/"ref"
+        value before decoding, so non-matching lines skip `json.loads` and
+        validation; lines with escapes are always decoded, and every entry
+        is checked exactly after decoding. Skipped lines are counted in
+        `filtered_entries`.
+
+        `fields` projects entries onto the given field names; 'type' and
+        'ref' are always kept and still required. Other fields are dropped
+        right after decoding, before validation, so neither their
+        validation nor their memory is paid for.
+
+        `verify_origin=True` rejects entries whose `origin` is not a valid
+        abbreviated descriptor (see `bip329.origin.parse_origin`).
+
+        `line_offset` is added to the line numbers in log messages, for
+        input that is a chunk of a larger file.
+        """
         self.jsonl_path = jsonl_path
+        self.line_offset = line_offset
         self.allow_boolsy = allow_boolsy
         self.replace_non_utf8 = replace_non_utf8
+        self.stats = stats
+        if compression != 'auto':
+            resolve_compression(jsonl_path, compression)
+        self.compression = compression
         self.entries = []
+        self.lines_read = 0
+        self.malformed_lines = 0
+        self.invalid_entries = 0
+        self.skipped_entries = 0
+        self.types = None if types is None else frozenset(types)
+        self.refs = None if refs is None else frozenset(refs)
+        self.filtered_entries = 0
+        self.verify_origin = verify_origin
+        self.fields = None
+        if fields is not None:
+            unknown = set(fields).difference(CANONICAL_FIELD_ORDER)
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+            self.fields = frozenset(fields).union(VALID_REQUIRED_KEYS)
 
-    def load_entries(self):
-        self.entries = []
-        line_number = 0  # Track line numbers for error reporting
+    def _prescan(self, line):
+        """False if a line without escapes cannot hold a matching entry"""
+        if self.types is not None and not any(value in self.types for value in TYPE_VALUE.findall(line)):
+            return False
+        if self.refs is not None and not any(value in self.refs for value in REF_VALUE.findall(line)):
+            return False
+        return True
+
+    def _matches(self, entry):
+        """Exact filter check of a decoded entry; others are left to validation"""
+        if not isinstance(entry, dict):
+            return True
         try:
-            with open(self.jsonl_path, 'r') as file:
-                for line in file:
+            return ((self.types is None or entry.get('type') in self.types) and
+                    (self.refs is None or entry.get('ref') in self.refs))
+        except TypeError:
+            # Unhashable type or ref, cannot match
+            return False
+
+    @staticmethod
+    def _timed_lines(file, stats):
+        lines = iter(file)
+        while True:
+            start = perf_counter_ns()
+            line = next(lines, None)
+            elapsed = perf_counter_ns() - start
+            if line is None:
+                stats.add('read', elapsed)
+                return
+            stats.add('read', elapsed, 1, len(line.encode('utf-8', errors='surrogateescape')))
+            yield line
+
+    def _open(self):
+        if hasattr(self.jsonl_path, 'read'):
+            # Already open file object (e.g. sys.stdin), leave it open
+            return contextlib.nullcontext(self.jsonl_path)
+        compression = resolve_compression(self.jsonl_path, self.compression)
+        if compression is not None:
+            return open_compressed(self.jsonl_path, 'r', compression)
+        return open(self.jsonl_path, 'r')
+
+    def iter_entries(self):
+        """
+        Yield valid entries one at a time instead of collecting them in
+        `self.entries`, so arbitrarily large files can be streamed.
+
+        Counters of the last run are kept in `lines_read`, `malformed_lines`,
+        `invalid_entries` (failed validation), `skipped_entries`
+        (unknown record types) and `filtered_entries` (excluded by `types`
+        or `refs`).
+        """
+        self.lines_read = 0
+        self.malformed_lines = 0
+        self.invalid_entries = 0
+        self.skipped_entries = 0
+        self.filtered_entries = 0
+        filtering = self.types is not None or self.refs is not None
+        fields = self.fields
+        line_number = self.line_offset  # Track line numbers for error reporting
+        stats = self.stats
+        start = 0
+        try:
+            with self._open() as file:
+                for line in (file if stats is None else self._timed_lines(file, stats)):
                     line_number += 1
                     if not line.strip():
                         continue
+                    self.lines_read += 1
+                    if filtering and '\\' not in line and not self._prescan(line):
+                        self.filtered_entries += 1
+                        continue
+                    if stats is not None:
+                        start = perf_counter_ns()
                     try:
                         entry = json.loads(line.strip())
                     except json.JSONDecodeError as e:
                         logging.warning(f"Malformed JSON at line {line_number}: {e}")
+                        self.malformed_lines += 1
                         continue
+                    finally:
+                        if stats is not None:
+                            stats.add('decode', perf_counter_ns() - start, 1)
+                            start = perf_counter_ns()
+                    if filtering and not self._matches(entry):
+                        self.filtered_entries += 1
+                        continue
+                    if fields is not None and isinstance(entry, dict):
+                        entry = {key: value for key, value in entry.items() if key in fields}
                     try:
-                        if self.is_valid_entry(entry):
-                            self.entries.append(entry)
+                        valid = self.is_valid_entry(entry)
                     except (TypeError, ValueError) as validation_error:
                         # Log validation errors but continue processing other entries
                         logging.warning(f"Validation error at line {line_number}: {validation_error}")
+                        self.invalid_entries += 1
                         continue
+                    finally:
+                        if stats is not None:
+                            stats.add('validate', perf_counter_ns() - start, 1)
+                    if valid:
+                        yield entry
+                    else:
+                        self.skipped_entries += 1
         except json.JSONDecodeError as e:
             logging.error(f"Error parsing JSON at line {line_number}: {e}")
         except FileNotFoundError as e:
             logging.error(f"File not found: {e}")
         except Exception as e:
             logging.error(f"Error reading file: {e}")
+
+    def load_entries(self):
+        self.entries = []
+        for entry in self.iter_entries():
+            self.entries.append(entry)
         return self.entries
 
     def is_valid_entry(self, entry):
@@ -137,6 +287,11 @@ class BIP329_Parser:
                 elif not isinstance(field_value, expected_type):
                     logging.warning(f"Invalid {field_name} field type: expected {expected_type.__name__}, got {type(field_value).__name__}")
                     optional_fields_to_remove.append(field_name)
+                # Integers must also be within INTEGER_FIELD_RANGES, as in the writer
+                elif ((field_name in INTEGER_FIELD_RANGES and not validate_integer_field(field_name, field_value)) or
+                      (field_name == 'heights' and not validate_heights_field(field_value))):
+                    logging.warning(f"Invalid {field_name} field value: {field_value!r} is out of range")
+                    optional_fields_to_remove.append(field_name)
 
         # Remove invalid optional fields
         for field_name in optional_fields_to_remove:
@@ -145,8 +300,11 @@ class BIP329_Parser:
         if 'label' in entry:
             validate_label_length(entry['label'])
 
-        if 'origin' in entry and not isinstance(entry['origin'], str):
-            raise TypeError('origin must be string')
+        if 'origin' in entry:
+            if not isinstance(entry['origin'], str):
+                raise TypeError('origin must be string')
+            if self.verify_origin:
+                # Memoized, files only hold a few distinct origins
+                parse_origin(entry['origin'])
 
-        # TODO: Verify origin
         return True
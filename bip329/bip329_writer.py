@@ -1,38 +1,304 @@
 # file: bip329_writer.py
+import contextlib
+import io
 import json
+import queue
 import tempfile
+import threading
 import os
 import shutil
+import stat
 import time
 import logging
+import inspect
+import types
+from time import perf_counter_ns
 from .constants import VALID_REQUIRED_KEYS
 from .constants import VALID_TYPE_KEYS
 from .constants import MANDATORY_KEYS_ERROR
 from .constants import OPTIONAL_FIELDS
 from .constants import VALID_FIELDS_BY_TYPE
+from .constants import CANONICAL_FIELD_ORDER
+from .constants import INTEGER_FIELD_RANGES
+from .bloom import key_digest
+from .compression import open_compressed
+from .compression import resolve_compression
+from .dedupe import DEFAULT_MAX_KEYS
+from .dedupe import DIGEST_SIZE
+from .dedupe import SpillableKeySet
+from .dedupe import iter_digests_reversed
 from .encryption import encrypt_files
+from .encryption import append_streams
+from .encryption import check_passphrase
+from .encryption import encrypt_streams
+from .encryption import iter_archive_records
+from .encryption import list_members
+from .external_sort import DEFAULT_RUN_RECORDS
+from .external_sort import ExternalSorter
 from .validation_utils import validate_rate_field
 from .validation_utils import validate_fmv_field
+from .validation_utils import validate_heights_field
+from .validation_utils import validate_integer_field
 from .validation_utils import validate_iso8601_time
 from .validation_utils import validate_label_length
 from .validation_utils import validate_utf8_encoding
 
 
+FSYNC_POLICIES = (None, 'close', 'group')
+DEFAULT_FSYNC_RECORDS = 1000
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_RECORDS = 1000
+DEFAULT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+ACCESSOR_FIELDS = ("type", "ref", "label", "origin", "spendable") + tuple(OPTIONAL_FIELDS)
+
+# Record class -> (methods, instance_fields, probe_fields), see _accessor_plan
+_accessor_plans = {}
+_GENERIC_GETATTRIBUTE = (object.__getattribute__, dict.__getattribute__)
+_METHOD_TYPES = (types.FunctionType, types.BuiltinFunctionType, staticmethod, classmethod)
+_MISSING = object()
+
+
+def _accessor_plan(cls):
+    """
+    How records of class `cls` provide each field, as a tuple of
+    - methods: fields that are accessor methods defined on the class,
+    - instance_fields: fields the class does not define, which may still be
+      callables stored in the instance `__dict__`,
+    - probe_fields: fields behind descriptors or other class attributes
+      (properties, slots, ORM columns), probed with getattr per record.
+    Every other field is read as a key. Classes that resolve attributes
+    dynamically (`__getattribute__`, `__getattr__`) probe every field.
+    """
+    try:
+        return _accessor_plans[cls]
+    except KeyError:
+        pass
+    if cls.__getattribute__ not in _GENERIC_GETATTRIBUTE or hasattr(cls, "__getattr__"):
+        plan = (frozenset(), (), ACCESSOR_FIELDS)
+    else:
+        has_instance_dict = any("__dict__" in vars(klass) for klass in cls.__mro__)
+        methods = []
+        instance_fields = []
+        probe_fields = []
+        for name in ACCESSOR_FIELDS:
+            attribute = inspect.getattr_static(cls, name, _MISSING)
+            if attribute is _MISSING:
+                if has_instance_dict:
+                    instance_fields.append(name)
+            elif isinstance(attribute, _METHOD_TYPES):
+                methods.append(name)
+            else:
+                probe_fields.append(name)
+        plan = (frozenset(methods), tuple(instance_fields), tuple(probe_fields))
+    _accessor_plans[cls] = plan
+    return plan
+
+
+def _accessor_methods(line):
+    """Fields of `line` that are read through accessor methods"""
+    methods, instance_fields, probe_fields = _accessor_plan(type(line))
+    if not instance_fields and not probe_fields:
+        return methods
+    found = [name for name in probe_fields if callable(getattr(line, name, None))]
+    if instance_fields:
+        attributes = vars(line)
+        found.extend(name for name in instance_fields if callable(attributes.get(name)))
+    return methods.union(found) if found else methods
+
+
+def _clean_integer(field_name, value):
+    """`value` as int if it is an integer within INTEGER_FIELD_RANGES, else None"""
+    return int(value) if validate_integer_field(field_name, value) else None
+
+
+def _clean_optional(field_name, value):
+    """Cleaned value of an optional field of a column, or None if it is invalid"""
+    if field_name in INTEGER_FIELD_RANGES:
+        return _clean_integer(field_name, value)
+    if field_name == 'time':
+        return value if validate_iso8601_time(value) else None
+    if field_name == 'rate':
+        return value if isinstance(value, dict) and validate_rate_field(value) else None
+    if field_name == 'fmv':
+        return value if isinstance(value, dict) and validate_fmv_field(value) else None
+    if field_name == 'heights':
+        return [int(height) for height in value] if validate_heights_field(value) else None
+    return value if isinstance(value, OPTIONAL_FIELDS[field_name]) else None
+
+
+def _column_list(column):
+    # NumPy arrays convert to native Python values in one call
+    return column.tolist() if hasattr(column, 'tolist') else list(column)
+
+
+def fsync_directory(path):
+    """Persist a rename in the directory of `path` (not supported on Windows)"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def file_mode_for(path):
+    """Permission bits for a file replacing `path`: those of the existing file, else 0o666 minus the umask"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def fsync_path(path):
+    """fsync a file that is no longer open, e.g. after closing a compressed stream"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def canonical_sort_key(entry_type, ref):
+    """
+    Byte string ordering records like the (type, ref) tuple: UTF-8 preserves
+    code point order and NUL sorts before any character of a type name.
+    """
+    return f"{entry_type}\0{ref}".encode('utf-8', errors='surrogatepass')
+
+
+def canonical_dumps(label_dict):
+    """Serialize a validated record with fields in CANONICAL_FIELD_ORDER and sorted rate/fmv keys"""
+    ordered = {}
+    for field_name in CANONICAL_FIELD_ORDER:
+        if field_name in label_dict:
+            value = label_dict[field_name]
+            if isinstance(value, dict):
+                value = {currency: value[currency] for currency in sorted(value)}
+            ordered[field_name] = value
+    return json.dumps(ordered)
+
+
 class BIP329JSONLWriter:
     def __init__(self, filename,
                     remove_existing=True,
                     replace_non_utf8=False,
-                    truncate_labels=False):
+                    truncate_labels=False,
+                    stats=None,
+                    dedupe=None,
+                    dedupe_max_keys=DEFAULT_MAX_KEYS,
+                    canonical=False,
+                    sort_buffer_records=DEFAULT_RUN_RECORDS,
+                    atomic=False,
+                    fsync=None,
+                    fsync_records=DEFAULT_FSYNC_RECORDS,
+                    fsync_interval_ms=None,
+                    compression='auto',
+                    compression_level=None):
         """
         If `remove_existing` is `True` any existing files with the same name
         will be overwritten/replaced.
 
         Setting it to `False` will preserve any previously exported files by
         creating a backup if necessary.
+
+        `filename` may also be an open text stream such as `sys.stdout`, in
+        which case lines are written to it directly and it is left open.
+
+        Pass a `StageStats` instance as `stats` to accumulate per-stage
+        timings ('validate', 'serialize', 'write') of `write_label`.
+
+        `dedupe` collapses records with the same (type, ref):
+        - 'first' keeps the first record and drops later ones while writing.
+        - 'last' keeps the last record; the file is rewritten by `close()`.
+        Seen keys are held in memory up to `dedupe_max_keys`, beyond that
+        they spill to disk behind a Bloom filter. Skipped records are
+        counted in `self.duplicates`.
+
+        `canonical=True` produces a canonical export: records are ordered by
+        (type, ref), keeping call order for equal keys, and fields follow
+        CANONICAL_FIELD_ORDER. Records are sorted externally in runs of
+        `sort_buffer_records` and written by `close()`, so two exports of
+        the same data are byte-identical and can be merged or diffed in
+        linear time.
+
+        `atomic=True` writes to a temporary file next to `filename` and
+        renames it into place on `close()`; an existing file is left
+        untouched until then (or backed up at that point if
+        `remove_existing` is `False`). Leaving the `with` block with an
+        exception discards the temporary file.
+
+        `fsync` selects the durability policy:
+        - None: never fsync, the OS decides when data reaches the disk.
+        - 'close': fsync the file (and the directory after a rename) on close.
+        - 'group': additionally fsync after every `fsync_records` records
+          or `fsync_interval_ms` milliseconds, whichever comes first.
+        Atomic mode and fsync policies keep one file handle open for the
+        lifetime of the writer instead of opening the file per record, so
+        lines may only be visible after `close()`.
+
+        `compression` is 'gzip', 'xz', 'zstd' (needs the `zstandard`
+        package), None for plain text or 'auto' (default) to choose by the
+        extension of `filename` (.gz, .xz, .zst). Compressed output is
+        streamed through one open handle and finished by `close()`;
+        `compression_level` overrides the format's default level.
         """
         self.filename = filename
         self.replace_non_utf8 = replace_non_utf8
         self.truncate_labels = truncate_labels
+        self.stats = stats
+        self.stream = filename if hasattr(filename, 'write') else None
+        if dedupe not in (None, 'first', 'last'):
+            raise ValueError(f"Invalid dedupe mode: {dedupe}")
+        if dedupe == 'last' and self.stream is not None and not canonical:
+            raise ValueError("dedupe='last' needs a file that can be rewritten, not a stream")
+        self.dedupe = dedupe
+        self.dedupe_max_keys = dedupe_max_keys
+        self.duplicates = 0
+        self.is_closed = False
+        self.canonical = canonical
+        self._dumps = canonical_dumps if canonical else json.dumps
+        self._sorter = ExternalSorter(sort_buffer_records) if canonical else None
+        self._seen_keys = SpillableKeySet(dedupe_max_keys) if dedupe == 'first' else None
+        # For last-wins, one key digest per written line, resolved on close.
+        # Canonical output has duplicates adjacent and resolves them while merging.
+        self._key_digests = tempfile.TemporaryFile() if dedupe == 'last' and not canonical else None
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Invalid fsync policy: {fsync}")
+        if (atomic or fsync) and self.stream is not None:
+            raise ValueError("atomic writes and fsync policies need a filename, not a stream")
+        if fsync == 'group' and not fsync_records and not fsync_interval_ms:
+            raise ValueError("fsync='group' needs fsync_records or fsync_interval_ms")
+        self.remove_existing = remove_existing
+        self.atomic = atomic
+        self.fsync = fsync
+        self.fsync_records = fsync_records if fsync == 'group' else None
+        self.fsync_interval_ns = fsync_interval_ms * 1000000 if fsync == 'group' and fsync_interval_ms else None
+        self._handle = None
+        self._unsynced = 0
+        self._last_sync_ns = time.monotonic_ns()
+        # Lines go to self._path, a temporary sibling of filename in atomic mode
+        self._path = filename
+        self.compression = None if self.stream is not None else resolve_compression(filename, compression, detect=False)
+        self.compression_level = compression_level
+        if self.stream is not None:
+            return
+        if atomic:
+            fd, self._path = tempfile.mkstemp(prefix=f"{os.path.basename(filename)}.",
+                                              suffix=".tmp", dir=os.path.dirname(os.path.abspath(filename)))
+            if self.compression is None:
+                self._handle = os.fdopen(fd, mode='w', encoding='utf-8')
+            else:
+                os.close(fd)
+                self._handle = self._open(self._path, 'w')
+            return
         # Check if the file already exists
         if os.path.exists(self.filename):
             if remove_existing:
@@ -60,22 +326,44 @@ class BIP329JSONLWriter:
 
         return label_dict
 
-    def write_label(self, line):
+    def _clean_label(self, label_value):
+        """Check, truncate (if enabled) and UTF-8 validate a label value"""
+        if not isinstance(label_value, str):
+            raise ValueError("label must be string")
+        original = label_value
+
+        # Now validate length and UTF-8
+        if len(label_value) > 255:
+            if self.truncate_labels:
+                original_length = len(label_value)
+                label_value = label_value[:255]
+                logging.warning(f"Label truncated from {original_length} to 255 characters")
+            else:
+                validate_label_length(label_value)
+
+        # UTF-8 validation
+        try:
+            return validate_utf8_encoding(label_value, self.replace_non_utf8)
+        except ValueError:
+            if not self.replace_non_utf8:
+                raise ValueError("Invalid UTF-8 encoding in label")
+            return original
+
+    def prepare_label(self, line):
+        """
+        Validate a BIP-329 record (dict or object with accessor methods) and
+        return the cleaned-up dict that `write_label` would serialize.
+        """
+        methods = _accessor_methods(line)
+
         # Check if the line is a valid BIP-329 record
         if ((isinstance(line, dict) and "type" in line and "ref" in line) or
-            (callable(getattr(line, "type", None)) and callable(
-                getattr(line, "ref", None)))):
-            if callable(getattr(line, "type", None)):
-                label_type = line.type()
-            else:
-                label_type = line["type"]
+                ("type" in methods and "ref" in methods)):
+            label_type = line.type() if "type" in methods else line["type"]
 
             assert label_type in VALID_TYPE_KEYS
 
-            if callable(getattr(line, "ref", None)):
-                label_ref = line.ref()
-            else:
-                label_ref = line["ref"]
+            label_ref = line.ref() if "ref" in methods else line["ref"]
 
             label_dict = {
                 "type": label_type,
@@ -83,39 +371,21 @@ class BIP329JSONLWriter:
             }
 
             label_value = None
-            if callable(getattr(line, "label", None)):
+            if "label" in methods:
                 label_value = line.label()
             elif "label" in line:
                 label_value = line["label"]
 
             # Add label to dict if present and valid
             if label_value is not None:
-                if not isinstance(label_value, str):
-                    raise ValueError("label must be string")
-                label_dict["label"] = label_value
-
-                # Now validate length and UTF-8
-                if len(label_value) > 255:
-                    if self.truncate_labels:
-                        original_length = len(label_value)
-                        label_value = label_value[:255]
-                        logging.warning(f"Label truncated from {original_length} to 255 characters")
-                    else:
-                        validate_label_length(label_value)
-
-                # UTF-8 validation
-                try:
-                    label_dict['label'] = validate_utf8_encoding(label_value, self.replace_non_utf8)
-                except ValueError:
-                    if not self.replace_non_utf8:
-                        raise ValueError("Invalid UTF-8 encoding in label")
+                label_dict["label"] = self._clean_label(label_value)
 
             # Check if all mandatory keys are present
             if not all(key in label_dict for key in VALID_REQUIRED_KEYS):
                 raise MANDATORY_KEYS_ERROR
 
             # Handle existing fields (origin, spendable)
-            if callable(getattr(line, "origin", None)):
+            if "origin" in methods:
                 origin = line.origin()
                 if isinstance(origin, str) and origin:
                     label_dict["origin"] = origin
@@ -128,11 +398,8 @@ class BIP329JSONLWriter:
                 else:
                     raise ValueError("Invalid 'origin' field in BIP-329 record")
 
-            if ("spendable" in line) or hasattr(line, "spendable"):
-                if callable(getattr(line, "spendable", None)):
-                    spendable = line.spendable()
-                else:
-                    spendable = line["spendable"]
+            if "spendable" in methods or "spendable" in line:
+                spendable = line.spendable() if "spendable" in methods else line["spendable"]
 
                 if spendable not in {True, False}:
                     raise ValueError(f"Invalid 'spendable' field in BIP-329 record: {spendable}")
@@ -144,7 +411,7 @@ class BIP329JSONLWriter:
                 field_value = None
 
                 # Get field value (support both dict and object styles)
-                if callable(getattr(line, field_name, None)):
+                if field_name in methods:
                     field_value = getattr(line, field_name)()
                 elif field_name in line:
                     field_value = line[field_name]
@@ -181,23 +448,502 @@ class BIP329JSONLWriter:
                     label_dict[field_name] = field_value
 
                 # Standard type validation for other fields
-                elif isinstance(field_value, expected_type):
-                    label_dict[field_name] = field_value  # Valid, add to output
-                else:
+                elif not isinstance(field_value, expected_type):
                     logging.warning(f"Invalid {field_name} field type: expected {expected_type.__name__}, got {type(field_value).__name__}")
                     continue
+                # Integers must also be within INTEGER_FIELD_RANGES, as in write_columns
+                elif field_name in INTEGER_FIELD_RANGES or field_name == 'heights':
+                    cleaned = _clean_optional(field_name, field_value)
+                    if cleaned is None:
+                        logging.warning(f"Invalid {field_name} field value: {field_value!r} is out of range")
+                        continue
+                    label_dict[field_name] = cleaned
+                else:
+                    label_dict[field_name] = field_value  # Valid, add to output
 
-            label_dict = self.validate_fields_by_type(label_dict, label_type)
-
-            with open(self.filename, mode='a', encoding='utf-8') as writer:
-                writer.write(json.dumps(label_dict) + '\n')
+            return self.validate_fields_by_type(label_dict, label_type)
         else:
             raise ValueError(
                 "Invalid BIP-329 record: 'type', 'ref', and 'label' attributes or keys are required, and only valid fields are exported.")
 
+    def _write_line(self, text, records=1):
+        if self.stream is not None:
+            self.stream.write(text)
+            return
+        if self._handle is None:
+            if self.fsync is None and self.compression is None:
+                with open(self._path, mode='a', encoding='utf-8') as writer:
+                    writer.write(text)
+                return
+            self._handle = self._open(self._path, 'a')
+        self._handle.write(text)
+        if self.fsync == 'group':
+            self._unsynced += records
+            if self.fsync_records and self._unsynced >= self.fsync_records:
+                self._sync()
+            elif self.fsync_interval_ns and time.monotonic_ns() - self._last_sync_ns >= self.fsync_interval_ns:
+                self._sync()
+
+    def _sync(self):
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._unsynced = 0
+        self._last_sync_ns = time.monotonic_ns()
+
+    def _open(self, path, mode):
+        if self.compression is None:
+            return open(path, mode=mode, encoding=None if 'b' in mode else 'utf-8')
+        return open_compressed(path, mode, self.compression, self.compression_level)
+
+    def _close_handle(self):
+        handle = self._handle
+        if handle is None:
+            return
+        self._handle = None
+        if self.compression is not None:
+            # The compressed stream is only complete once closed
+            handle.close()
+            if self.fsync:
+                fsync_path(self._path)
+            return
+        try:
+            if self.fsync:
+                handle.flush()
+                os.fsync(handle.fileno())
+        finally:
+            handle.close()
+
+    def _track_key(self, label_dict):
+        """Return False if the record is a duplicate that must be skipped"""
+        if self._seen_keys is None and self._key_digests is None:
+            return True
+        digest = key_digest(label_dict['type'], label_dict['ref'])
+        if self._key_digests is not None:
+            self._key_digests.write(digest)
+            return True
+        if self._seen_keys is None or self._seen_keys.add(digest):
+            return True
+        self.duplicates += 1
+        return False
+
+    def _write_record(self, label_dict, text):
+        if self._sorter is not None:
+            self._sorter.add(canonical_sort_key(label_dict['type'], label_dict['ref']), text.encode('utf-8'))
+        else:
+            self._write_line(text)
+
+    def write_label(self, line):
+        if self.is_closed:
+            raise ValueError("Writer is closed.")
+        stats = self.stats
+        if stats is None:
+            label_dict = self.prepare_label(line)
+            if self.dedupe is None or self._track_key(label_dict):
+                self._write_record(label_dict, self._dumps(label_dict) + '\n')
+            return
+
+        start = perf_counter_ns()
+        label_dict = self.prepare_label(line)
+        keep = self.dedupe is None or self._track_key(label_dict)
+        now = perf_counter_ns()
+        stats.add('validate', now - start, 1)
+        if not keep:
+            return
+        start = now
+        text = self._dumps(label_dict) + '\n'
+        now = perf_counter_ns()
+        # json.dumps escapes non-ASCII, so the length is the UTF-8 byte count
+        stats.add('serialize', now - start, 1, len(text))
+        start = now
+        self._write_record(label_dict, text)
+        stats.add('write', perf_counter_ns() - start, 1, len(text))
+
+    def _column_values(self, columns, valid):
+        """Known columns as lists, with masked-out values set to None"""
+        length = None
+        values = {}
+        for field_name in ACCESSOR_FIELDS:
+            if field_name not in columns:
+                continue
+            column = _column_list(columns[field_name])
+            if length is None:
+                length = len(column)
+            elif len(column) != length:
+                raise ValueError(f"Column '{field_name}' has {len(column)} values, expected {length}")
+            mask = None if valid is None else valid.get(field_name)
+            if mask is not None:
+                mask = _column_list(mask)
+                if len(mask) != length:
+                    raise ValueError(f"Mask of column '{field_name}' has {len(mask)} values, expected {length}")
+                column = [value if present else None for value, present in zip(column, mask)]
+            values[field_name] = column
+        return values
+
+    def _validate_columns(self, values):
+        """Validate columns in place, return the row numbers of each record type"""
+        if not all(key in values and None not in values[key] for key in VALID_REQUIRED_KEYS):
+            raise MANDATORY_KEYS_ERROR
+        groups = {}
+        for row, entry_type in enumerate(values['type']):
+            rows = groups.get(entry_type)
+            if rows is None:
+                if entry_type not in VALID_TYPE_KEYS:
+                    raise ValueError(f"Invalid type in row {row}: {entry_type}")
+                rows = groups[entry_type] = []
+            rows.append(row)
+        for row, ref in enumerate(values['ref']):
+            if not isinstance(ref, str):
+                raise ValueError(f"Invalid ref in row {row}: {ref}")
+        if 'label' in values:
+            values['label'] = [None if label is None else self._clean_label(label) for label in values['label']]
+        for origin in values.get('origin', ()):
+            if origin is not None and not (isinstance(origin, str) and origin):
+                raise ValueError("Invalid 'origin' field in BIP-329 record")
+        if 'spendable' in values:
+            for spendable in values['spendable']:
+                if spendable is not None and spendable not in {True, False}:
+                    raise ValueError(f"Invalid 'spendable' field in BIP-329 record: {spendable}")
+            values['spendable'] = [None if spendable is None else bool(spendable) for spendable in values['spendable']]
+        for field_name in OPTIONAL_FIELDS:
+            column = values.get(field_name)
+            if column is None:
+                continue
+            cleaned = [None if value is None else _clean_optional(field_name, value) for value in column]
+            invalid = sum(1 for value, result in zip(column, cleaned) if value is not None and result is None)
+            if invalid:
+                logging.warning(f"Invalid {field_name} values in {invalid} rows, removing")
+            values[field_name] = cleaned
+        return groups
+
+    def write_columns(self, columns, valid=None):
+        """
+        Validate and write records given column-wise, e.g. from an SQL
+        result set or NumPy arrays, without building a dict per row first.
+
+        `columns` maps field names to equally long sequences with one value
+        per record; columns with other names are ignored. `valid` may map
+        field names to boolean masks whose false entries mark missing
+        values, as None does in a column.
+
+        Columns are validated as a whole: 'type' and 'ref' are required in
+        every row, invalid types, refs, labels, origins and spendable flags
+        raise ValueError like `write_label`. Invalid optional values,
+        including integers outside INTEGER_FIELD_RANGES, are dropped with
+        one warning per column. Rows are split by their 'type', fields not
+        valid for a type are dropped with one warning per type, and each
+        type's rows are written in their original order. Returns the number
+        of records written, not counting duplicates skipped by `dedupe`.
+        """
+        if self.is_closed:
+            raise ValueError("Writer is closed.")
+        stats = self.stats
+        start = perf_counter_ns()
+        values = self._column_values(columns, valid)
+        groups = self._validate_columns(values)
+        rows_total = len(values['type'])
+        if stats is not None:
+            now = perf_counter_ns()
+            stats.add('validate', now - start, rows_total)
+            start = now
+
+        records = []
+        for entry_type, rows in groups.items():
+            valid_fields = VALID_FIELDS_BY_TYPE[entry_type]
+            fields = []
+            for field_name, column in values.items():
+                if field_name in valid_fields:
+                    fields.append((field_name, column))
+                elif any(column[row] is not None for row in rows):
+                    logging.warning(f"Field '{field_name}' not valid for type '{entry_type}', removing")
+            for row in rows:
+                label_dict = {}
+                for field_name, column in fields:
+                    value = column[row]
+                    if value is not None:
+                        label_dict[field_name] = value
+                if self.dedupe is None or self._track_key(label_dict):
+                    records.append((label_dict, self._dumps(label_dict) + '\n'))
+        nbytes = sum(len(text) for _, text in records)
+        if stats is not None:
+            now = perf_counter_ns()
+            stats.add('serialize', now - start, len(records), nbytes)
+            start = now
+
+        if self._sorter is not None:
+            for label_dict, text in records:
+                self._write_record(label_dict, text)
+        elif records:
+            self._write_line(''.join(text for _, text in records), len(records))
+        if stats is not None:
+            stats.add('write', perf_counter_ns() - start, len(records), nbytes)
+        return len(records)
+
+    def _rewrite_last_wins(self):
+        digests = self._key_digests
+        self._key_digests = None
+        try:
+            digests.flush()
+            total = digests.tell() // DIGEST_SIZE
+            # One bit per written line, set for the last record of each key
+            keep = bytearray((total + 7) // 8)
+            seen = SpillableKeySet(self.dedupe_max_keys)
+            try:
+                for index, digest in iter_digests_reversed(digests, total):
+                    if seen.add(digest):
+                        keep[index >> 3] |= 1 << (index & 7)
+                    else:
+                        self.duplicates += 1
+            finally:
+                seen.close()
+        finally:
+            digests.close()
+
+        if not self.duplicates or not os.path.exists(self._path):
+            return
+        temp_filename = f"{self._path}.dedupe.tmp"
+        with self._open(self._path, 'rb') as source, self._open(temp_filename, 'wb') as target:
+            for index, line in enumerate(source):
+                if keep[index >> 3] & (1 << (index & 7)):
+                    target.write(line)
+        if self.fsync:
+            fsync_path(temp_filename)
+        os.replace(temp_filename, self._path)
+        if self.fsync and not self.atomic:
+            fsync_directory(self._path)
+
+    def _write_sorted(self):
+        sorter = self._sorter
+        self._sorter = None
+        last_wins = self.dedupe == 'last'
+        if (self.fsync or self.compression) and self._handle is None:
+            self._handle = self._open(self._path, 'a')
+        try:
+            if self.stream is not None or self._handle is not None:
+                output = contextlib.nullcontext(self.stream or self._handle)
+            else:
+                output = open(self._path, mode='a', encoding='utf-8')
+            with output as writer:
+                previous_key = pending = None
+                for key, payload in sorter:
+                    if last_wins:
+                        # Equal keys are adjacent, only the last one is written
+                        if key == previous_key:
+                            self.duplicates += 1
+                        elif pending is not None:
+                            writer.write(pending.decode('utf-8'))
+                        previous_key, pending = key, payload
+                    else:
+                        writer.write(payload.decode('utf-8'))
+                if pending is not None:
+                    writer.write(pending.decode('utf-8'))
+        finally:
+            sorter.close()
+
+    def close(self):
+        """Finish the export; required for dedupe='last' and canonical output"""
+        if self.is_closed:
+            return
+        self.is_closed = True
+        if self._seen_keys is not None:
+            self._seen_keys.close()
+        if self._sorter is not None:
+            if self.stats is None:
+                self._write_sorted()
+            else:
+                start = perf_counter_ns()
+                records = len(self._sorter)
+                self._write_sorted()
+                self.stats.add('sort', perf_counter_ns() - start, records)
+        self._close_handle()
+        if self._key_digests is not None:
+            if self.stats is None:
+                self._rewrite_last_wins()
+            else:
+                start = perf_counter_ns()
+                self._rewrite_last_wins()
+                self.stats.add('dedupe', perf_counter_ns() - start, self.duplicates)
+        if self.atomic:
+            self._commit()
+
+    def _commit(self):
+        """Rename the temporary file over `filename`, backing up the old file if requested"""
+        if not self.remove_existing and os.path.exists(self.filename):
+            timestamp = int(time.time())
+            backup_filename = f"{self.filename}.{timestamp}.bak"
+            try:
+                # Keep the old file in place until the rename, at no copy cost
+                os.link(self.filename, backup_filename)
+            except OSError:
+                shutil.copy2(self.filename, backup_filename)
+        # mkstemp creates the file with mode 0600
+        os.chmod(self._path, file_mode_for(self.filename))
+        os.replace(self._path, self.filename)
+        if self.fsync:
+            fsync_directory(self.filename)
+
+    def discard(self):
+        """Abandon an atomic export, leaving any existing file untouched"""
+        if self.is_closed:
+            return
+        self.is_closed = True
+        if self._seen_keys is not None:
+            self._seen_keys.close()
+        if self._sorter is not None:
+            self._sorter.close()
+            self._sorter = None
+        if self._key_digests is not None:
+            self._key_digests.close()
+            self._key_digests = None
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self.atomic and os.path.exists(self._path):
+            os.remove(self._path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and self.atomic:
+            self.discard()
+        else:
+            self.close()
+
+
+class BIP329JSONLConcurrentWriter:
+    """
+    Thread-safe BIP329JSONLWriter for several producer threads.
+
+    `write_label` validates the record in the calling thread and puts it on
+    a queue of at most `queue_size` records, blocking while the queue is
+    full. A single I/O thread takes up to `batch_records` records at a time,
+    serializes them and writes each batch with one call, so lines are never
+    interleaved. An error in the I/O thread makes further `write_label`
+    calls fail and is raised again by `close()`.
+
+    Further keyword arguments are passed to BIP329JSONLWriter.
+    """
+
+    _STOP = object()
+
+    def __init__(self, filename, queue_size=DEFAULT_QUEUE_SIZE, batch_records=DEFAULT_BATCH_RECORDS,
+                 **writer_options):
+        self.jsonl_writer = BIP329JSONLWriter(filename, **writer_options)
+        self.batch_records = batch_records
+        self.records_written = 0
+        self.error = None
+        self.is_closed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="bip329-writer-io", daemon=True)
+        self._thread.start()
+
+    def write_label(self, line):
+        if self.is_closed:
+            raise ValueError("Writer is closed.")
+        if self.error is not None:
+            raise self.error
+        self._queue.put(self.jsonl_writer.prepare_label(line))
+
+    def _run(self):
+        writer = self.jsonl_writer
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_records:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is self._STOP
+            if stop:
+                batch.pop()
+            if self.error is None and batch:
+                try:
+                    self._write_batch(writer, batch)
+                except Exception as e:
+                    logging.error(f"Writing labels failed: {e}")
+                    # Keep draining the queue so blocked producers can see the error
+                    self.error = e
+            if stop:
+                return
+
+    def _write_batch(self, writer, batch):
+        texts = []
+        for label_dict in batch:
+            if writer.dedupe is not None and not writer._track_key(label_dict):
+                continue
+            text = writer._dumps(label_dict) + '\n'
+            if writer._sorter is not None:
+                writer._write_record(label_dict, text)
+            else:
+                texts.append(text)
+        if texts:
+            writer._write_line(''.join(texts))
+        self.records_written += len(batch)
+
+    def close(self):
+        """Write all queued records, close the underlying writer and raise any I/O error"""
+        with self._close_lock:
+            if self.is_closed:
+                return
+            self.is_closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+        if self.error is not None:
+            self.jsonl_writer.discard()
+            raise self.error
+        self.jsonl_writer.close()
+        self.records_written -= self.jsonl_writer.duplicates
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _SpooledTextBuffer:
+    """
+    Text sink that keeps the UTF-8 encoded output in an io.BytesIO until it
+    grows beyond `max_size` bytes, then moves it to an anonymous temporary
+    file. `file` is always a binary object py7zr can archive directly.
+    """
+
+    def __init__(self, max_size=DEFAULT_SPOOL_MAX_SIZE):
+        self.max_size = max_size
+        self.file = io.BytesIO()
+        self.rolled = False
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        if not self.rolled and self.file.tell() + len(data) > self.max_size:
+            self.rollover()
+        return self.file.write(data)
+
+    def rollover(self):
+        spilled = tempfile.TemporaryFile()
+        spilled.write(self.file.getbuffer())
+        self.file = spilled
+        self.rolled = True
+
+    def tell(self):
+        return self.file.tell()
+
+    def flush(self):
+        self.file.flush()
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    def close(self):
+        self.file.close()
+
 
 class BIP329JSONLEncryptedWriter:
-    def __init__(self, filename, passphrase, remove_existing=True, replace_non_utf8=False):
+    def __init__(self, filename, passphrase, remove_existing=True, replace_non_utf8=False, stats=None,
+                 dedupe=None, dedupe_max_keys=DEFAULT_MAX_KEYS, canonical=False,
+                 spool_max_size=DEFAULT_SPOOL_MAX_SIZE, append=False):
         """
         Controls whether any existing files should be removed before writing.
 
@@ -207,18 +953,53 @@ class BIP329JSONLEncryptedWriter:
         - However, in BIP329JSONLEncryptedWriter, `remove_existing` is supported.
           Setting it to `False` will preserve any previously exported files by creating a backup if necessary.
           The path to the backup will stored in self.backup_filename .
+
+        Pass a `StageStats` instance as `stats` to accumulate the writer stages
+        plus the 7z 'encrypt' stage of `close()`.
+
+        `dedupe`, `dedupe_max_keys` and `canonical` are passed on to BIP329JSONLWriter.
+
+        Output is staged in memory and only spills to a temporary file once
+        it exceeds `spool_max_size` bytes, so small exports never touch the
+        disk before encryption. `dedupe='last'` without `canonical` rewrites
+        its output and is always staged in a named temporary file.
+
+        With `append=True` an existing archive is kept and the records are
+        added as a new delta member (`<name>.delta-0001.jsonl`, ...) without
+        re-encrypting the existing ones. Read such archives with
+        `bip329.encryption.iter_archive_entries` (last record per key wins)
+        and consolidate them with `repack_encrypted_archive`.
+
+        `close()` encrypts what was written; `discard()` (also called when
+        the `with` block raises) drops it instead.
         """
-        self.temp_file = tempfile.NamedTemporaryFile(
-            delete=False, mode='w', encoding='utf-8')
-        self.jsonl_writer = BIP329JSONLWriter(self.temp_file.name,
+        if append and os.path.exists(filename):
+            # Fail before any input is read rather than when encrypting
+            check_passphrase(filename, passphrase)
+        # Non-canonical last-wins rewrites the staged file by name
+        self.spooled = not (dedupe == 'last' and not canonical)
+        if self.spooled:
+            self.temp_file = _SpooledTextBuffer(spool_max_size)
+        else:
+            self.temp_file = tempfile.NamedTemporaryFile(
+                delete=False, mode='w', encoding='utf-8')
+        self.member_name = os.path.splitext(os.path.basename(filename))[0] + '.jsonl'
+        self.jsonl_writer = BIP329JSONLWriter(self.temp_file if self.spooled else self.temp_file.name,
                                               remove_existing=True,
-                                              replace_non_utf8=replace_non_utf8)
+                                              replace_non_utf8=replace_non_utf8,
+                                              stats=stats,
+                                              dedupe=dedupe,
+                                              dedupe_max_keys=dedupe_max_keys,
+                                              canonical=canonical)
+        self.stats = stats
+        self.records_written = 0
         self.filename = filename
         self.backup_filename = None
         self.passphrase = passphrase
+        self.append = append and os.path.exists(self.filename)
 
         # Check if the file already exists
-        if os.path.exists(self.filename):
+        if os.path.exists(self.filename) and not self.append:
             if remove_existing:
                 # If it exists and remove_existing is True, remove it
                 os.remove(self.filename)
@@ -234,23 +1015,189 @@ class BIP329JSONLEncryptedWriter:
         if self.is_closed:
             raise Exception("Writer is closed.")
         self.jsonl_writer.write_label(line)
+        self.records_written += 1
+
+    def _store(self, bio):
+        if not self.append:
+            encrypt_streams(self.filename, [(self.member_name, bio)], self.passphrase)
+            return
+        names = set(list_members(self.filename, self.passphrase))
+        stem = os.path.splitext(self.member_name)[0]
+        number = len(names)
+        while f"{stem}.delta-{number:04d}.jsonl" in names:
+            number += 1
+        self.member_name = f"{stem}.delta-{number:04d}.jsonl"
+        # The passphrase was checked in __init__
+        append_streams(self.filename, [(self.member_name, bio)], self.passphrase, verify_passphrase=False)
+
+    def _encrypt(self, bio, nbytes):
+        if self.stats is None:
+            self._store(bio)
+        else:
+            start = perf_counter_ns()
+            self._store(bio)
+            self.stats.add('encrypt', perf_counter_ns() - start, self.records_written, nbytes)
 
     def close(self):
         if self.is_closed:
             return
         # Ensure temp file is properly closed but not deleted yet
-        if not self.temp_file.closed:
+        if not self.spooled and not self.temp_file.closed:
             self.temp_file.close()
-        # Check if temp file exists before trying to encrypt it
-        if os.path.exists(self.temp_file.name):
-            encrypt_files(self.filename, [self.temp_file.name], self.passphrase)
-            # Clean up temp file after successful encryption
+        self.jsonl_writer.close()
+        self.records_written -= self.jsonl_writer.duplicates
+        if self.spooled:
+            bio = self.temp_file.file
+            nbytes = bio.tell()
+            bio.seek(0)
+        elif os.path.exists(self.temp_file.name):
+            bio = open(self.temp_file.name, 'rb')
+            nbytes = os.path.getsize(self.temp_file.name)
+        else:
+            # Nothing was written, so the temp file was never created
+            bio = io.BytesIO()
+            nbytes = 0
+        try:
+            self._encrypt(bio, nbytes)
+        finally:
+            bio.close()
+            if not self.spooled and os.path.exists(self.temp_file.name):
+                # Clean up temp file after encryption
+                os.remove(self.temp_file.name)
+        self.is_closed = True
+
+    def discard(self):
+        """
+        Abandon the export without encrypting anything, so neither a partial
+        archive nor a partial delta member is written. A backup made because
+        of `remove_existing=False` is moved back into place.
+        """
+        if self.is_closed:
+            return
+        self.is_closed = True
+        self.jsonl_writer.discard()
+        self.temp_file.close()
+        if not self.spooled and os.path.exists(self.temp_file.name):
             os.remove(self.temp_file.name)
+        if self.backup_filename is not None and not os.path.exists(self.filename):
+            shutil.move(self.backup_filename, self.filename)
+            self.backup_filename = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.discard()
         else:
-            with tempfile.NamedTemporaryFile(mode='w', delete=False) as empty_file:
-                pass  # Create empty file
-            try:
-                encrypt_files(self.filename, [empty_file.name], self.passphrase)
-            finally:
-                os.remove(empty_file.name)
+            self.close()
+
+
+def repack_encrypted_archive(archive_path, passphrase, **writer_options):
+    """
+    Consolidate an archive with appended delta members into a single member
+    holding the last record per (type, ref). The records of all members are
+    streamed in archive order through a `dedupe='last'` writer, so memory
+    does not grow with the number of labels. The new archive is written next
+    to the old one and renamed over it. Returns the number of records.
+    """
+    temp_path = f"{archive_path}.repack.tmp"
+    try:
+        with BIP329JSONLEncryptedWriter(temp_path, passphrase, **dict(writer_options, dedupe='last')) as writer:
+            writer.member_name = os.path.splitext(os.path.basename(archive_path))[0] + '.jsonl'
+            for entry in iter_archive_records(archive_path, passphrase):
+                writer.write_label(entry)
+        os.replace(temp_path, archive_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return writer.records_written
+
+
+class BIP329JSONLEncryptedArchiveWriter:
+    """
+    Write several named label files (e.g. one per wallet or account) into
+    one encrypted 7z archive.
+
+    `member(name)` returns the BIP329JSONLWriter for member `name`, created
+    on first use; further keyword arguments are passed to it. `close()`
+    encrypts all members, including empty ones. Single members can be read
+    back without decrypting the others with `bip329.encryption.decrypt_member`
+    or `iter_member_entries`. `remove_existing` and `discard()` (also called
+    when the `with` block raises) work as in BIP329JSONLEncryptedWriter.
+    """
+
+    def __init__(self, filename, passphrase, remove_existing=True, **writer_options):
+        self.filename = filename
+        self.passphrase = passphrase
+        self.writer_options = writer_options
+        self.backup_filename = None
+        self.writers = {}
+        self.is_closed = False
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="bip329-archive-")
+        if os.path.exists(self.filename):
+            if remove_existing:
+                os.remove(self.filename)
+            else:
+                timestamp = int(time.time())
+                self.backup_filename = f"{self.filename}.{timestamp}.bak"
+                shutil.move(self.filename, self.backup_filename)
+
+    def member(self, name):
+        if self.is_closed:
+            raise ValueError("Writer is closed.")
+        writer = self.writers.get(name)
+        if writer is None:
+            # Members are extracted by name, so they must not point elsewhere
+            if not name or name in ('.', '..') or os.path.basename(name) != name or '/' in name:
+                raise ValueError(f"Invalid archive member name: {name!r}")
+            path = os.path.join(self.temp_dir.name, name)
+            writer = self.writers[name] = BIP329JSONLWriter(path, **self.writer_options)
+        return writer
+
+    def write_label(self, member, line):
+        self.member(member).write_label(line)
+
+    def close(self):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        try:
+            paths = []
+            for name, writer in self.writers.items():
+                writer.close()
+                path = os.path.join(self.temp_dir.name, name)
+                if not os.path.exists(path):
+                    open(path, 'w').close()
+                paths.append(path)
+            # One folder per member, so reading one never decrypts the others
+            encrypt_files(self.filename, paths, self.passphrase, arcnames=list(self.writers), solid=False)
+        finally:
+            self.temp_dir.cleanup()
+
+    def discard(self):
+        """
+        Abandon the export without writing the archive, restoring a backup
+        made because of `remove_existing=False`
+        """
+        if self.is_closed:
+            return
         self.is_closed = True
+        try:
+            for writer in self.writers.values():
+                writer.discard()
+        finally:
+            self.temp_dir.cleanup()
+        if self.backup_filename is not None and not os.path.exists(self.filename):
+            shutil.move(self.backup_filename, self.filename)
+            self.backup_filename = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.close()
@@ -0,0 +1,92 @@
+# file: bloom.py
+import hashlib
+import math
+import struct
+
+BLOOM_MAGIC = b"BIP329BF"
+# magic, number of bits, number of hash functions, number of added items
+BLOOM_HEADER = struct.Struct("<8sQIQ")
+
+
+def key_digest(entry_type, ref):
+    """128-bit digest identifying a (type, ref) label key"""
+    return hashlib.blake2b(f"{entry_type}\0{ref}".encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+
+
+def bloom_parameters(capacity, error_rate):
+    """Return (number of bits, number of hash functions) for the target false-positive rate"""
+    if capacity < 1:
+        capacity = 1
+    if not 0 < error_rate < 1:
+        raise ValueError("error_rate must be between 0 and 1")
+    num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+    num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+    return num_bits, num_hashes
+
+
+def bit_positions(digest, num_bits, num_hashes):
+    """Kirsch-Mitzenmacher double hashing over a 128-bit digest"""
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:16], "little") | 1
+    return [(h1 + i * h2) % num_bits for i in range(num_hashes)]
+
+
+class BloomFilter:
+    """
+    Compact probabilistic set of 128-bit digests (see `key_digest`).
+
+    Membership tests never give false negatives; false positives occur
+    with roughly `error_rate` probability once `capacity` items are added.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.num_bits, self.num_hashes = bloom_parameters(capacity, error_rate)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def add(self, digest):
+        bits = self.bits
+        for position in bit_positions(digest, self.num_bits, self.num_hashes):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def contains_positions(self, positions):
+        """Membership test for positions precomputed with `bit_positions`"""
+        bits = self.bits
+        for position in positions:
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __contains__(self, digest):
+        # Positions are computed lazily, most misses stop at the first probe
+        bits = self.bits
+        num_bits = self.num_bits
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % num_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def to_bytes(self):
+        return BLOOM_HEADER.pack(BLOOM_MAGIC, self.num_bits, self.num_hashes, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, num_bits, num_hashes, count = BLOOM_HEADER.unpack_from(data)
+        if magic != BLOOM_MAGIC:
+            raise ValueError("Not a BIP-329 bloom filter")
+        bits = bytearray(data[BLOOM_HEADER.size:])
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError("Truncated bloom filter")
+        bloom = cls.__new__(cls)
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.bits = bits
+        bloom.count = count
+        return bloom
@@ -0,0 +1,438 @@
+# file: cli.py
+import argparse
+import getpass
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from .bip329_parser import BIP329_Parser
+from .bip329_writer import BIP329JSONLWriter
+from .bip329_writer import BIP329JSONLEncryptedWriter
+from .bip329_writer import repack_encrypted_archive
+from .diff import DEFAULT_PARTITIONS
+from .diff import diff_files
+from .encryption import decrypt_files
+from .encryption import decrypt_member
+from .encryption import list_members
+from .patch import apply_delta
+
+# Lines per work unit handed to a worker process with --jobs
+BATCH_LINES = 10000
+PASSPHRASE_ENV = "BIP329_PASSPHRASE"
+COUNTER_NAMES = ("lines_read", "malformed_lines", "invalid_entries", "skipped_entries")
+
+
+def _parser_options(args):
+    return {"allow_boolsy": args.allow_boolsy, "verify_origin": args.verify_origin}
+
+
+def _open_input(path):
+    if path == "-":
+        return sys.stdin
+    return path
+
+
+def _parse_batch(lines, options, line_offset=0):
+    """Worker: validate a batch of raw lines, return entries and counters"""
+    parser = BIP329_Parser(io.StringIO("".join(lines)), line_offset=line_offset, **options)
+    entries = list(parser.iter_entries())
+    return entries, {name: getattr(parser, name) for name in COUNTER_NAMES}
+
+
+def _iter_batches(paths, size):
+    """Yield (line offset in its file, lines) batches, which never span files"""
+    for path in paths:
+        if path == "-":
+            file = sys.stdin
+        else:
+            file = open(path, "r")
+        try:
+            batch = []
+            line_offset = 0
+            for line in file:
+                batch.append(line)
+                if len(batch) >= size:
+                    yield line_offset, batch
+                    line_offset += len(batch)
+                    batch = []
+            if batch:
+                yield line_offset, batch
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+
+def iter_entries(paths, options, counters, jobs=1):
+    """
+    Stream valid entries from `paths` in input order, adding the parser
+    counters to `counters`. With `jobs` > 1 batches of lines are decoded
+    and validated in worker processes; only `2 * jobs` batches are in
+    flight at once so memory stays bounded. Missing input files raise
+    FileNotFoundError right away, before anything is read.
+    """
+    for path in paths:
+        # The parser only logs missing files, which would look like an empty input
+        if path != "-" and not os.path.exists(path):
+            raise FileNotFoundError(f"Label file not found: {path}")
+    return _iter_entries(paths, options, counters, jobs)
+
+
+def _iter_entries(paths, options, counters, jobs):
+    if jobs <= 1:
+        for path in paths:
+            parser = BIP329_Parser(_open_input(path), **options)
+            yield from parser.iter_entries()
+            for name in COUNTER_NAMES:
+                counters[name] += getattr(parser, name)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        batches = _iter_batches(paths, BATCH_LINES)
+        while True:
+            while len(pending) < 2 * jobs:
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                line_offset, lines = batch
+                pending.append(executor.submit(_parse_batch, lines, options, line_offset))
+            if not pending:
+                return
+            entries, batch_counters = pending.popleft().result()
+            counters.update(batch_counters)
+            yield from entries
+
+
+def _file_summary(path, options, jobs=1):
+    """Validate or summarize a single file, with `jobs` processes decoding it"""
+    counters = Counter()
+    types = Counter()
+    fields = Counter()
+    for entry in iter_entries([path], options, counters, jobs):
+        types[entry["type"]] += 1
+        fields.update(entry.keys())
+    summary = {"file": path, "entries": sum(types.values())}
+    summary.update({name: counters[name] for name in COUNTER_NAMES})
+    summary["types"] = dict(sorted(types.items()))
+    summary["fields"] = dict(sorted(fields.items()))
+    if path != "-":
+        summary["bytes"] = os.path.getsize(path)
+    return summary
+
+
+def _summaries(args):
+    options = _parser_options(args)
+    paths = args.inputs or ["-"]
+    if args.jobs > 1 and len(paths) > 1 and "-" not in paths:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            return list(executor.map(_file_summary, paths, [options] * len(paths)))
+    # Otherwise each file (or stdin) is split into batches for the workers
+    return [_file_summary(path, options, args.jobs) for path in paths]
+
+
+def _emit(summary, stream):
+    stream.write(json.dumps(summary) + "\n")
+    stream.flush()
+
+
+def _open_output(path):
+    """Return a text stream for `path` ('-' or None is stdout)"""
+    if path in (None, "-"):
+        return sys.stdout
+    return open(path, "w", encoding="utf-8")
+
+
+def _write_entries(entries, output, canonical=False, dedupe=None):
+    if dedupe == "last" and not canonical and output not in (None, "-"):
+        # Last-wins is resolved by rewriting the file on close
+        stream = None
+        writer = BIP329JSONLWriter(output, dedupe=dedupe)
+    else:
+        stream = _open_output(output)
+        writer = BIP329JSONLWriter(stream, canonical=canonical, dedupe=dedupe)
+    written = 0
+    try:
+        for entry in entries:
+            writer.write_label(entry)
+            written += 1
+        writer.close()
+        written -= writer.duplicates
+    finally:
+        if stream is sys.stdout:
+            stream.flush()
+        elif stream is not None:
+            stream.close()
+    return written
+
+
+def _read_passphrase(args, confirm=False):
+    if args.passphrase_file:
+        with open(args.passphrase_file, "r", encoding="utf-8") as file:
+            return file.readline().rstrip("\r\n")
+    if os.environ.get(PASSPHRASE_ENV):
+        return os.environ[PASSPHRASE_ENV]
+    passphrase = getpass.getpass("Passphrase: ")
+    if confirm and passphrase != getpass.getpass("Repeat passphrase: "):
+        raise SystemExit("Passphrases do not match")
+    return passphrase
+
+
+def cmd_validate(args):
+    summaries = _summaries(args)
+    for summary in summaries:
+        del summary["fields"]
+        _emit(summary, sys.stdout)
+    failed = any(summary["malformed_lines"] or summary["invalid_entries"] for summary in summaries)
+    return 1 if failed else 0
+
+
+def cmd_stats(args):
+    for summary in _summaries(args):
+        _emit(summary, sys.stdout)
+    return 0
+
+
+def cmd_normalize(args):
+    counters = Counter()
+    entries = iter_entries(args.inputs or ["-"], _parser_options(args), counters, args.jobs)
+    written = _write_entries(entries, args.output, canonical=args.canonical)
+    _emit(dict(counters, written=written), sys.stderr)
+    return 0
+
+
+def _counted(entries, counters):
+    for entry in entries:
+        counters["accepted"] += 1
+        yield entry
+
+
+def cmd_merge(args):
+    """Merge label files, later records for the same (type, ref) win"""
+    counters = Counter()
+    entries = _counted(iter_entries(args.inputs, _parser_options(args), counters, args.jobs), counters)
+    if args.canonical:
+        # Sorted output has duplicates adjacent, last-wins needs no rewrite
+        written = _write_entries(entries, args.output, canonical=True, dedupe="last")
+    elif args.output in (None, "-"):
+        # A stream cannot be rewritten, so resolve last-wins in a temporary file and copy it out
+        with tempfile.TemporaryDirectory(prefix="bip329-merge-") as tmp:
+            merged = os.path.join(tmp, "merged.jsonl")
+            written = _write_entries(entries, merged, dedupe="last")
+            if os.path.exists(merged):
+                with open(merged, "r", encoding="utf-8") as file:
+                    shutil.copyfileobj(file, sys.stdout)
+            sys.stdout.flush()
+    else:
+        written = _write_entries(entries, args.output, dedupe="last")
+    accepted = counters.pop("accepted", 0)
+    _emit(dict(counters, written=written, duplicates=accepted - written), sys.stderr)
+    return 0
+
+
+def cmd_diff(args):
+    output = sys.stdout if args.output in (None, "-") else args.output
+    counts = diff_files(args.old, args.new, output, sorted_inputs=args.sorted,
+                        partitions=args.partitions, allow_boolsy=args.allow_boolsy)
+    if output is sys.stdout:
+        sys.stdout.flush()
+    _emit(dict(counts, old=args.old, new=args.new), sys.stderr)
+    return 0
+
+
+def cmd_patch(args):
+    counts = apply_delta(args.base, args.delta, output_path=args.output, canonical=args.canonical)
+    _emit(dict(counts, base=args.base, delta=args.delta), sys.stderr)
+    return 0
+
+
+def _backup(path):
+    """Copy `path` to a timestamped backup, leaving it in place until it is replaced"""
+    backup_path = f"{path}.{int(time.time())}.bak"
+    try:
+        os.link(path, backup_path)
+    except OSError:
+        shutil.copy2(path, backup_path)
+    return backup_path
+
+
+def cmd_encrypt(args):
+    passphrase = _read_passphrase(args, confirm=True)
+    counters = Counter()
+    entries = iter_entries(args.inputs or ["-"], _parser_options(args), counters, args.jobs)
+    append = args.append and os.path.exists(args.output)
+    # A new archive is written next to the old one, which is only replaced on success
+    path = args.output if append else f"{args.output}.encrypt.tmp"
+    writer = BIP329JSONLEncryptedWriter(path, passphrase, append=append)
+    writer.member_name = os.path.splitext(os.path.basename(args.output))[0] + ".jsonl"
+    written = 0
+    backup = None
+    try:
+        for entry in entries:
+            writer.write_label(entry)
+            written += 1
+    except BaseException:
+        # Never commit a partial archive or delta member
+        writer.discard()
+        raise
+    try:
+        writer.close()
+        if not append:
+            if args.keep_existing and os.path.exists(args.output):
+                backup = _backup(args.output)
+            os.replace(path, args.output)
+    finally:
+        if not append and os.path.exists(path):
+            os.remove(path)
+    _emit(dict(counters, written=written, archive=args.output, member=writer.member_name,
+               backup=backup), sys.stderr)
+    return 0
+
+
+def cmd_repack(args):
+    passphrase = _read_passphrase(args)
+    members = list_members(args.archive, passphrase)
+    written = repack_encrypted_archive(args.archive, passphrase)
+    _emit({"archive": args.archive, "members": len(members), "written": written}, sys.stderr)
+    return 0
+
+
+def _decrypt(archive, output_dir, passphrase, member=None):
+    if not os.path.exists(archive):
+        raise FileNotFoundError(f"Archive not found: {archive}")
+    try:
+        if member is None:
+            decrypt_files(archive, output_dir, passphrase)
+        else:
+            decrypt_member(archive, member, output_dir, passphrase)
+    except KeyError:
+        raise ValueError(f"No member {member!r} in {archive}")
+    except Exception as e:
+        # py7zr/lzma report a wrong passphrase as corrupt data
+        raise ValueError(f"Could not decrypt {archive} (wrong passphrase?): {e}")
+
+
+def cmd_decrypt(args):
+    passphrase = _read_passphrase(args)
+    if args.output_dir:
+        _decrypt(args.archive, args.output_dir, passphrase, args.member)
+        files = sorted(os.listdir(args.output_dir))
+        _emit({"archive": args.archive, "output_dir": args.output_dir, "files": files}, sys.stderr)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _decrypt(args.archive, tmp, passphrase, args.member)
+        # Archive order, so appended delta members come after the records they update
+        files = [args.member] if args.member else list_members(args.archive, passphrase)
+        stream = _open_output(args.output)
+        try:
+            for name in files:
+                with open(os.path.join(tmp, name), "r", encoding="utf-8") as file:
+                    shutil.copyfileobj(file, stream)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+            else:
+                stream.flush()
+    _emit({"archive": args.archive, "files": files}, sys.stderr)
+    return 0
+
+
+def build_arg_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--jobs", "-j", type=int, default=1,
+                        help="worker processes used to decode and validate input, 0 for one per CPU (default: 1)")
+    common.add_argument("--allow-boolsy", action="store_true",
+                        help="accept boolean-like values such as \"yes\" or 1 for boolean fields")
+    common.add_argument("--verify-origin", action="store_true",
+                        help="reject records whose origin is not a valid abbreviated descriptor")
+    common.add_argument("--verbose", "-v", action="store_true",
+                        help="log a warning for every rejected line")
+
+    secrets = argparse.ArgumentParser(add_help=False)
+    secrets.add_argument("--passphrase-file",
+                         help=f"read the passphrase from this file (default: ${PASSPHRASE_ENV} or prompt)")
+
+    arg_parser = argparse.ArgumentParser(prog="bip329", description="Work with BIP-329 wallet label files.")
+    subparsers = arg_parser.add_subparsers(dest="command", required=True)
+
+    sub = subparsers.add_parser("validate", parents=[common], help="validate label files")
+    sub.add_argument("inputs", nargs="*", help="label files, '-' or none for stdin")
+    sub.set_defaults(func=cmd_validate)
+
+    sub = subparsers.add_parser("stats", parents=[common], help="summarize label files")
+    sub.add_argument("inputs", nargs="*", help="label files, '-' or none for stdin")
+    sub.set_defaults(func=cmd_stats)
+
+    sub = subparsers.add_parser("normalize", parents=[common], help="validate and re-serialize labels")
+    sub.add_argument("inputs", nargs="*", help="label files, '-' or none for stdin")
+    sub.add_argument("--output", "-o", help="output file (default: stdout)")
+    sub.add_argument("--canonical", action="store_true", help="sort by (type, ref) with a canonical field order")
+    sub.set_defaults(func=cmd_normalize)
+
+    sub = subparsers.add_parser("merge", parents=[common], help="merge label files, last record per (type, ref) wins")
+    sub.add_argument("inputs", nargs="+", help="label files in order of increasing precedence")
+    sub.add_argument("--output", "-o", help="output file (default: stdout)")
+    sub.add_argument("--canonical", action="store_true", help="sort by (type, ref) with a canonical field order")
+    sub.set_defaults(func=cmd_merge)
+
+    sub = subparsers.add_parser("diff", parents=[common], help="write the delta between two label files")
+    sub.add_argument("old", help="previous export")
+    sub.add_argument("new", help="current export")
+    sub.add_argument("--output", "-o", help="delta file (default: stdout)")
+    sub.add_argument("--sorted", action="store_true", help="inputs are canonical exports, merge-join them in one pass")
+    sub.add_argument("--partitions", type=int, default=DEFAULT_PARTITIONS,
+                     help="hash partitions spilled to disk for unsorted inputs (default: %(default)s)")
+    sub.set_defaults(func=cmd_diff)
+
+    sub = subparsers.add_parser("patch", parents=[common], help="apply a delta to a label file")
+    sub.add_argument("base", help="label file to patch")
+    sub.add_argument("delta", help="delta written by 'bip329 diff'")
+    sub.add_argument("--output", "-o", help="patched file (default: update BASE in place)")
+    sub.add_argument("--canonical", action="store_true", help="serialize touched records in canonical field order")
+    sub.set_defaults(func=cmd_patch)
+
+    sub = subparsers.add_parser("encrypt", parents=[common, secrets], help="write labels to an encrypted 7z archive")
+    sub.add_argument("inputs", nargs="*", help="label files, '-' or none for stdin")
+    sub.add_argument("--output", "-o", required=True, help="archive to create")
+    sub.add_argument("--keep-existing", action="store_true", help="back up an existing archive instead of replacing it")
+    sub.add_argument("--append", action="store_true", help="add the labels to an existing archive as a delta member")
+    sub.set_defaults(func=cmd_encrypt)
+
+    sub = subparsers.add_parser("repack", parents=[common, secrets],
+                                help="merge the delta members of an archive into one, last record per (type, ref) wins")
+    sub.add_argument("archive", help="encrypted 7z archive")
+    sub.set_defaults(func=cmd_repack)
+
+    sub = subparsers.add_parser("decrypt", parents=[common, secrets], help="decrypt an encrypted label archive")
+    sub.add_argument("archive", help="encrypted 7z archive")
+    sub.add_argument("--output", "-o", help="write the decrypted labels to this file (default: stdout)")
+    sub.add_argument("--output-dir", help="extract the archive members into this directory instead")
+    sub.add_argument("--member", help="only decrypt this archive member")
+    sub.set_defaults(func=cmd_decrypt)
+
+    return arg_parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.jobs < 1:
+        args.jobs = os.cpu_count() or 1
+    logging.basicConfig(format="bip329: %(levelname)s: %(message)s")
+    logging.getLogger().setLevel(logging.WARNING if args.verbose else logging.ERROR)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Downstream command exited early (e.g. `| head`)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError) as e:
+        logging.error(str(e))
+        return 2
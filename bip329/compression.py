@@ -0,0 +1,98 @@
+# file: compression.py
+import gzip
+import io
+import lzma
+import os
+
+try:
+    import zstandard
+except ImportError:  # Optional, install with `pip install bip329[zstd]`
+    zstandard = None
+
+GZIP = "gzip"
+XZ = "xz"
+ZSTD = "zstd"
+COMPRESSIONS = (GZIP, XZ, ZSTD)
+
+COMPRESSION_EXTENSIONS = {
+    ".gz": GZIP,
+    ".gzip": GZIP,
+    ".xz": XZ,
+    ".lzma": XZ,
+    ".zst": ZSTD,
+    ".zstd": ZSTD,
+}
+
+COMPRESSION_MAGIC = (
+    (b"\x1f\x8b", GZIP),
+    (b"\xfd7zXZ\x00", XZ),
+    (b"\x28\xb5\x2f\xfd", ZSTD),
+)
+
+
+def compression_from_extension(path):
+    return COMPRESSION_EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+
+
+def detect_compression(path):
+    """Compression of an existing file by its magic bytes, else by its extension"""
+    try:
+        with open(path, "rb") as file:
+            head = file.read(6)
+    except FileNotFoundError:
+        head = b""
+    for magic, compression in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return compression
+    if head:
+        return None
+    return compression_from_extension(path)
+
+
+def resolve_compression(path, compression, detect=True):
+    """
+    Turn a `compression` argument into GZIP, XZ, ZSTD or None. 'auto'
+    detects it from the file (magic bytes, then extension) when `detect`
+    is set, and from the extension only otherwise.
+    """
+    if compression == "auto":
+        return detect_compression(path) if detect else compression_from_extension(path)
+    if compression not in COMPRESSIONS and compression is not None:
+        raise ValueError(f"Invalid compression: {compression}")
+    return compression
+
+
+def _open_zstd(path, mode, level):
+    if zstandard is None:
+        raise ValueError("zstd compression needs the 'zstandard' package")
+    if mode == "rb":
+        file = open(path, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader)
+    file = open(path, mode)
+    compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+    return compressor.stream_writer(file, closefd=True)
+
+
+def open_compressed(path, mode="rb", compression=GZIP, level=None):
+    """
+    Open `path` for streaming through `compression`. `mode` is one of 'r',
+    'w', 'a' with an optional 'b' (binary) suffix; text modes use UTF-8.
+    Appending adds a new gzip member / xz stream / zstd frame, which readers
+    decompress as one continuous file. `level` defaults to each format's own
+    default (gzip 9, xz preset 6, zstd 3).
+    """
+    binary_mode = mode[0] + "b"
+    if compression == GZIP:
+        file = gzip.open(path, binary_mode, compresslevel=9 if level is None else level)
+    elif compression == XZ:
+        # lzma refuses a preset when reading
+        options = {} if level is None or binary_mode == "rb" else {"preset": level}
+        file = lzma.open(path, binary_mode, **options)
+    elif compression == ZSTD:
+        file = _open_zstd(path, binary_mode, level)
+    else:
+        raise ValueError(f"Invalid compression: {compression}")
+    if "b" in mode:
+        return file
+    return io.TextIOWrapper(file, encoding="utf-8")
@@ -39,3 +39,18 @@ OPTIONAL_FIELDS = {
     "fmv": dict,        # Fair market value {currency: amount}
     "heights": list,    # Block heights for address activity
 }
+
+# Largest amount in satoshis, 21 million BTC
+MAX_MONEY = 21000000 * 100000000
+
+# Inclusive (min, max) bounds of integer fields, None for unbounded
+INTEGER_FIELD_RANGES = {
+    "height": (0, None),
+    "fee": (0, MAX_MONEY),
+    "value": (-MAX_MONEY, MAX_MONEY),
+}
+
+# Field order of canonical exports: required keys first, then the core
+# fields, then the optional fields in the order they appear in BIP-329
+CANONICAL_FIELD_ORDER = ("type", "ref", "label", "origin", "spendable",
+                         "keypath", "height", "time", "fee", "value", "rate", "fmv", "heights")
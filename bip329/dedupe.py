@@ -0,0 +1,109 @@
+# file: dedupe.py
+import mmap
+import os
+import tempfile
+from .bloom import BloomFilter
+from .bloom import bit_positions
+from .bloom import bloom_parameters
+
+DIGEST_SIZE = 16
+DEFAULT_MAX_KEYS = 1000000
+
+
+def sorted_digests_contain(data, digest):
+    """Binary search for `digest` in a buffer of sorted fixed-size digests"""
+    lo, hi = 0, len(data) // DIGEST_SIZE
+    while lo < hi:
+        mid = (lo + hi) // 2
+        offset = mid * DIGEST_SIZE
+        candidate = data[offset:offset + DIGEST_SIZE]
+        if candidate < digest:
+            lo = mid + 1
+        elif candidate > digest:
+            hi = mid
+        else:
+            return True
+    return False
+
+
+def iter_digests_reversed(file, count, chunk_records=4096):
+    """Yield `(index, digest)` for the first `count` digests of `file`, last first"""
+    index = count
+    while index > 0:
+        start = max(0, index - chunk_records)
+        file.seek(start * DIGEST_SIZE)
+        data = file.read((index - start) * DIGEST_SIZE)
+        for i in range(index - start - 1, -1, -1):
+            yield start + i, data[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE]
+        index = start
+
+
+class SpillableKeySet:
+    """
+    Exact set of key digests with bounded memory.
+
+    Up to `max_keys` digests are kept in a Python set. Beyond that the set
+    is spilled to disk as a sorted run guarded by a Bloom filter, so most
+    lookups of new keys are answered from memory and only Bloom filter
+    hits cost a binary search on disk.
+    """
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS, error_rate=0.01, spill_dir=None):
+        if max_keys < 1:
+            raise ValueError("max_keys must be positive")
+        self.max_keys = max_keys
+        self.error_rate = error_rate
+        self.spill_dir = spill_dir
+        self.num_bits, self.num_hashes = bloom_parameters(max_keys, error_rate)
+        self.keys = set()
+        self.runs = []
+        self._tmp = None
+
+    def __contains__(self, digest):
+        if digest in self.keys:
+            return True
+        if self.runs:
+            positions = bit_positions(digest, self.num_bits, self.num_hashes)
+            for bloom, data, _ in self.runs:
+                if bloom.contains_positions(positions) and sorted_digests_contain(data, digest):
+                    return True
+        return False
+
+    def add(self, digest):
+        """Add `digest`, return True if it was not in the set before"""
+        if digest in self:
+            return False
+        self.keys.add(digest)
+        if len(self.keys) >= self.max_keys:
+            self._spill()
+        return True
+
+    def __len__(self):
+        return len(self.keys) + sum(len(bloom) for bloom, _, _ in self.runs)
+
+    @property
+    def spilled(self):
+        return bool(self.runs)
+
+    def _spill(self):
+        if self._tmp is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="bip329-keys-", dir=self.spill_dir)
+        path = os.path.join(self._tmp.name, f"run-{len(self.runs)}.keys")
+        bloom = BloomFilter(self.max_keys, self.error_rate)
+        with open(path, "wb") as file:
+            for digest in sorted(self.keys):
+                file.write(digest)
+                bloom.add(digest)
+        file = open(path, "rb")
+        self.runs.append((bloom, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), file))
+        self.keys = set()
+
+    def close(self):
+        for _, data, file in self.runs:
+            data.close()
+            file.close()
+        self.runs = []
+        self.keys = set()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
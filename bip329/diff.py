@@ -0,0 +1,173 @@
+# file: diff.py
+import contextlib
+import json
+import os
+import tempfile
+from .bip329_parser import BIP329_Parser
+from .bip329_writer import canonical_dumps
+from .bip329_writer import canonical_sort_key
+from .bloom import key_digest
+
+# Delta operations, one JSON object per line:
+#   {"op": "add", "record": {...}}
+#   {"op": "change", "record": {...}}
+#   {"op": "remove", "type": "...", "ref": "..."}
+DELTA_ADD = "add"
+DELTA_CHANGE = "change"
+DELTA_REMOVE = "remove"
+DELTA_OPS = (DELTA_ADD, DELTA_CHANGE, DELTA_REMOVE)
+DEFAULT_PARTITIONS = 64
+
+
+def delta_line(op, record=None, entry_type=None, ref=None):
+    if op == DELTA_REMOVE:
+        return json.dumps({"op": op, "type": entry_type, "ref": ref}) + "\n"
+    return '{"op": "%s", "record": %s}\n' % (op, canonical_dumps(record) if isinstance(record, dict) else record)
+
+
+def iter_delta(path):
+    """Yield (op, type, ref, record) tuples from a delta file; record is None for removals"""
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            op = item.get("op")
+            if op not in DELTA_OPS:
+                raise ValueError(f"Invalid delta operation at line {line_number}: {op!r}")
+            if op == DELTA_REMOVE:
+                yield op, item["type"], item["ref"], None
+            else:
+                record = item["record"]
+                yield op, record["type"], record["ref"], record
+
+
+def _last_wins_sorted(entries, path):
+    """Collapse adjacent duplicates of a sorted stream, checking the order"""
+    previous_key = previous = None
+    for entry in entries:
+        key = canonical_sort_key(entry["type"], entry["ref"])
+        if previous_key is not None:
+            if key < previous_key:
+                raise ValueError(f"{path} is not sorted by (type, ref): {entry['type']} {entry['ref']}")
+            if key != previous_key:
+                yield previous_key, previous
+        previous_key, previous = key, entry
+    if previous_key is not None:
+        yield previous_key, previous
+
+
+class _DiffWriter:
+    def __init__(self, output):
+        self.output = output
+        self.counts = {DELTA_ADD: 0, DELTA_CHANGE: 0, DELTA_REMOVE: 0, "unchanged": 0}
+
+    def add(self, record):
+        self.counts[DELTA_ADD] += 1
+        self.output.write(delta_line(DELTA_ADD, record))
+
+    def change(self, record):
+        self.counts[DELTA_CHANGE] += 1
+        self.output.write(delta_line(DELTA_CHANGE, record))
+
+    def remove(self, entry_type, ref):
+        self.counts[DELTA_REMOVE] += 1
+        self.output.write(delta_line(DELTA_REMOVE, entry_type=entry_type, ref=ref))
+
+    def compare(self, old_line, new_record, new_line):
+        if old_line == new_line:
+            self.counts["unchanged"] += 1
+        else:
+            self.change(new_line if new_record is None else new_record)
+
+
+def _merge_join(old_entries, new_entries, writer, old_path, new_path):
+    old_items = _last_wins_sorted(old_entries, old_path)
+    new_items = _last_wins_sorted(new_entries, new_path)
+    old_key, old = next(old_items, (None, None))
+    new_key, new = next(new_items, (None, None))
+    while old_key is not None or new_key is not None:
+        if new_key is None or (old_key is not None and old_key < new_key):
+            writer.remove(old["type"], old["ref"])
+            old_key, old = next(old_items, (None, None))
+        elif old_key is None or new_key < old_key:
+            writer.add(new)
+            new_key, new = next(new_items, (None, None))
+        else:
+            writer.compare(canonical_dumps(old), new, canonical_dumps(new))
+            old_key, old = next(old_items, (None, None))
+            new_key, new = next(new_items, (None, None))
+
+
+def _partition(entries, directory, prefix, partitions):
+    files = [open(os.path.join(directory, f"{prefix}-{i}"), "w", encoding="utf-8") for i in range(partitions)]
+    try:
+        for entry in entries:
+            partition = int.from_bytes(key_digest(entry["type"], entry["ref"])[:4], "little") % partitions
+            files[partition].write(canonical_dumps(entry) + "\n")
+    finally:
+        for file in files:
+            file.close()
+
+
+def _load_partition(path):
+    records = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            entry = json.loads(line)
+            key = (entry["type"], entry["ref"])
+            # Re-insert so the last duplicate wins and keeps its position
+            records.pop(key, None)
+            records[key] = line.rstrip("\n")
+    return records
+
+
+def _hash_join(old_entries, new_entries, writer, partitions, tmp_dir):
+    with tempfile.TemporaryDirectory(prefix="bip329-diff-", dir=tmp_dir) as directory:
+        _partition(old_entries, directory, "old", partitions)
+        _partition(new_entries, directory, "new", partitions)
+        for i in range(partitions):
+            old_records = _load_partition(os.path.join(directory, f"old-{i}"))
+            new_records = _load_partition(os.path.join(directory, f"new-{i}"))
+            for key, new_line in new_records.items():
+                old_line = old_records.pop(key, None)
+                if old_line is None:
+                    writer.add(new_line)
+                else:
+                    writer.compare(old_line, None, new_line)
+            for entry_type, ref in old_records:
+                writer.remove(entry_type, ref)
+
+
+def diff_files(old_path, new_path, output, sorted_inputs=False, partitions=DEFAULT_PARTITIONS,
+               allow_boolsy=False, tmp_dir=None):
+    """
+    Write the delta that turns label file `old_path` into `new_path`.
+
+    Both files are validated with BIP329_Parser; duplicate keys within a
+    file resolve last-wins. With `sorted_inputs` (e.g. canonical exports)
+    the files are merge-joined in one linear pass and a ValueError is
+    raised if either is out of order. Otherwise both are hash-partitioned
+    into `partitions` temporary files, so only one partition at a time is
+    held in memory.
+
+    `output` is a path or an open text stream. Returns a dict with the
+    number of added, changed, removed and unchanged records.
+    """
+    for path in (old_path, new_path):
+        # The parser only logs missing files, which would look like an empty export
+        if not hasattr(path, "read") and not os.path.exists(path):
+            raise FileNotFoundError(f"Label file not found: {path}")
+    old_entries = BIP329_Parser(old_path, allow_boolsy=allow_boolsy).iter_entries()
+    new_entries = BIP329_Parser(new_path, allow_boolsy=allow_boolsy).iter_entries()
+    if hasattr(output, "write"):
+        target = contextlib.nullcontext(output)
+    else:
+        target = open(output, "w", encoding="utf-8")
+    with target as stream:
+        writer = _DiffWriter(stream)
+        if sorted_inputs:
+            _merge_join(old_entries, new_entries, writer, old_path, new_path)
+        else:
+            _hash_join(old_entries, new_entries, writer, partitions, tmp_dir)
+    return writer.counts
@@ -1,29 +1,157 @@
 # file: encryption.py
 import py7zr
 import hashlib
+from py7zr.io import NullIOFactory
 import os
+import tempfile
+from .bip329_parser import BIP329_Parser
 
 
-def encrypt_files(output_archive, files_to_encrypt, passphrase):
+def _archive_key(passphrase):
     # Hash the passphrase using SHA256
     # Convert bytes to a hexadecimal string
-    key = hashlib.sha256(passphrase.encode()).hexdigest()
+    return hashlib.sha256(passphrase.encode()).hexdigest()
+
+
+def encrypt_files(output_archive, files_to_encrypt, passphrase, arcnames=None, solid=True):
+    """
+    Store `files_to_encrypt` in an AES-256 encrypted 7z archive. Members are
+    named after the files unless `arcnames` gives a name for each file.
+
+    With `solid=False` every member is compressed into its own folder, so
+    extracting one member does not decrypt the members stored before it.
+    """
+    key = _archive_key(passphrase)
+    if arcnames is None:
+        arcnames = [os.path.basename(file_to_encrypt) for file_to_encrypt in files_to_encrypt]
+    members = list(zip(files_to_encrypt, arcnames))
     # Create the 7z archive with AES-256 encryption containing the specified files
     with py7zr.SevenZipFile(output_archive, 'w', password=key) as archive:
-        for file_to_encrypt in files_to_encrypt:
-            archive.write(file_to_encrypt,
-                          arcname=os.path.basename(file_to_encrypt))
+        for file_to_encrypt, arcname in (members if solid else members[:1]):
+            archive.write(file_to_encrypt, arcname=arcname)
+    if not solid:
+        # Each append starts a new folder
+        for file_to_encrypt, arcname in members[1:]:
+            with py7zr.SevenZipFile(output_archive, 'a', password=key) as archive:
+                archive.write(file_to_encrypt, arcname=arcname)
+
+
+def encrypt_streams(output_archive, members, passphrase):
+    """
+    Like `encrypt_files` but archives binary file objects (io.BytesIO or
+    buffered files) without staging them on disk. `members` is an iterable
+    of (arcname, file object) pairs, each read from its current position.
+    """
+    with py7zr.SevenZipFile(output_archive, 'w', password=_archive_key(passphrase)) as archive:
+        for arcname, bio in members:
+            archive.writef(bio, arcname)
+
+
+def check_passphrase(archive_path, passphrase):
+    """
+    Raise ValueError unless `passphrase` decrypts `archive_path`. Only the
+    first member is decrypted, and its content is discarded.
+    """
+    with py7zr.SevenZipFile(archive_path, mode='r', password=_archive_key(passphrase)) as archive:
+        names = archive.getnames()
+        if not names:
+            return
+        try:
+            archive.extract(targets=names[:1], factory=NullIOFactory())
+        except Exception as e:
+            # py7zr/lzma report a wrong passphrase as corrupt data
+            raise ValueError(f"Wrong passphrase for {archive_path}: {e}")
+
+
+def append_streams(archive_path, members, passphrase, verify_passphrase=True):
+    """
+    Add members to an existing encrypted archive, given as (arcname, binary
+    file object) pairs. Existing members are neither decrypted nor
+    re-encrypted, except that with `verify_passphrase` the first one is
+    decrypted to check the passphrase: py7zr would otherwise append members
+    under another key and leave the archive unreadable.
+    """
+    if verify_passphrase:
+        check_passphrase(archive_path, passphrase)
+    with py7zr.SevenZipFile(archive_path, 'a', password=_archive_key(passphrase)) as archive:
+        for arcname, bio in members:
+            archive.writef(bio, arcname)
 
 
 def decrypt_files(archive_path, output_dir, passphrase):
     # Convert the bytes passphrase to a string
-    key = hashlib.sha256(passphrase.encode()).hexdigest()
+    key = _archive_key(passphrase)
     # Open the 7z archive for decryption
     with py7zr.SevenZipFile(archive_path, mode='r', password=key) as archive:
         # Extract the contents of the archive to the specified output directory
         archive.extractall(path=output_dir)
 
 
+def list_members(archive_path, passphrase):
+    """Names of the members of an encrypted label archive, in archive order"""
+    with py7zr.SevenZipFile(archive_path, mode='r', password=_archive_key(passphrase)) as archive:
+        return archive.getnames()
+
+
+def decrypt_member(archive_path, member, output_dir, passphrase):
+    """
+    Extract only `member` into `output_dir` and return its path; a KeyError
+    is raised if `member` is missing. Other members are not decrypted if
+    they are in folders of their own, as written by
+    BIP329JSONLEncryptedArchiveWriter; in a solid archive the members
+    stored before `member` in its folder are decrypted too.
+    """
+    with py7zr.SevenZipFile(archive_path, mode='r', password=_archive_key(passphrase)) as archive:
+        if member not in archive.getnames():
+            raise KeyError(f"No member {member!r} in {archive_path}")
+        archive.extract(path=output_dir, targets=[member])
+    return os.path.join(output_dir, member)
+
+
+def iter_member_entries(archive_path, member, passphrase, **parser_options):
+    """
+    Stream the valid entries of one archive member through BIP329_Parser.
+    The member is extracted to a temporary directory that is removed
+    afterwards.
+    """
+    with tempfile.TemporaryDirectory(prefix="bip329-member-") as output_dir:
+        path = decrypt_member(archive_path, member, output_dir, passphrase)
+        yield from BIP329_Parser(path, **parser_options).iter_entries()
+
+
+def iter_archive_records(archive_path, passphrase, **parser_options):
+    """
+    Yield the valid records of all members in archive order, superseded ones
+    included. The archive is extracted to a temporary directory that is
+    removed afterwards, and records are streamed from there, so memory use
+    does not grow with the archive.
+    """
+    with tempfile.TemporaryDirectory(prefix="bip329-archive-") as output_dir:
+        with py7zr.SevenZipFile(archive_path, mode='r', password=_archive_key(passphrase)) as archive:
+            members = archive.getnames()
+            archive.extractall(path=output_dir)
+        for member in members:
+            yield from BIP329_Parser(os.path.join(output_dir, member), **parser_options).iter_entries()
+
+
+def iter_archive_entries(archive_path, passphrase, **parser_options):
+    """
+    Yield the live entries of an archive whose members were appended over
+    time: members are parsed in archive order and the last record per
+    (type, ref) wins, in the position of that last record.
+
+    All live entries are held in memory until the last member has been
+    read. For large archives stream `iter_archive_records` through a
+    `dedupe='last'` writer instead, as `repack_encrypted_archive` does.
+    """
+    entries = {}
+    for entry in iter_archive_records(archive_path, passphrase, **parser_options):
+        key = (entry["type"], entry["ref"])
+        entries.pop(key, None)
+        entries[key] = entry
+    yield from entries.values()
+
+
 """
 # Example usage:
 
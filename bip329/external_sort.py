@@ -0,0 +1,110 @@
+# file: external_sort.py
+import heapq
+import os
+import struct
+import tempfile
+from operator import itemgetter
+
+# Key and payload lengths preceding each item in a run file
+RUN_ITEM_HEADER = struct.Struct("<II")
+DEFAULT_RUN_RECORDS = 100000
+# Run files read at once by a merge, each with its own read buffer
+DEFAULT_MAX_OPEN_RUNS = 64
+
+
+def _write_run(path, items):
+    with open(path, "wb") as file:
+        for key, payload in items:
+            file.write(RUN_ITEM_HEADER.pack(len(key), len(payload)))
+            file.write(key)
+            file.write(payload)
+
+
+def _read_run(path, buffer_size=1 << 20):
+    with open(path, "rb", buffering=buffer_size) as file:
+        while True:
+            header = file.read(RUN_ITEM_HEADER.size)
+            if not header:
+                return
+            key_length, payload_length = RUN_ITEM_HEADER.unpack(header)
+            key = file.read(key_length)
+            yield key, file.read(payload_length)
+
+
+class ExternalSorter:
+    """
+    Sort `(key, payload)` byte string pairs that may not fit in memory.
+
+    Items are buffered until `max_records` are held, then sorted and
+    spilled to a temporary run file. Iterating performs a k-way merge of
+    all runs and the in-memory remainder. At most `max_open_runs` runs are
+    opened at once: with more runs, groups of adjacent runs are first
+    merged into longer ones, in as many passes as needed. The sort is
+    stable: items with equal keys come out in the order they were added.
+    """
+
+    def __init__(self, max_records=DEFAULT_RUN_RECORDS, tmp_dir=None, max_open_runs=DEFAULT_MAX_OPEN_RUNS):
+        if max_records < 1:
+            raise ValueError("max_records must be positive")
+        if max_open_runs < 2:
+            raise ValueError("max_open_runs must be at least 2")
+        self.max_records = max_records
+        self.max_open_runs = max_open_runs
+        self.tmp_dir = tmp_dir
+        self.buffer = []
+        self.runs = []
+        self.count = 0
+        self._tmp = None
+        self._run_number = 0
+
+    def add(self, key, payload):
+        self.buffer.append((key, payload))
+        self.count += 1
+        if len(self.buffer) >= self.max_records:
+            self._spill()
+
+    def _spill(self):
+        if self._tmp is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="bip329-sort-", dir=self.tmp_dir)
+        self.buffer.sort(key=itemgetter(0))
+        self.runs.append(self._write_run(self.buffer))
+        self.buffer = []
+
+    def _write_run(self, items):
+        path = os.path.join(self._tmp.name, f"run-{self._run_number}")
+        self._run_number += 1
+        _write_run(path, items)
+        return path
+
+    def _reduce_runs(self):
+        """Merge groups of adjacent runs until at most `max_open_runs` are left"""
+        while len(self.runs) > self.max_open_runs:
+            runs = []
+            for start in range(0, len(self.runs), self.max_open_runs):
+                group = self.runs[start:start + self.max_open_runs]
+                if len(group) == 1:
+                    runs.append(group[0])
+                    continue
+                # Adjacent runs merged in order keep the sort stable
+                runs.append(self._write_run(heapq.merge(*[_read_run(path) for path in group], key=itemgetter(0))))
+                for path in group:
+                    os.remove(path)
+            self.runs = runs
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        self.buffer.sort(key=itemgetter(0))
+        if not self.runs:
+            return iter(self.buffer)
+        self._reduce_runs()
+        # Runs come first in the argument list so equal keys keep insertion order
+        return heapq.merge(*[_read_run(path) for path in self.runs], iter(self.buffer), key=itemgetter(0))
+
+    def close(self):
+        self.buffer = []
+        self.runs = []
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
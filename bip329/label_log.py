@@ -0,0 +1,200 @@
+# file: label_log.py
+import json
+import logging
+import os
+import shutil
+import threading
+from .bip329_parser import BIP329_Parser
+from .bip329_writer import BIP329JSONLWriter
+from .bip329_writer import file_mode_for
+from .bip329_writer import fsync_directory
+from .bloom import key_digest
+from .dedupe import DEFAULT_MAX_KEYS
+from .dedupe import SpillableKeySet
+
+DEFAULT_COMPACT_RATIO = 0.5
+DEFAULT_MIN_RECORDS = 10000
+
+
+class _FileHead:
+    """Read-only text file object over the first `size` bytes of a file"""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+    def read(self):
+        with open(self.path, 'rb') as file:
+            return file.read(self.size).decode('utf-8')
+
+    def __iter__(self):
+        remaining = self.size
+        with open(self.path, 'rb') as file:
+            for line in file:
+                if remaining <= 0:
+                    return
+                line = line[:remaining]
+                remaining -= len(line)
+                yield line.decode('utf-8')
+
+
+class LabelLog:
+    """
+    Append-only BIP-329 label file for frequently updated labels.
+
+    `write_label` validates a record like BIP329JSONLWriter and appends it;
+    the latest record per (type, ref) is the live one. The log counts how
+    many of its records are dead (superseded by a later record, or invalid
+    lines found when opening). Once at least `min_records` are stored and
+    the dead share reaches `compact_ratio`, the log is compacted into a
+    last-wins snapshot, in a background thread unless `background=False`.
+    Records appended meanwhile are copied after the snapshot, which is then
+    renamed over the log, so readers using BIP329_Parser always see a
+    complete file whose size is bounded by the live records.
+
+    Keys are tracked as digests in memory up to `max_keys`, beyond that
+    they spill to disk.
+    """
+
+    def __init__(self, path, compact_ratio=DEFAULT_COMPACT_RATIO, min_records=DEFAULT_MIN_RECORDS,
+                 background=True, allow_boolsy=False, max_keys=DEFAULT_MAX_KEYS):
+        if not 0 < compact_ratio <= 1:
+            raise ValueError("compact_ratio must be in (0, 1]")
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.min_records = min_records
+        self.background = background
+        self.allow_boolsy = allow_boolsy
+        self.compactions = 0
+        self.compaction_error = None
+        self._keys = SpillableKeySet(max_keys)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._compacting = False
+        # Records appended since the running compaction took its snapshot
+        self._tail_records = 0
+        self.records = 0
+        if os.path.exists(path):
+            parser = BIP329_Parser(path, allow_boolsy=allow_boolsy)
+            for entry in parser.iter_entries():
+                self._keys.add(key_digest(entry['type'], entry['ref']))
+            # Malformed and invalid lines are dead too, compaction drops them
+            self.records = parser.lines_read
+        self._open_writer()
+
+    def _open_writer(self):
+        self._file = open(self.path, mode='a', encoding='utf-8')
+        self._writer = BIP329JSONLWriter(self._file)
+
+    @property
+    def live_records(self):
+        return len(self._keys)
+
+    @property
+    def dead_ratio(self):
+        if not self.records:
+            return 0.0
+        return (self.records - self.live_records) / self.records
+
+    def write_label(self, line):
+        """Validate and append a record, compacting the log when due"""
+        if self.compaction_error is not None:
+            raise self.compaction_error
+        with self._lock:
+            label_dict = self._writer.prepare_label(line)
+            self._file.write(json.dumps(label_dict) + '\n')
+            # Readers must never see a partial line
+            self._file.flush()
+            self._keys.add(key_digest(label_dict['type'], label_dict['ref']))
+            self.records += 1
+            if self._compacting:
+                self._tail_records += 1
+            due = not self._compacting and self.records >= self.min_records and self.dead_ratio >= self.compact_ratio
+        if due:
+            self.compact(wait=not self.background)
+
+    def compact(self, wait=True):
+        """Start a compaction unless one is running; with `wait` run it in this thread"""
+        with self._lock:
+            if self._compacting:
+                return False
+            self._compacting = True
+            self._tail_records = 0
+            self._file.flush()
+            size = os.path.getsize(self.path)
+        if wait:
+            self._compact(size)
+        else:
+            self._thread = threading.Thread(target=self._compact, args=(size,),
+                                            name="bip329-label-log-compaction", daemon=True)
+            self._thread.start()
+        return True
+
+    def _compact(self, size):
+        snapshot_path = f"{self.path}.compact.tmp"
+        try:
+            written = 0
+            # fsync before the rename, or a crash could replace the log with a hole
+            with BIP329JSONLWriter(snapshot_path, dedupe='last', fsync='close') as writer:
+                parser = BIP329_Parser(_FileHead(self.path, size), allow_boolsy=self.allow_boolsy)
+                for entry in parser.iter_entries():
+                    writer.write_label(entry)
+                    written += 1
+            snapshot_records = written - writer.duplicates
+            with self._lock:
+                self._file.flush()
+                with open(self.path, 'rb') as source, open(snapshot_path, 'ab') as target:
+                    source.seek(size)
+                    shutil.copyfileobj(source, target)
+                    target.flush()
+                    os.fsync(target.fileno())
+                self._file.close()
+                # The snapshot was created with the default mode, keep the log's
+                os.chmod(snapshot_path, file_mode_for(self.path))
+                os.replace(snapshot_path, self.path)
+                fsync_directory(self.path)
+                self._open_writer()
+                self.records = snapshot_records + self._tail_records
+                self.compactions += 1
+        except Exception as e:
+            logging.error(f"Compaction of {self.path} failed: {e}")
+            self.compaction_error = e
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+            if self._file.closed:
+                self._open_writer()
+        finally:
+            self._compacting = False
+
+    def wait(self):
+        """Block until a running background compaction has finished"""
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+            self._thread = None
+
+    def load_entries(self):
+        """Return the live records, last record per (type, ref) wins"""
+        with self._lock:
+            self._file.flush()
+            entries = {}
+            for entry in BIP329_Parser(self.path, allow_boolsy=self.allow_boolsy).iter_entries():
+                key = (entry['type'], entry['ref'])
+                entries.pop(key, None)
+                entries[key] = entry
+        return list(entries.values())
+
+    def close(self):
+        self.wait()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._keys.close()
+        if self.compaction_error is not None:
+            raise self.compaction_error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
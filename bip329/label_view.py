@@ -0,0 +1,188 @@
+# file: label_view.py
+import bisect
+from datetime import datetime
+from datetime import timezone
+from .bip329_parser import BIP329_Parser
+from .validation_utils import parse_iso8601_timestamp
+
+
+def _timestamp(value):
+    """Query bound as a POSIX timestamp: ISO-8601 string, datetime or number"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    timestamp = parse_iso8601_timestamp(value)
+    if timestamp is None:
+        raise ValueError(f"Invalid ISO-8601 time: {value}")
+    return timestamp
+
+
+# Sorts after every (value, type, ref) item with the same value
+_AFTER_KEYS = chr(0x10FFFF)
+
+
+def _range(index, low, high):
+    """(value, type, ref) items of a sorted index with low <= value <= high"""
+    start = 0 if low is None else bisect.bisect_left(index, (low,))
+    end = len(index) if high is None else bisect.bisect_right(index, (high, _AFTER_KEYS))
+    return index[start:end]
+
+
+def _height(entry):
+    height = entry.get("height")
+    return height if isinstance(height, int) else None
+
+
+class IndexedLabelView:
+    """
+    In-memory view of labels, one entry per (type, ref) (last wins), with
+    secondary indexes for the queries a wallet UI makes:
+
+    - a hash index on `origin` (`by_origin`),
+    - a sorted index on `height` (`height_range`),
+    - a sorted index on the parsed `time` (`time_range`).
+
+    Range queries bisect the sorted indexes, so they cost O(log n) plus
+    the size of the result. `update` (and the constructor) only collect
+    entries, the sorted indexes are then built in one sort by the next
+    query; `insert` and `delete` update built indexes incrementally.
+    Entries must not be modified in place while they are in the view. Entries are expected to be validated, e.g. by
+    BIP329_Parser; an unparsable `time` is simply not indexed.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = {}
+        self._origins = {}
+        # Sorted lists of (value, type, ref), rebuilt from self.entries when stale
+        self._heights = []
+        self._times = []
+        self._sorted = True
+        self.update(entries)
+
+    @classmethod
+    def from_file(cls, jsonl_path, **parser_options):
+        """Build a view of a label file, parsed with BIP329_Parser(**parser_options)"""
+        return cls(BIP329_Parser(jsonl_path, **parser_options).iter_entries())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    def get(self, entry_type, ref):
+        return self.entries.get((entry_type, ref))
+
+    def update(self, entries):
+        """Add many entries; the sorted indexes are rebuilt once, by the next query"""
+        self._sorted = False
+        for entry in entries:
+            self._add(entry)
+
+    def _add(self, entry):
+        key = (entry["type"], entry["ref"])
+        previous = self.entries.get(key)
+        if previous is not None:
+            self._unindex_origin(key, previous)
+            if self._sorted:
+                self._unindex_sorted(key, previous)
+        self.entries[key] = entry
+        origin = entry.get("origin")
+        if origin is not None:
+            self._origins.setdefault(origin, {})[key] = None
+        return key
+
+    def insert(self, entry):
+        """Add an entry, replacing (and unindexing) any entry with the same key"""
+        key = self._add(entry)
+        if not self._sorted:
+            return
+        height = _height(entry)
+        if height is not None:
+            bisect.insort(self._heights, (height,) + key)
+        timestamp = parse_iso8601_timestamp(entry.get("time"))
+        if timestamp is not None:
+            bisect.insort(self._times, (timestamp,) + key)
+
+    def delete(self, entry_type, ref):
+        """Remove the entry for (type, ref), return True if it existed"""
+        key = (entry_type, ref)
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        self._unindex_origin(key, entry)
+        if self._sorted:
+            self._unindex_sorted(key, entry)
+        return True
+
+    def _unindex_origin(self, key, entry):
+        origin = entry.get("origin")
+        if origin is not None:
+            keys = self._origins[origin]
+            del keys[key]
+            if not keys:
+                del self._origins[origin]
+
+    def _unindex_sorted(self, key, entry):
+        height = _height(entry)
+        if height is not None:
+            self._remove_sorted(self._heights, (height,) + key)
+        timestamp = parse_iso8601_timestamp(entry.get("time"))
+        if timestamp is not None:
+            self._remove_sorted(self._times, (timestamp,) + key)
+
+    def _sort(self):
+        """Build the sorted indexes from scratch after `update`"""
+        if self._sorted:
+            return
+        heights = []
+        times = []
+        for key, entry in self.entries.items():
+            height = _height(entry)
+            if height is not None:
+                heights.append((height,) + key)
+            timestamp = parse_iso8601_timestamp(entry.get("time"))
+            if timestamp is not None:
+                times.append((timestamp,) + key)
+        heights.sort()
+        times.sort()
+        self._heights = heights
+        self._times = times
+        self._sorted = True
+
+    @staticmethod
+    def _remove_sorted(index, item):
+        position = bisect.bisect_left(index, item)
+        if position < len(index) and index[position] == item:
+            del index[position]
+
+    def origins(self):
+        """Distinct origins with their number of entries"""
+        return {origin: len(keys) for origin, keys in self._origins.items()}
+
+    def by_origin(self, origin, entry_type=None):
+        """Entries with exactly this `origin`, in insertion order"""
+        keys = self._origins.get(origin, ())
+        return [self.entries[key] for key in keys if entry_type is None or key[0] == entry_type]
+
+    def height_range(self, min_height=None, max_height=None, entry_type=None):
+        """Entries with min_height <= height <= max_height (inclusive, None is open), by height"""
+        self._sort()
+        return [self.entries[(item[1], item[2])] for item in _range(self._heights, min_height, max_height)
+                if entry_type is None or item[1] == entry_type]
+
+    def time_range(self, start=None, end=None, entry_type=None):
+        """
+        Entries with start <= time <= end, ordered by time. Bounds are
+        ISO-8601 strings, datetimes or POSIX timestamps; times without an
+        offset are taken as UTC.
+        """
+        self._sort()
+        return [self.entries[(item[1], item[2])] for item in _range(self._times, _timestamp(start), _timestamp(end))
+                if entry_type is None or item[1] == entry_type]
@@ -0,0 +1,149 @@
+# file: membership.py
+import os
+import struct
+from .bloom import BloomFilter
+from .bloom import key_digest
+from .offset_index import LabelOffsetIndex
+
+MEMBERSHIP_SUFFIX = ".bloom"
+MEMBERSHIP_MAGIC = b"BIP329MF"
+# magic, source file size, source mtime in ns; followed by the Bloom filter
+MEMBERSHIP_HEADER = struct.Struct("<8sQq")
+DEFAULT_ERROR_RATE = 0.01
+
+
+def membership_path_for(jsonl_path):
+    return jsonl_path + MEMBERSHIP_SUFFIX
+
+
+class LabelMembershipFilter:
+    """
+    Compact "is this (type, ref) labeled?" filter for a JSONL label file.
+
+    A Bloom filter over all keys is stored next to the label file as
+    `<file>.bloom`; at 1% false positives it needs about 1.2 bytes per
+    label. `might_contain` answers from the filter alone, while
+    `contains` (and `in`) confirms filter hits against the exact
+    LabelOffsetIndex, so the answer is never wrong. The sidecar records
+    the size and mtime of the label file it was built from; a stale
+    filter is rebuilt by `load`, `filter_labeled` and `refresh`. Single-key
+    lookups do not check the label file, so they cost a hash and a few bit
+    tests; call `refresh()` after the file may have changed.
+    """
+
+    def __init__(self, jsonl_path, bloom, offset_index=None, source_size=None, source_mtime_ns=None,
+                 path=None, error_rate=DEFAULT_ERROR_RATE):
+        self.jsonl_path = jsonl_path
+        self.bloom = bloom
+        self._offset_index = offset_index
+        self.source_size = source_size
+        self.source_mtime_ns = source_mtime_ns
+        self.path = path or membership_path_for(jsonl_path)
+        self.error_rate = error_rate
+
+    @classmethod
+    def build(cls, jsonl_path, error_rate=DEFAULT_ERROR_RATE, path=None):
+        """Build the filter from the label file's offset index and save it"""
+        offset_index = LabelOffsetIndex.open(jsonl_path)
+        unique = []
+        previous = None
+        # The index is sorted by digest, so duplicates are adjacent
+        for digest in offset_index.iter_digests():
+            if digest != previous:
+                unique.append(digest)
+                previous = digest
+        bloom = BloomFilter(len(unique), error_rate)
+        for digest in unique:
+            bloom.add(digest)
+        path = path or membership_path_for(jsonl_path)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(MEMBERSHIP_HEADER.pack(MEMBERSHIP_MAGIC, offset_index.source_size, offset_index.source_mtime_ns))
+            file.write(bloom.to_bytes())
+        os.replace(temp_path, path)
+        return cls(jsonl_path, bloom, offset_index, offset_index.source_size, offset_index.source_mtime_ns,
+                   path, error_rate)
+
+    @classmethod
+    def load(cls, jsonl_path, path=None, rebuild=True):
+        """Load the saved filter of `jsonl_path`, (re)building it if missing or stale"""
+        path = path or membership_path_for(jsonl_path)
+        membership = None
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                data = file.read()
+            try:
+                magic, source_size, source_mtime_ns = MEMBERSHIP_HEADER.unpack_from(data)
+                if magic != MEMBERSHIP_MAGIC:
+                    raise ValueError("Not a BIP-329 membership filter")
+                bloom = BloomFilter.from_bytes(data[MEMBERSHIP_HEADER.size:])
+            except (ValueError, struct.error):
+                pass
+            else:
+                # The filter does not keep its error rate, k hashes give about 2^-k
+                membership = cls(jsonl_path, bloom, None, source_size, source_mtime_ns, path,
+                                 0.5 ** bloom.num_hashes)
+        if membership is not None and not membership.is_stale():
+            return membership
+        if not rebuild:
+            raise FileNotFoundError(f"No up-to-date membership filter for {jsonl_path}")
+        error_rate = DEFAULT_ERROR_RATE if membership is None else membership.error_rate
+        return cls.build(jsonl_path, error_rate, path)
+
+    def is_stale(self):
+        """True if the label file changed since the filter was built"""
+        try:
+            stat = os.stat(self.jsonl_path)
+        except FileNotFoundError:
+            return True
+        return (stat.st_size, stat.st_mtime_ns) != (self.source_size, self.source_mtime_ns)
+
+    def refresh(self):
+        """Rebuild the filter (and offset index) if the label file changed"""
+        if not self.is_stale():
+            return False
+        fresh = self.build(self.jsonl_path, self.error_rate, self.path)
+        self.close()
+        self.bloom = fresh.bloom
+        self._offset_index = fresh._offset_index
+        self.source_size = fresh.source_size
+        self.source_mtime_ns = fresh.source_mtime_ns
+        return True
+
+    @property
+    def offset_index(self):
+        if self._offset_index is None:
+            self._offset_index = LabelOffsetIndex.open(self.jsonl_path)
+        return self._offset_index
+
+    def might_contain(self, entry_type, ref):
+        """False means definitely not labeled; True may be a false positive"""
+        return key_digest(entry_type, ref) in self.bloom
+
+    def contains(self, entry_type, ref):
+        """Exact membership test, falling back to the offset index on filter hits"""
+        if not self.might_contain(entry_type, ref):
+            return False
+        return bool(self.offset_index.offsets(entry_type, ref))
+
+    def __contains__(self, key):
+        return self.contains(*key)
+
+    def filter_labeled(self, keys, exact=True):
+        """Yield the (type, ref) keys from `keys` that are labeled, refreshing a stale filter first"""
+        self.refresh()
+        check = self.contains if exact else self.might_contain
+        for entry_type, ref in keys:
+            if check(entry_type, ref):
+                yield entry_type, ref
+
+    def close(self):
+        if self._offset_index is not None:
+            self._offset_index.close()
+            self._offset_index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
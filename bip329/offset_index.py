@@ -0,0 +1,214 @@
+# file: offset_index.py
+import heapq
+import json
+import mmap
+import os
+import struct
+import tempfile
+from .bloom import key_digest
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"BIP329IX"
+# magic, source file size, source mtime in ns, number of records
+INDEX_HEADER = struct.Struct("<8sQqQ")
+# 16-byte key digest followed by the big-endian line offset, so records
+# sort bytewise by digest first and file position second
+INDEX_RECORD = struct.Struct(">16sQ")
+# Records sorted in memory before being spilled as a run while building
+INDEX_RUN_RECORDS = 1000000
+
+
+def index_path_for(jsonl_path):
+    return jsonl_path + INDEX_SUFFIX
+
+
+def _key_of_line(line):
+    """Return (type, ref) of a raw JSONL line, or None if it has none"""
+    if not line.strip():
+        return None
+    try:
+        entry = json.loads(line)
+        return entry["type"], entry["ref"]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def _sorted_runs(jsonl_path, tmp_dir, run_records):
+    runs = []
+    records = []
+
+    def spill():
+        records.sort()
+        path = os.path.join(tmp_dir, f"run-{len(runs)}")
+        with open(path, "wb") as file:
+            file.write(b"".join(records))
+        runs.append(path)
+        records.clear()
+
+    with open(jsonl_path, "rb") as file:
+        offset = 0
+        for line in file:
+            key = _key_of_line(line)
+            if key is not None and isinstance(key[0], str) and isinstance(key[1], str):
+                records.append(INDEX_RECORD.pack(key_digest(*key), offset))
+                if len(records) >= run_records:
+                    spill()
+            offset += len(line)
+    if records or not runs:
+        spill()
+    return runs
+
+
+def _iter_run(path, chunk_records=65536):
+    with open(path, "rb") as file:
+        while True:
+            data = file.read(chunk_records * INDEX_RECORD.size)
+            if not data:
+                return
+            for start in range(0, len(data), INDEX_RECORD.size):
+                yield data[start:start + INDEX_RECORD.size]
+
+
+def write_index(index_path, source_stat, count, records):
+    """Write `count` packed, sorted INDEX_RECORDs stamped with the label file's stat"""
+    with open(index_path, "wb") as output:
+        output.write(INDEX_HEADER.pack(INDEX_MAGIC, source_stat.st_size, source_stat.st_mtime_ns, count))
+        for record in records:
+            output.write(record)
+
+
+class LabelOffsetIndex:
+    """
+    Exact on-disk index from (type, ref) to the byte offsets of matching
+    lines in a JSONL label file, stored next to it as `<file>.idx`.
+
+    Records are sorted by key digest and looked up by binary search on a
+    memory map, so the index costs no memory beyond the OS page cache.
+    Lines without a decodable type/ref are not indexed.
+    """
+
+    def __init__(self, jsonl_path, index_path=None):
+        self.jsonl_path = jsonl_path
+        self.index_path = index_path or index_path_for(jsonl_path)
+        self._file = open(self.index_path, "rb")
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file cannot be mapped
+            self._file.close()
+            raise ValueError(f"Corrupt label index: {self.index_path}")
+        magic, self.source_size, self.source_mtime_ns, self.count = INDEX_HEADER.unpack_from(self._data)
+        if magic != INDEX_MAGIC or len(self._data) != INDEX_HEADER.size + self.count * INDEX_RECORD.size:
+            self.close()
+            raise ValueError(f"Corrupt label index: {self.index_path}")
+
+    @classmethod
+    def build(cls, jsonl_path, index_path=None, run_records=INDEX_RUN_RECORDS):
+        """Scan `jsonl_path` and write its index, sorting externally in runs"""
+        index_path = index_path or index_path_for(jsonl_path)
+        stat = os.stat(jsonl_path)
+        temp_path = index_path + ".tmp"
+        with tempfile.TemporaryDirectory(prefix="bip329-index-") as tmp_dir:
+            runs = _sorted_runs(jsonl_path, tmp_dir, run_records)
+            count = sum(os.path.getsize(run) for run in runs) // INDEX_RECORD.size
+            write_index(temp_path, stat, count, heapq.merge(*[_iter_run(run) for run in runs]))
+        os.replace(temp_path, index_path)
+        return cls(jsonl_path, index_path)
+
+    @classmethod
+    def open(cls, jsonl_path, index_path=None, rebuild=True):
+        """Open the index of `jsonl_path`, (re)building it if missing or stale"""
+        index_path = index_path or index_path_for(jsonl_path)
+        if os.path.exists(index_path):
+            try:
+                index = cls(jsonl_path, index_path)
+            except ValueError:
+                index = None
+            if index is not None and not index.is_stale():
+                return index
+            if index is not None:
+                index.close()
+        if not rebuild:
+            raise FileNotFoundError(f"No up-to-date index for {jsonl_path}")
+        return cls.build(jsonl_path, index_path)
+
+    def is_stale(self):
+        """True if the label file changed since the index was built"""
+        try:
+            stat = os.stat(self.jsonl_path)
+        except FileNotFoundError:
+            return True
+        return (stat.st_size, stat.st_mtime_ns) != (self.source_size, self.source_mtime_ns)
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, position):
+        return INDEX_RECORD.unpack_from(self._data, INDEX_HEADER.size + position * INDEX_RECORD.size)
+
+    def _first_position(self, digest):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[0] < digest:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def iter_digests(self):
+        """Yield the key digest of every indexed line in digest order"""
+        for position in range(self.count):
+            yield self._record(position)[0]
+
+    def iter_records(self):
+        """Yield (digest, offset) of every indexed line in digest order"""
+        for position in range(self.count):
+            yield self._record(position)
+
+    def offsets(self, entry_type, ref, verify=True):
+        """
+        Return the sorted byte offsets of all lines for (type, ref).
+        With `verify`, each line is re-read and checked against the key
+        so a digest collision can never produce a false hit.
+        """
+        digest = key_digest(entry_type, ref)
+        position = self._first_position(digest)
+        offsets = []
+        while position < self.count:
+            record_digest, offset = self._record(position)
+            if record_digest != digest:
+                break
+            offsets.append(offset)
+            position += 1
+        if verify and offsets:
+            offsets = [offset for offset in offsets if _key_of_line(self.read_line(offset)) == (entry_type, ref)]
+        return offsets
+
+    def __contains__(self, key):
+        return bool(self.offsets(*key))
+
+    def read_line(self, offset):
+        """Return the raw line (bytes, including the newline) at `offset`"""
+        with open(self.jsonl_path, "rb") as file:
+            file.seek(offset)
+            return file.readline()
+
+    def lookup(self, entry_type, ref):
+        """Return the last record for (type, ref) decoded from the label file, or None"""
+        offsets = self.offsets(entry_type, ref)
+        if not offsets:
+            return None
+        return json.loads(self.read_line(offsets[-1]))
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,99 @@
+# file: origin.py
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Script types of BIP-380 descriptors that can wrap a single key origin
+SCRIPT_TYPES = ("pkh", "wpkh", "sh(wpkh)", "tr", "wsh", "sh(wsh)", "sh")
+HARDENED = 0x80000000
+
+# Files use a handful of distinct origins, usually one per account
+ORIGIN_CACHE_SIZE = 1024
+
+_WRAPPER = re.compile(r"([a-z]+)\((.*)\)\Z", re.DOTALL)
+_KEY_ORIGIN = re.compile(r"\[([0-9a-fA-F]{8})((?:/[0-9]+['hH]?)*)\]\Z")
+
+
+class Origin(namedtuple("Origin", ("script_type", "fingerprint", "path"))):
+    """
+    Parsed abbreviated descriptor such as "wpkh([d34db33f/84'/0'/0'])":
+    script type "wpkh", lowercase fingerprint "d34db33f" and the BIP-32
+    path as a tuple of child numbers, hardened ones offset by HARDENED.
+    """
+    __slots__ = ()
+
+    @property
+    def path_string(self):
+        """Derivation path in the "84'/0'/0'" notation"""
+        return "/".join(f"{index - HARDENED}'" if index >= HARDENED else str(index) for index in self.path)
+
+    @property
+    def account(self):
+        """(fingerprint, path) of the account, the same for every script type"""
+        return self.fingerprint, self.path_string
+
+
+@lru_cache(maxsize=ORIGIN_CACHE_SIZE)
+def _parse_origin(origin):
+    """Origin tuple, or the error message if `origin` is invalid"""
+    script_types = []
+    inner = origin
+    while True:
+        match = _WRAPPER.match(inner)
+        if match is None:
+            break
+        script_types.append(match.group(1))
+        inner = match.group(2)
+    script_type = "(".join(script_types) + ")" * (len(script_types) - 1)
+    if script_type not in SCRIPT_TYPES:
+        return f"Unsupported script type in origin: {origin}"
+    match = _KEY_ORIGIN.match(inner)
+    if match is None:
+        return f"Invalid key origin in origin: {origin}"
+    path = []
+    for step in match.group(2).split("/")[1:]:
+        hardened = step[-1] in "'hH"
+        index = int(step[:-1] if hardened else step)
+        if index >= HARDENED:
+            return f"Derivation index out of range in origin: {origin}"
+        path.append(index + HARDENED if hardened else index)
+    return Origin(script_type, match.group(1).lower(), tuple(path))
+
+
+def parse_origin(origin):
+    """
+    Parse and validate the `origin` of a label, e.g. "wpkh([d34db33f/84'/0'/0'])"
+    or "sh(wpkh([a1b2c3d4/49'/0'/0']))". Results are memoized per origin
+    string. Raises ValueError for unsupported script types, fingerprints
+    that are not 8 hex digits and malformed derivation paths.
+    """
+    if not isinstance(origin, str):
+        raise TypeError("origin must be string")
+    result = _parse_origin(origin)
+    if isinstance(result, str):
+        raise ValueError(result)
+    return result
+
+
+def group_by_account(entries):
+    """
+    Group entries by the (fingerprint, path) of their origin, e.g.
+    ("d34db33f", "84'/0'/0'"). Entries without a valid origin are grouped
+    under None. Each distinct origin string is parsed once.
+    """
+    accounts = {}
+    groups = {}
+    for entry in entries:
+        origin = entry.get("origin")
+        if not isinstance(origin, str):
+            account = None
+        elif origin in accounts:
+            account = accounts[origin]
+        else:
+            try:
+                account = parse_origin(origin).account
+            except ValueError:
+                account = None
+            accounts[origin] = account
+        groups.setdefault(account, []).append(entry)
+    return groups
@@ -0,0 +1,157 @@
+# file: patch.py
+import bisect
+import heapq
+import io
+import json
+import os
+from .bip329_writer import BIP329JSONLWriter
+from .bip329_writer import canonical_dumps
+from .bip329_writer import file_mode_for
+from .diff import DELTA_REMOVE
+from .diff import iter_delta
+from .bloom import key_digest
+from .offset_index import INDEX_RECORD
+from .offset_index import LabelOffsetIndex
+from .offset_index import index_path_for
+from .offset_index import write_index
+
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def _copy_range(source, target, length):
+    while length > 0:
+        chunk = source.read(min(length, COPY_CHUNK_SIZE))
+        if not chunk:
+            break
+        target.write(chunk)
+        length -= len(chunk)
+
+
+def load_delta(delta, canonical=False):
+    """
+    Read a delta file (or an iterable of (op, type, ref, record) tuples)
+    into a dict of (type, ref) -> serialized line, or None for removals.
+    Records are validated like `BIP329JSONLWriter.write_label`; later
+    operations on the same key win.
+    """
+    operations = iter_delta(delta) if isinstance(delta, (str, os.PathLike)) else delta
+    # Only used for prepare_label, nothing is ever written to the sink
+    validator = BIP329JSONLWriter(io.StringIO())
+    dumps = canonical_dumps if canonical else json.dumps
+    changes = {}
+    for op, entry_type, ref, record in operations:
+        if op == DELTA_REMOVE:
+            changes[(entry_type, ref)] = None
+        else:
+            label_dict = validator.prepare_label(record)
+            changes[(label_dict["type"], label_dict["ref"])] = (dumps(label_dict) + "\n").encode("utf-8")
+    return changes
+
+
+def _patched_records(index, edits, edit_offsets, shifts, appended):
+    """
+    Index records of the patched file: the base records with dropped lines
+    left out and offsets moved by the size change of the edits before them,
+    merged with the records of the appended lines.
+    """
+    def shifted():
+        for digest, offset in index.iter_records():
+            if offset in edits and edits[offset] is None:
+                continue
+            edits_before = bisect.bisect_left(edit_offsets, offset)
+            yield INDEX_RECORD.pack(digest, offset + (shifts[edits_before - 1] if edits_before else 0))
+
+    return heapq.merge(shifted(), sorted(appended))
+
+
+def apply_delta(base_path, delta, output_path=None, canonical=False):
+    """
+    Apply `delta` (see `bip329.diff`) to the label file `base_path`.
+
+    'add' and 'change' are both upserts, 'remove' deletes every line of
+    the key. Only touched records are re-serialized: the LabelOffsetIndex
+    of the base file locates their lines, and the byte ranges between them
+    are copied verbatim without decoding. An upsert replaces the last line
+    of its key in place and drops earlier duplicates; new keys are appended
+    at the end, so a canonical base file is no longer sorted after adds.
+
+    The result is written to a temporary sibling of `output_path`
+    (default: `base_path`, i.e. patch in place) and renamed into place
+    with the permission bits of the file it replaces, or of the base file
+    for a new output. Its offset index is derived from the base index in
+    the same pass, so the next patch does not have to rebuild it. The
+    delta is held in memory. Returns a dict with the number of replaced,
+    added and removed records, lines dropped as duplicates and removals
+    of keys that were not present.
+    """
+    changes = load_delta(delta, canonical=canonical)
+    output_path = output_path or base_path
+    counts = {"replaced": 0, "added": 0, "removed": 0, "duplicates": 0, "not_found": 0}
+
+    # Offset of each touched line -> replacement bytes (None drops the line)
+    edits = {}
+    appends = []
+    index = LabelOffsetIndex.open(base_path)
+    try:
+        for (entry_type, ref), line in changes.items():
+            offsets = index.offsets(entry_type, ref)
+            if not offsets:
+                if line is None:
+                    counts["not_found"] += 1
+                else:
+                    appends.append((key_digest(entry_type, ref), line))
+                    counts["added"] += 1
+                continue
+            for offset in offsets[:-1]:
+                edits[offset] = None
+            counts["duplicates"] += len(offsets) - 1
+            edits[offsets[-1]] = line
+            counts["removed" if line is None else "replaced"] += 1
+
+        temp_path = f"{output_path}.patch.tmp"
+        output_index_path = index_path_for(output_path)
+        temp_index_path = f"{output_index_path}.patch.tmp"
+        try:
+            edit_offsets = sorted(edits)
+            # Size change of the file after each edit, cumulative
+            shifts = []
+            appended = []
+            with open(base_path, "rb") as source, open(temp_path, "w+b") as target:
+                position = 0
+                shift = 0
+                for offset in edit_offsets:
+                    _copy_range(source, target, offset - position)
+                    # Skip the old line, its length is only known after reading it
+                    source.seek(offset)
+                    old_length = len(source.readline())
+                    position = offset + old_length
+                    if edits[offset] is not None:
+                        target.write(edits[offset])
+                    shift += len(edits[offset] or b"") - old_length
+                    shifts.append(shift)
+                source.seek(position)
+                _copy_range(source, target, os.path.getsize(base_path) - position)
+                if appends:
+                    if target.tell():
+                        target.seek(-1, os.SEEK_END)
+                        if target.read(1) != b"\n":
+                            target.write(b"\n")
+                    for digest, line in appends:
+                        appended.append(INDEX_RECORD.pack(digest, target.tell()))
+                        target.write(line)
+            # The temporary file has the default mode, keep e.g. 0600 label files private
+            os.chmod(temp_path, file_mode_for(output_path if os.path.exists(output_path) else base_path))
+            os.replace(temp_path, output_path)
+            count = len(index) - counts["duplicates"] - counts["removed"] + counts["added"]
+            write_index(temp_index_path, os.stat(output_path), count,
+                        _patched_records(index, edits, edit_offsets, shifts, appended))
+            index.close()
+            os.replace(temp_index_path, output_index_path)
+        except BaseException:
+            for path in (temp_path, temp_index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+    finally:
+        index.close()
+    return counts
@@ -0,0 +1,166 @@
+# file: sharding.py
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from .bip329_parser import BIP329_Parser
+from .bip329_writer import BIP329JSONLWriter
+from .constants import VALID_TYPE_KEYS
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+SHARD_BY = ("type", "hash")
+
+
+def ref_shard(ref, num_shards):
+    """Stable shard number of `ref`, independent of PYTHONHASHSEED and platform"""
+    digest = hashlib.blake2b(ref.encode("utf-8", errors="surrogatepass"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % num_shards
+
+
+def shard_name(shard_by, shard):
+    if shard_by == "type":
+        return f"labels-{shard}.jsonl"
+    return f"labels-{shard:04d}.jsonl"
+
+
+def _key_of(line):
+    """(type, ref) of a dict or accessor-style record, before validation"""
+    try:
+        if callable(getattr(line, "type", None)) and callable(getattr(line, "ref", None)):
+            return line.type(), line.ref()
+        return line["type"], line["ref"]
+    except (KeyError, TypeError):
+        raise ValueError(
+            "Invalid BIP-329 record: 'type', 'ref', and 'label' attributes or keys are required, and only valid fields are exported.")
+
+
+def _load_shard(path, allow_boolsy):
+    """Worker: parse one shard file"""
+    return BIP329_Parser(path, allow_boolsy=allow_boolsy).load_entries()
+
+
+class ShardedJSONLWriter:
+    """
+    Write labels into several JSONL files in `directory`.
+
+    With `shard_by='type'` there is one file per record type, with
+    `shard_by='hash'` records are spread over `num_shards` files by a
+    stable hash of `ref`, so all records of a key land in the same shard.
+    `close()` writes `manifest.json` listing the shards and their record
+    counts, which ShardedLabelReader reads back.
+
+    Further keyword arguments are passed to each shard's BIP329JSONLWriter.
+    """
+
+    def __init__(self, directory, shard_by="hash", num_shards=8, **writer_options):
+        if shard_by not in SHARD_BY:
+            raise ValueError(f"Invalid shard_by: {shard_by}")
+        if shard_by == "hash" and num_shards < 1:
+            raise ValueError("num_shards must be positive")
+        self.directory = directory
+        self.shard_by = shard_by
+        self.num_shards = len(VALID_TYPE_KEYS) if shard_by == "type" else num_shards
+        self.writer_options = writer_options
+        self.writers = {}
+        self.records = {}
+        self.is_closed = False
+        os.makedirs(directory, exist_ok=True)
+
+    def shard_for(self, entry_type, ref):
+        return entry_type if self.shard_by == "type" else ref_shard(ref, self.num_shards)
+
+    def write_label(self, line):
+        if self.is_closed:
+            raise ValueError("Writer is closed.")
+        entry_type, ref = _key_of(line)
+        assert entry_type in VALID_TYPE_KEYS
+        shard = self.shard_for(entry_type, ref)
+        writer = self.writers.get(shard)
+        if writer is None:
+            path = os.path.join(self.directory, shard_name(self.shard_by, shard))
+            writer = self.writers[shard] = BIP329JSONLWriter(path, **self.writer_options)
+            self.records[shard] = 0
+        writer.write_label(line)
+        self.records[shard] += 1
+
+    def close(self):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        shards = []
+        for shard, writer in self.writers.items():
+            writer.close()
+            shards.append({"shard": shard, "path": shard_name(self.shard_by, shard),
+                           "records": self.records[shard] - writer.duplicates})
+        shards.sort(key=lambda item: VALID_TYPE_KEYS.index(item["shard"]) if self.shard_by == "type" else item["shard"])
+        manifest = {"version": MANIFEST_VERSION, "shard_by": self.shard_by,
+                    "num_shards": self.num_shards, "shards": shards}
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ShardedLabelReader:
+    """
+    Read a directory written by ShardedJSONLWriter.
+
+    `iter_entries` parses the shards with BIP329_Parser in up to `jobs`
+    worker processes, yielding entries shard by shard in manifest order.
+    `lookup` only parses the shard a key belongs to.
+    """
+
+    def __init__(self, directory, allow_boolsy=False):
+        self.directory = directory
+        self.allow_boolsy = allow_boolsy
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("shard_by") not in SHARD_BY:
+            raise ValueError(f"Unsupported shard manifest in {directory}")
+        self.shard_by = manifest["shard_by"]
+        self.num_shards = manifest["num_shards"]
+        self.shards = {item["shard"]: item for item in manifest["shards"]}
+
+    def __len__(self):
+        return sum(item["records"] for item in self.shards.values())
+
+    def paths(self):
+        return [os.path.join(self.directory, item["path"]) for item in self.shards.values()]
+
+    def shard_path(self, entry_type, ref):
+        """Path of the shard holding (type, ref), or None if that shard is empty"""
+        shard = entry_type if self.shard_by == "type" else ref_shard(ref, self.num_shards)
+        item = self.shards.get(shard)
+        return None if item is None else os.path.join(self.directory, item["path"])
+
+    def iter_entries(self, jobs=None):
+        paths = self.paths()
+        jobs = min(jobs or os.cpu_count() or 1, len(paths))
+        if jobs <= 1:
+            for path in paths:
+                yield from BIP329_Parser(path, allow_boolsy=self.allow_boolsy).iter_entries()
+            return
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for entries in executor.map(_load_shard, paths, [self.allow_boolsy] * len(paths)):
+                yield from entries
+
+    def load_entries(self, jobs=None):
+        return list(self.iter_entries(jobs))
+
+    def lookup(self, entry_type, ref):
+        """Return the last record for (type, ref), or None"""
+        path = self.shard_path(entry_type, ref)
+        if path is None:
+            return None
+        found = None
+        for entry in BIP329_Parser(path, allow_boolsy=self.allow_boolsy).iter_entries():
+            if entry["ref"] == ref and entry["type"] == entry_type:
+                found = entry
+        return found
@@ -0,0 +1,175 @@
+# file: sqlite_store.py
+import io
+import json
+import logging
+import sqlite3
+from .bip329_parser import BIP329_Parser
+from .bip329_writer import BIP329JSONLWriter
+
+DEFAULT_BATCH_SIZE = 10000
+# SQLite integers are signed 64-bit
+SQLITE_INTEGER_RANGE = (-2 ** 63, 2 ** 63 - 1)
+
+SCHEMA = (
+    # Records are kept verbatim in `record`, the other columns are for lookups
+    """CREATE TABLE IF NOT EXISTS labels (
+        type TEXT NOT NULL,
+        ref TEXT NOT NULL,
+        label TEXT,
+        origin TEXT,
+        height INTEGER,
+        record TEXT NOT NULL,
+        PRIMARY KEY (type, ref)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS labels_origin ON labels (origin)",
+    "CREATE INDEX IF NOT EXISTS labels_height ON labels (height)",
+)
+
+UPSERT = "INSERT OR REPLACE INTO labels (type, ref, label, origin, height, record) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+def _row(label_dict):
+    height = label_dict.get("height")
+    if height is not None and not SQLITE_INTEGER_RANGE[0] <= height <= SQLITE_INTEGER_RANGE[1]:
+        raise ValueError(f"height {height} does not fit an SQLite integer")
+    return (label_dict["type"], label_dict["ref"], label_dict.get("label"), label_dict.get("origin"),
+            label_dict.get("height"), json.dumps(label_dict))
+
+
+class LabelStore:
+    """
+    Indexed on-disk label storage in an SQLite database (stdlib `sqlite3`).
+
+    One row per (type, ref), so later records replace earlier ones. Rows are
+    indexed by (type, ref), origin and height, and `export` streams them
+    back through BIP329JSONLWriter ordered by (type, ref). The database
+    uses WAL journaling so readers are not blocked by imports.
+
+    `invalid_entries` counts the records the last import rejected, both
+    the parser's and records the store cannot hold (a height beyond the
+    64-bit range of SQLite integers).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Transactions are managed explicitly, see _write_batches
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self._validator = None
+        self.invalid_entries = 0
+
+    def _prepare(self, line):
+        if self._validator is None:
+            # Only used for prepare_label, nothing is ever written to the sink
+            self._validator = BIP329JSONLWriter(io.StringIO())
+        return self._validator.prepare_label(line)
+
+    def _write_batches(self, label_dicts, batch_size, skip_invalid=False):
+        count = 0
+        batch = []
+        self.connection.execute("BEGIN")
+        try:
+            for label_dict in label_dicts:
+                try:
+                    row = _row(label_dict)
+                except ValueError as e:
+                    if not skip_invalid:
+                        raise
+                    logging.warning(f"Skipping {label_dict['type']} {label_dict['ref']}: {e}")
+                    self.invalid_entries += 1
+                    continue
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self.connection.executemany(UPSERT, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self.connection.executemany(UPSERT, batch)
+                count += len(batch)
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        return count
+
+    def import_file(self, jsonl_path, batch_size=DEFAULT_BATCH_SIZE, allow_boolsy=False):
+        """
+        Bulk-import valid entries of a label file in a single transaction,
+        inserting `batch_size` rows per executemany call. Returns the number
+        of records imported (including ones replacing an existing key).
+        Records the store cannot hold are skipped and counted in
+        `invalid_entries` rather than aborting the import.
+        """
+        parser = BIP329_Parser(jsonl_path, allow_boolsy=allow_boolsy)
+        self.invalid_entries = 0
+        count = self._write_batches(parser.iter_entries(), batch_size, skip_invalid=True)
+        self.invalid_entries += parser.invalid_entries
+        return count
+
+    def upsert(self, line):
+        """Validate and store one record, replacing any record with the same key"""
+        return self.upsert_many([line])
+
+    def upsert_many(self, lines, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Validate and store records (dicts or accessor objects) in one
+        transaction; an invalid record raises ValueError and rolls it back.
+        """
+        return self._write_batches((self._prepare(line) for line in lines), batch_size)
+
+    def delete(self, entry_type, ref):
+        """Remove the record for (type, ref), return True if it existed"""
+        cursor = self.connection.execute("DELETE FROM labels WHERE type = ? AND ref = ?", (entry_type, ref))
+        return cursor.rowcount > 0
+
+    def get(self, entry_type, ref):
+        row = self.connection.execute("SELECT record FROM labels WHERE type = ? AND ref = ?",
+                                      (entry_type, ref)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def __contains__(self, key):
+        return self.connection.execute("SELECT 1 FROM labels WHERE type = ? AND ref = ?", key).fetchone() is not None
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+
+    def query(self, entry_type=None, origin=None, min_height=None, max_height=None):
+        """Yield records matching all given criteria, ordered by (type, ref)"""
+        conditions = []
+        params = []
+        for column, operator, value in (("type", "=", entry_type), ("origin", "=", origin),
+                                        ("height", ">=", min_height), ("height", "<=", max_height)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        sql = "SELECT record FROM labels"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY type, ref"
+        for (record,) in self.connection.execute(sql, params):
+            yield json.loads(record)
+
+    def export(self, filename, canonical=False, **writer_options):
+        """
+        Write all records to `filename` (path or text stream) through
+        BIP329JSONLWriter, ordered by (type, ref) straight from the primary
+        key. Returns the number of records written.
+        """
+        count = 0
+        with BIP329JSONLWriter(filename, canonical=canonical, **writer_options) as writer:
+            for record in self.query():
+                writer.write_label(record)
+                count += 1
+        return count
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
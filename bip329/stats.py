@@ -0,0 +1,40 @@
+# file: stats.py
+
+
+class StageStats:
+    """
+    Accumulates per-stage wall time, byte and record counts.
+
+    Pass an instance as `stats=` to BIP329_Parser, BIP329JSONLWriter or
+    BIP329JSONLEncryptedWriter. Instrumentation is skipped entirely when
+    no stats object is given.
+
+    If `callback` is set it is called as
+    `callback(stage, elapsed_ns, records, nbytes)` for every measurement,
+    e.g. to forward timings to a metrics system.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.stages = {}
+
+    def add(self, stage, elapsed_ns, records=0, nbytes=0):
+        totals = self.stages.get(stage)
+        if totals is None:
+            totals = self.stages[stage] = {"calls": 0, "ns": 0, "records": 0, "bytes": 0}
+        totals["calls"] += 1
+        totals["ns"] += elapsed_ns
+        totals["records"] += records
+        totals["bytes"] += nbytes
+        if self.callback is not None:
+            self.callback(stage, elapsed_ns, records, nbytes)
+
+    def as_dict(self):
+        """Return a copy of the totals, with seconds added for convenience"""
+        result = {}
+        for stage, totals in self.stages.items():
+            result[stage] = dict(totals, seconds=totals["ns"] / 1e9)
+        return result
+
+    def reset(self):
+        self.stages = {}
@@ -0,0 +1,62 @@
+# file: test_benchmarks.py
+import json
+import os
+import tempfile
+import unittest
+from bip329.benchmarks.generator import LabelCorpusGenerator
+from bip329.benchmarks.run import BENCHMARKS
+from bip329.benchmarks.run import main
+from bip329.benchmarks.run import run_benchmarks
+from bip329.bip329_parser import BIP329_Parser
+
+
+class TestLabelCorpusGenerator(unittest.TestCase):
+    def test_same_seed_same_corpus(self):
+        first = list(LabelCorpusGenerator(seed=7, invalid_ratio=0.2).lines(500))
+        second = list(LabelCorpusGenerator(seed=7, invalid_ratio=0.2).lines(500))
+        third = list(LabelCorpusGenerator(seed=8, invalid_ratio=0.2).lines(500))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+
+    def test_valid_corpus_parses_completely(self):
+        generator = LabelCorpusGenerator(seed=1, invalid_ratio=0.0, long_label_ratio=0.0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corpus.jsonl")
+            generator.write_file(path, 1000)
+            entries = BIP329_Parser(path).load_entries()
+        self.assertEqual(len(entries), 1000)
+        self.assertEqual({entry["type"] for entry in entries}, {"tx", "addr", "pubkey", "input", "output", "xpub"})
+
+    def test_invalid_ratio(self):
+        generator = LabelCorpusGenerator(seed=3, invalid_ratio=0.25)
+        kinds = [kind for kind, _ in generator.iter_records(4000)]
+        invalid_share = sum(1 for kind in kinds if kind is not None) / len(kinds)
+        self.assertAlmostEqual(invalid_share, 0.25, delta=0.03)
+
+    def test_invalid_ratio_out_of_range(self):
+        with self.assertRaises(ValueError):
+            LabelCorpusGenerator(invalid_ratio=1.5)
+
+
+class TestRunBenchmarks(unittest.TestCase):
+    def test_report_is_json(self):
+        report = run_benchmarks(sizes=[50], seed=5)
+        self.assertEqual(len(report["results"]), len(BENCHMARKS))
+        for result in report["results"]:
+            self.assertEqual(result["size"], 50)
+            self.assertGreater(result["records_per_second"], 0)
+            self.assertGreater(result["peak_memory_bytes"], 0)
+        json.dumps(report)
+
+    def test_main_writes_output_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "report.json")
+            main(["--sizes", "20", "--benchmark", "parser.load_entries", "--no-memory", "--output", output])
+            with open(output, encoding="utf-8") as file:
+                report = json.load(file)
+        self.assertEqual(len(report["results"]), 1)
+        self.assertIsNone(report["results"][0]["peak_memory_bytes"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -183,6 +183,44 @@ class TestBIP329JSONLEncryptedWriter(unittest.TestCase):
 
         self.assertIn("Writer is closed", str(context.exception))
 
+    def decrypt_labels(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            decrypt_files(self.test_filename, temp_dir, self.passphrase)
+            self.assertEqual(os.listdir(temp_dir), ['test_labels.jsonl'])
+            with open(os.path.join(temp_dir, 'test_labels.jsonl'), 'r', encoding='utf-8') as file:
+                return [json.loads(line) for line in file]
+
+    def test_small_export_stays_in_memory(self):
+        labels = [{"type": "tx", "ref": f"ref{i}", "label": "in memory"} for i in range(10)]
+        for label in labels:
+            self.writer.write_label(label)
+        self.assertFalse(self.writer.temp_file.rolled)
+        self.writer.close()
+        self.assertEqual(self.decrypt_labels(), labels)
+
+    def test_large_export_spills_to_disk(self):
+        self.writer = BIP329JSONLEncryptedWriter(self.test_filename, self.passphrase, spool_max_size=256)
+        labels = [{"type": "tx", "ref": f"ref{i}", "label": "spilled"} for i in range(50)]
+        for label in labels:
+            self.writer.write_label(label)
+        self.assertTrue(self.writer.temp_file.rolled)
+        self.writer.close()
+        self.assertEqual(self.decrypt_labels(), labels)
+
+    def test_last_wins_uses_named_temp_file(self):
+        self.writer = BIP329JSONLEncryptedWriter(self.test_filename, self.passphrase, dedupe='last')
+        self.assertFalse(self.writer.spooled)
+        self.writer.write_label({"type": "tx", "ref": "a", "label": "old"})
+        self.writer.write_label({"type": "tx", "ref": "a", "label": "new"})
+        temp_name = self.writer.temp_file.name
+        self.writer.close()
+        self.assertFalse(os.path.exists(temp_name))
+        self.assertEqual(self.writer.records_written, 1)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            decrypt_files(self.test_filename, temp_dir, self.passphrase)
+            with open(os.path.join(temp_dir, os.listdir(temp_dir)[0]), 'r', encoding='utf-8') as file:
+                self.assertEqual([json.loads(line)["label"] for line in file], ["new"])
+
 
 if __name__ == '__main__':
     unittest.main()
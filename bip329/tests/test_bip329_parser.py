@@ -382,5 +382,93 @@ class TestBIP329Parser(unittest.TestCase):
                 os.remove(test_filename)
 
 
+class TestFilters(unittest.TestCase):
+    def setUp(self):
+        self.test_filename = 'test_filtered_labels.jsonl'
+        lines = [
+            '{"type": "tx", "ref": "t1", "label": "Payment"}',
+            '{"type":"output","ref":"t1:0","label":"output","spendable":true}',
+            '{"type": "output", "ref": "t1:1", "label": "Caf\\u00e9"}',
+            '{"type": "addr", "ref": "a1", "label": "ref", "keypath": "/0/1"}',
+            'not json',
+            '{"type": "output", "ref": "t1:3", "label": 5}',
+        ]
+        with open(self.test_filename, 'w') as file:
+            file.write("\n".join(lines) + "\n")
+
+    def tearDown(self):
+        if os.path.exists(self.test_filename):
+            os.remove(self.test_filename)
+
+    def test_filter_by_type(self):
+        parser = BIP329_Parser(self.test_filename, types={"output"})
+        with self.assertLogs(level='WARNING'):
+            entries = parser.load_entries()
+        self.assertEqual([entry["ref"] for entry in entries], ["t1:0", "t1:1"])
+        self.assertEqual(entries[1]["label"], "Caf\u00e9")
+        # tx and addr lines are rejected before decoding
+        self.assertEqual(parser.filtered_entries, 3)
+        self.assertEqual(parser.malformed_lines, 0)
+        self.assertEqual(parser.invalid_entries, 1)
+
+    def test_filter_by_ref(self):
+        parser = BIP329_Parser(self.test_filename, refs=["t1", "a1", "t1:1"])
+        self.assertEqual([(entry["type"], entry["ref"]) for entry in parser.load_entries()],
+                         [("tx", "t1"), ("output", "t1:1"), ("addr", "a1")])
+
+    def test_filter_by_type_and_ref(self):
+        parser = BIP329_Parser(self.test_filename, types=["tx", "addr"], refs=["a1", "t1:0"])
+        self.assertEqual([entry["ref"] for entry in parser.load_entries()], ["a1"])
+        self.assertEqual(parser.filtered_entries, 5)
+
+    def test_prescan_never_drops_matches(self):
+        parser = BIP329_Parser(self.test_filename)
+        for line in ('{"ref": "x", "type": "tx"}', '{ "type" : "tx" , "ref" : "x" }'):
+            parser.types = frozenset({"tx"})
+            parser.refs = frozenset({"x"})
+            self.assertTrue(parser._prescan(line))
+        parser.refs = frozenset({"y"})
+        self.assertFalse(parser._prescan('{"type": "tx", "ref": "x", "label": "y"}'))
+
+
+class TestProjection(unittest.TestCase):
+    def setUp(self):
+        self.test_filename = 'test_projected_labels.jsonl'
+        lines = [
+            '{"type": "addr", "ref": "a1", "label": "Savings", "keypath": "/0/1", "heights": [1, 2, 3]}',
+            '{"type": "tx", "ref": "t1", "label": "Payment", "rate": {"USD": 1}, "height": "bad"}',
+            '{"ref": "t2", "label": "No type"}',
+            '{"type": "tx", "ref": "t3", "label": 5}',
+        ]
+        with open(self.test_filename, 'w') as file:
+            file.write("\n".join(lines) + "\n")
+
+    def tearDown(self):
+        if os.path.exists(self.test_filename):
+            os.remove(self.test_filename)
+
+    def test_keeps_requested_fields(self):
+        parser = BIP329_Parser(self.test_filename, fields=["label"])
+        with self.assertLogs(level='WARNING') as log:
+            entries = parser.load_entries()
+        self.assertEqual(entries, [{"type": "addr", "ref": "a1", "label": "Savings"},
+                                   {"type": "tx", "ref": "t1", "label": "Payment"}])
+        # Required keys are still enforced, dropped fields are not validated
+        self.assertEqual(parser.invalid_entries, 2)
+        self.assertNotIn("height", ''.join(log.output))
+
+    def test_skips_validation_of_dropped_fields(self):
+        parser = BIP329_Parser(self.test_filename, fields=["keypath"])
+        with self.assertLogs(level='WARNING'):
+            entries = parser.load_entries()
+        self.assertEqual(entries, [{"type": "addr", "ref": "a1", "keypath": "/0/1"},
+                                   {"type": "tx", "ref": "t1"},
+                                   {"type": "tx", "ref": "t3"}])
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            BIP329_Parser(self.test_filename, fields=["label", "colour"])
+
+
 if __name__ == '__main__':
     unittest.main()
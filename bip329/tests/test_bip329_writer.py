@@ -2,7 +2,12 @@
 import unittest
 import json
 import os
+import glob
+import tempfile
+from unittest import mock
+from bip329.bip329_parser import BIP329_Parser
 from bip329.bip329_writer import BIP329JSONLWriter
+from bip329.bip329_writer import _accessor_plan
 
 
 class TestBIP329JSONLWriter(unittest.TestCase):
@@ -329,6 +334,114 @@ class TestBIP329JSONLWriter(unittest.TestCase):
             self.writer.write_label(invalid_obj)
         self.assertIn("Invalid BIP-329 record", str(context.exception))
 
+    def test_accessor_plan_cache(self):
+        """Object-style records of one class share a cached accessor plan"""
+        class LabelRow:
+            def __init__(self, ref, height=None):
+                self._ref = ref
+                self._height = height
+
+            def type(self):
+                return "tx"
+
+            def ref(self):
+                return self._ref
+
+            def label(self):
+                return f"Row {self._ref}"
+
+            def height(self):
+                return self._height
+
+            def __contains__(self, key):
+                return False
+
+        rows = [LabelRow("a" * 64, 100), LabelRow("b" * 64)]
+        for row in rows:
+            self.writer.write_label(row)
+        methods, instance_fields, probe_fields = _accessor_plan(LabelRow)
+        self.assertEqual(methods, frozenset({"type", "ref", "label", "height"}))
+        self.assertIn("origin", instance_fields)
+        self.assertEqual(probe_fields, ())
+        self.assertEqual(_accessor_plan(dict), (frozenset(), (), ()))
+
+        with open(self.test_filename, 'r') as file:
+            written = [json.loads(line) for line in file]
+        self.assertEqual(written, [
+            {"type": "tx", "ref": "a" * 64, "label": f"Row {'a' * 64}", "height": 100},
+            {"type": "tx", "ref": "b" * 64, "label": f"Row {'b' * 64}"},
+        ])
+
+    def test_instance_level_accessors(self):
+        """Callables stored on the instance are accessors, like before the plan cache"""
+        class InstanceLabel:
+            def __init__(self, ref, label=None):
+                self.type = lambda: "addr"
+                self.ref = lambda: ref
+                if label is not None:
+                    self.label = lambda: label
+
+            def __contains__(self, key):
+                return False
+
+        self.writer.write_label(InstanceLabel("bc1qa", "Savings"))
+        self.writer.write_label(InstanceLabel("bc1qb"))
+        with open(self.test_filename, 'r') as file:
+            written = [json.loads(line) for line in file]
+        self.assertEqual(written, [{"type": "addr", "ref": "bc1qa", "label": "Savings"},
+                                   {"type": "addr", "ref": "bc1qb"}])
+
+    def test_accessor_plan_per_field(self):
+        """A descriptor only makes its own field probed per record"""
+        class ColumnLabel:
+            def __init__(self, ref, label):
+                self._ref = ref
+                self._label = label
+
+            def type(self):
+                return "tx"
+
+            def ref(self):
+                return self._ref
+
+            @property
+            def label(self):
+                return lambda: self._label
+
+            def __contains__(self, key):
+                return False
+
+        self.writer.write_label(ColumnLabel("a" * 64, "Column"))
+        methods, _, probe_fields = _accessor_plan(ColumnLabel)
+        self.assertEqual(methods, frozenset({"type", "ref"}))
+        self.assertEqual(probe_fields, ("label",))
+        with open(self.test_filename, 'r') as file:
+            self.assertEqual(json.loads(file.read()), {"type": "tx", "ref": "a" * 64, "label": "Column"})
+
+    def test_accessor_plan_dynamic_class(self):
+        """Classes resolving attributes dynamically are probed per record"""
+        class DynamicLabel:
+            def __init__(self, **fields):
+                self._fields = fields
+
+            def __getattr__(self, name):
+                if name in self._fields:
+                    return lambda: self._fields[name]
+                raise AttributeError(name)
+
+            def __contains__(self, key):
+                return False
+
+        self.writer.write_label(DynamicLabel(type="addr", ref="bc1qa", label="A", spendable=False))
+        self.writer.write_label(DynamicLabel(type="addr", ref="bc1qb"))
+        self.assertEqual(_accessor_plan(DynamicLabel)[0], frozenset())
+        self.assertIn("spendable", _accessor_plan(DynamicLabel)[2])
+
+        with open(self.test_filename, 'r') as file:
+            written = [json.loads(line) for line in file]
+        self.assertEqual(written, [{"type": "addr", "ref": "bc1qa", "label": "A"},
+                                   {"type": "addr", "ref": "bc1qb"}])
+
     def test_remove_existing_behavior(self):
         """Test remove_existing parameter behavior"""
         # Create existing file
@@ -492,5 +605,283 @@ class TestBIP329JSONLWriter(unittest.TestCase):
         self.assertEqual(len(written_label['label']), 255)
 
 
+class TestCanonicalExport(unittest.TestCase):
+    def setUp(self):
+        self.test_filename = 'test_canonical_labels.jsonl'
+        self.labels = [
+            {"type": "tx", "ref": "b", "rate": {"USD": 2, "EUR": 1}, "label": "tx b", "height": 5},
+            {"label": "addr a", "ref": "a", "type": "addr"},
+            {"type": "tx", "ref": "a", "label": "tx a first"},
+            {"type": "tx", "ref": "a!", "label": "tx a!"},
+            {"type": "tx", "ref": "a", "label": "tx a second"},
+        ]
+
+    def tearDown(self):
+        if os.path.exists(self.test_filename):
+            os.remove(self.test_filename)
+
+    def export(self, labels, **kwargs):
+        with BIP329JSONLWriter(self.test_filename, canonical=True, **kwargs) as writer:
+            for label in labels:
+                writer.write_label(label)
+        with open(self.test_filename, 'r', encoding='utf-8') as file:
+            return file.read()
+
+    def test_sorted_by_type_and_ref(self):
+        lines = self.export(self.labels).splitlines()
+        keys = [(json.loads(line)['type'], json.loads(line)['ref']) for line in lines]
+        self.assertEqual(keys, [("addr", "a"), ("tx", "a"), ("tx", "a"), ("tx", "a!"), ("tx", "b")])
+        # Stable: equal keys keep call order
+        self.assertEqual(json.loads(lines[1])['label'], "tx a first")
+        # Canonical field order and sorted currencies
+        self.assertEqual(lines[4], '{"type": "tx", "ref": "b", "label": "tx b", "height": 5, "rate": {"EUR": 1, "USD": 2}}')
+
+    def test_same_data_same_bytes(self):
+        first = self.export(self.labels)
+        second = self.export(list(reversed(self.labels)), sort_buffer_records=2)
+        # Only the order of the two ("tx", "a") records depends on input order
+        self.assertEqual(sorted(first.splitlines()), sorted(second.splitlines()))
+        self.assertEqual(self.export(self.labels, sort_buffer_records=1), first)
+
+    def test_canonical_last_wins(self):
+        lines = self.export(self.labels, dedupe='last', sort_buffer_records=2).splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(json.loads(lines[1])['label'], "tx a second")
+
+
+class TestAtomicWrites(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_filename = os.path.join(self.temp_dir.name, 'labels.jsonl')
+        with open(self.test_filename, 'w', encoding='utf-8') as file:
+            file.write('{"type": "tx", "ref": "old", "label": "old export"}\n')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self):
+        with open(self.test_filename, 'r', encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_write_after_close(self):
+        for options in ({"atomic": True}, {"canonical": True}):
+            writer = BIP329JSONLWriter(self.test_filename, **options)
+            writer.write_label({"type": "tx", "ref": "a", "label": "new export"})
+            writer.close()
+            with self.assertRaises(ValueError):
+                writer.write_label({"type": "tx", "ref": "b", "label": "too late"})
+            with self.assertRaises(ValueError):
+                writer.write_columns({"type": ["tx"], "ref": ["c"]})
+            self.assertEqual(self.read(), [{"type": "tx", "ref": "a", "label": "new export"}])
+        self.assertEqual(os.listdir(self.temp_dir.name), ['labels.jsonl'])
+
+    def test_existing_file_kept_until_close(self):
+        writer = BIP329JSONLWriter(self.test_filename, atomic=True)
+        writer.write_label({"type": "tx", "ref": "new", "label": "new export"})
+        self.assertEqual(self.read()[0]['ref'], "old")
+        writer.close()
+        self.assertEqual([label['ref'] for label in self.read()], ["new"])
+        self.assertEqual(os.listdir(self.temp_dir.name), ['labels.jsonl'])
+
+    @unittest.skipIf(os.name == 'nt', "POSIX permission bits")
+    def test_final_file_mode(self):
+        umask = os.umask(0o022)
+        try:
+            new_filename = os.path.join(self.temp_dir.name, 'new.jsonl')
+            with BIP329JSONLWriter(new_filename, atomic=True) as writer:
+                writer.write_label({"type": "tx", "ref": "new"})
+            self.assertEqual(os.stat(new_filename).st_mode & 0o777, 0o644)
+
+            os.chmod(self.test_filename, 0o640)
+            with BIP329JSONLWriter(self.test_filename, atomic=True) as writer:
+                writer.write_label({"type": "tx", "ref": "new"})
+            self.assertEqual(os.stat(self.test_filename).st_mode & 0o777, 0o640)
+        finally:
+            os.umask(umask)
+
+    def test_exception_discards_temp_file(self):
+        with self.assertRaises(RuntimeError):
+            with BIP329JSONLWriter(self.test_filename, atomic=True, fsync='close') as writer:
+                writer.write_label({"type": "tx", "ref": "new", "label": "new export"})
+                raise RuntimeError("interrupted export")
+        self.assertEqual(self.read()[0]['ref'], "old")
+        self.assertEqual(os.listdir(self.temp_dir.name), ['labels.jsonl'])
+
+    def test_backup_on_commit(self):
+        with BIP329JSONLWriter(self.test_filename, remove_existing=False, atomic=True) as writer:
+            writer.write_label({"type": "tx", "ref": "new", "label": "new export"})
+        self.assertEqual(self.read()[0]['ref'], "new")
+        backups = glob.glob(self.test_filename + '.*.bak')
+        self.assertEqual(len(backups), 1)
+        with open(backups[0], 'r', encoding='utf-8') as file:
+            self.assertEqual(json.loads(file.readline())['ref'], "old")
+
+    def test_atomic_with_dedupe_and_canonical(self):
+        labels = [{"type": "tx", "ref": ref, "label": f"label {i}"} for i, ref in enumerate("bab")]
+        for options in ({"dedupe": 'last'}, {"dedupe": 'last', "canonical": True}):
+            with BIP329JSONLWriter(self.test_filename, atomic=True, fsync='close', **options) as writer:
+                for label in labels:
+                    writer.write_label(label)
+            self.assertEqual(sorted(label['label'] for label in self.read()), ["label 1", "label 2"])
+            self.assertEqual(os.listdir(self.temp_dir.name), ['labels.jsonl'])
+
+    def test_group_commit(self):
+        with mock.patch('bip329.bip329_writer.os.fsync') as fsync:
+            with BIP329JSONLWriter(self.test_filename, fsync='group', fsync_records=2) as writer:
+                for i in range(5):
+                    writer.write_label({"type": "tx", "ref": str(i), "label": "label"})
+                self.assertEqual(fsync.call_count, 2)
+            # The final fsync on close
+            self.assertEqual(fsync.call_count, 3)
+        self.assertEqual(len(self.read()), 5)
+
+    def test_no_fsync_by_default(self):
+        with mock.patch('bip329.bip329_writer.os.fsync') as fsync:
+            with BIP329JSONLWriter(self.test_filename, atomic=True) as writer:
+                writer.write_label({"type": "tx", "ref": "new", "label": "new export"})
+        fsync.assert_not_called()
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            BIP329JSONLWriter(self.test_filename, fsync='always')
+        with self.assertRaises(ValueError):
+            BIP329JSONLWriter(self.test_filename, fsync='group', fsync_records=None)
+        with tempfile.TemporaryFile('w') as stream, self.assertRaises(ValueError):
+            BIP329JSONLWriter(stream, atomic=True)
+
+
+class TestWriteColumns(unittest.TestCase):
+    def setUp(self):
+        self.test_filename = 'test_column_labels.jsonl'
+
+    def tearDown(self):
+        if os.path.exists(self.test_filename):
+            os.remove(self.test_filename)
+
+    def read(self):
+        with open(self.test_filename, 'r', encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_matches_write_label(self):
+        rows = [
+            {"type": "tx", "ref": "a" * 64, "label": "Payment", "height": 800000, "fee": 150, "value": -5000},
+            {"type": "output", "ref": "a" * 64 + ":0", "label": "Change", "spendable": False, "value": 4850},
+            {"type": "addr", "ref": "bc1qaddr", "origin": "wpkh([d34db33f/84'/0'/0'])", "heights": [1, 2]},
+        ]
+        with BIP329JSONLWriter(self.test_filename) as writer:
+            for row in rows:
+                writer.write_label(row)
+        expected = self.read()
+
+        fields = ("type", "ref", "label", "origin", "spendable", "height", "fee", "value", "heights")
+        columns = {field: [row.get(field) for row in rows] for field in fields}
+        with BIP329JSONLWriter(self.test_filename) as writer:
+            self.assertEqual(writer.write_columns(columns), 3)
+        self.assertEqual(self.read(), expected)
+
+    def test_validity_masks(self):
+        columns = {"type": ("tx", "tx"), "ref": ("a", "b"), "height": (0, 7)}
+        with BIP329JSONLWriter(self.test_filename) as writer:
+            writer.write_columns(columns, valid={"height": [False, True]})
+        self.assertEqual(self.read(), [{"type": "tx", "ref": "a"}, {"type": "tx", "ref": "b", "height": 7}])
+
+    def test_split_by_type(self):
+        columns = {
+            "type": ["tx", "addr", "tx", "addr"],
+            "ref": ["t1", "a1", "t2", "a2"],
+            "fee": [10, None, 20, None],
+            "keypath": [None, "/0/1", None, "/0/2"],
+            "spendable": [None, True, None, None],
+        }
+        with self.assertLogs(level='WARNING') as log:
+            with BIP329JSONLWriter(self.test_filename) as writer:
+                writer.write_columns(columns)
+        self.assertEqual(self.read(), [
+            {"type": "tx", "ref": "t1", "fee": 10},
+            {"type": "tx", "ref": "t2", "fee": 20},
+            {"type": "addr", "ref": "a1", "keypath": "/0/1"},
+            {"type": "addr", "ref": "a2", "keypath": "/0/2"},
+        ])
+        self.assertIn("Field 'spendable' not valid for type 'addr', removing", ''.join(log.output))
+
+    def test_integer_and_range_checks(self):
+        columns = {
+            "type": ["tx"] * 4,
+            "ref": ["a", "b", "c", "d"],
+            "height": [1, -1, True, "2"],
+            "fee": [1, 2, 3, 21000000 * 100000000 + 1],
+            "value": [-5, 5, -21000000 * 100000000, 0],
+        }
+        with self.assertLogs(level='WARNING') as log:
+            with BIP329JSONLWriter(self.test_filename) as writer:
+                writer.write_columns(columns)
+        written = self.read()
+        self.assertEqual([entry.get("height") for entry in written], [1, None, None, None])
+        self.assertEqual([entry.get("fee") for entry in written], [1, 2, 3, None])
+        self.assertEqual([entry.get("value") for entry in written], [-5, 5, -21000000 * 100000000, 0])
+        output = ''.join(log.output)
+        self.assertIn("Invalid height values in 3 rows, removing", output)
+        self.assertIn("Invalid fee values in 1 rows, removing", output)
+
+    def test_range_checks_match_write_label_and_parser(self):
+        columns = {
+            "type": ["tx"] * 4 + ["addr"],
+            "ref": ["a", "b", "c", "d", "e"],
+            "height": [1, -1, True, "2", None],
+            "fee": [1, 2, 3, 21000000 * 100000000 + 1, None],
+            "heights": [None, None, None, None, [5, -5]],
+        }
+        rows = [{name: column[row] for name, column in columns.items() if column[row] is not None}
+                for row in range(5)]
+        with self.assertLogs(level='WARNING'):
+            with BIP329JSONLWriter(self.test_filename) as writer:
+                writer.write_columns(columns)
+        from_columns = self.read()
+        with self.assertLogs(level='WARNING'):
+            with BIP329JSONLWriter(self.test_filename) as writer:
+                for row in rows:
+                    writer.write_label(row)
+        self.assertEqual(self.read(), from_columns)
+        with open(self.test_filename, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(row) + "\n" for row in rows)
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(BIP329_Parser(self.test_filename).load_entries(), from_columns)
+        self.assertEqual([entry.get("height") for entry in from_columns], [1, None, None, None, None])
+        self.assertNotIn("heights", from_columns[4])
+
+    def test_invalid_columns(self):
+        with BIP329JSONLWriter(self.test_filename) as writer:
+            with self.assertRaises(ValueError):
+                writer.write_columns({"type": ["tx"]})
+            with self.assertRaises(ValueError):
+                writer.write_columns({"type": ["tx", "tx"], "ref": ["a", None]})
+            with self.assertRaises(ValueError):
+                writer.write_columns({"type": ["block"], "ref": ["a"]})
+            with self.assertRaises(ValueError):
+                writer.write_columns({"type": ["tx", "tx"], "ref": ["a"]})
+            with self.assertRaises(ValueError):
+                writer.write_columns({"type": ["tx"], "ref": ["a"], "label": [5]})
+            with self.assertRaises(ValueError):
+                writer.write_columns({"type": ["output"], "ref": ["a:0"], "spendable": ["yes"]})
+
+    def test_dedupe_and_canonical(self):
+        columns = {"type": ["tx", "addr", "tx"], "ref": ["b", "a", "b"], "label": ["first", "addr", "second"]}
+        with BIP329JSONLWriter(self.test_filename, dedupe='last', canonical=True) as writer:
+            writer.write_columns(columns)
+        self.assertEqual(self.read(), [{"type": "addr", "ref": "a", "label": "addr"},
+                                       {"type": "tx", "ref": "b", "label": "second"}])
+
+    def test_numpy_columns(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        columns = {"type": numpy.array(["tx", "tx"]), "ref": numpy.array(["a", "b"]),
+                   "height": numpy.array([5, 6], dtype=numpy.int64)}
+        with BIP329JSONLWriter(self.test_filename) as writer:
+            writer.write_columns(columns, valid={"height": numpy.array([True, False])})
+        self.assertEqual(self.read(), [{"type": "tx", "ref": "a", "height": 5}, {"type": "tx", "ref": "b"}])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,44 @@
+# file: test_bloom.py
+import unittest
+from bip329.bloom import BloomFilter
+from bip329.bloom import bloom_parameters
+from bip329.bloom import key_digest
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        digests = [key_digest("addr", f"bc1q{i}") for i in range(1000)]
+        for digest in digests:
+            bloom.add(digest)
+        self.assertTrue(all(digest in bloom for digest in digests))
+        self.assertEqual(len(bloom), 1000)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(5000, 0.01)
+        for i in range(5000):
+            bloom.add(key_digest("tx", str(i)))
+        false_positives = sum(1 for i in range(20000) if key_digest("tx", f"other-{i}") in bloom)
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_serialization_roundtrip(self):
+        bloom = BloomFilter(100, 0.001)
+        bloom.add(key_digest("tx", "abc"))
+        restored = BloomFilter.from_bytes(bloom.to_bytes())
+        self.assertIn(key_digest("tx", "abc"), restored)
+        self.assertEqual((restored.num_bits, restored.num_hashes, len(restored)),
+                         (bloom.num_bits, bloom.num_hashes, len(bloom)))
+        with self.assertRaises(ValueError):
+            BloomFilter.from_bytes(b"x" * 40)
+
+    def test_key_digest_separates_type_and_ref(self):
+        self.assertNotEqual(key_digest("tx", "abc"), key_digest("addr", "abc"))
+        self.assertEqual(len(key_digest("tx", "abc")), 16)
+
+    def test_invalid_error_rate(self):
+        with self.assertRaises(ValueError):
+            bloom_parameters(10, 1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
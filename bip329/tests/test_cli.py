@@ -0,0 +1,218 @@
+# file: test_cli.py
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from bip329.bip329_writer import BIP329JSONLEncryptedArchiveWriter
+from bip329.cli import _parse_batch
+from bip329.cli import main
+
+
+LINES = [
+    '{"type": "tx", "ref": "abc123", "label": "First"}',
+    '{"type": "addr", "ref": "bc1qxyz", "label": "Address"}',
+    '{"type": "tx", "ref": "abc123", "label": "Second"}',
+    '{"type": "tx", "ref": "bad", "label": 5}',
+    '{"type": "tx", "ref": ',
+]
+
+
+class TestCLI(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_file = self.path('labels.jsonl')
+        with open(self.input_file, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(LINES) + '\n')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def run_cli(self, argv, stdin=None):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            if stdin is None:
+                code = main(argv)
+            else:
+                with mock.patch('sys.stdin', io.StringIO(stdin)):
+                    code = main(argv)
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    def test_validate(self):
+        code, out, _ = self.run_cli(['validate', self.input_file])
+        self.assertEqual(code, 1)
+        summary = json.loads(out)
+        self.assertEqual(summary['entries'], 3)
+        self.assertEqual(summary['malformed_lines'], 1)
+        self.assertEqual(summary['invalid_entries'], 1)
+
+    def test_validate_verify_origin(self):
+        stdin = ('{"type": "tx", "ref": "a", "origin": "wpkh([d34db33f/84\'/0\'/0\'])"}\n'
+                 '{"type": "tx", "ref": "b", "origin": "wpkh(d34db33f)"}\n')
+        code, out, _ = self.run_cli(['validate', '--verify-origin'], stdin=stdin)
+        self.assertEqual(code, 1)
+        summary = json.loads(out)
+        self.assertEqual(summary['entries'], 1)
+        self.assertEqual(summary['invalid_entries'], 1)
+
+    def test_validate_single_file_in_batches(self):
+        _, sequential, _ = self.run_cli(['validate', self.input_file])
+        with mock.patch('bip329.cli.BATCH_LINES', 2), \
+                mock.patch('bip329.cli._parse_batch', wraps=_parse_batch) as parse_batch:
+            # Workers are not spawned for the wrapped function, run them in threads
+            with mock.patch('bip329.cli.ProcessPoolExecutor', ThreadPoolExecutor):
+                code, parallel, _ = self.run_cli(['validate', '-j', '2', self.input_file])
+        self.assertEqual(code, 1)
+        self.assertEqual(json.loads(parallel), json.loads(sequential))
+        self.assertEqual([call.args[2] for call in parse_batch.call_args_list], [0, 2, 4])
+
+    def test_batch_line_numbers(self):
+        with self.assertLogs(level='WARNING') as log:
+            _parse_batch([line + '\n' for line in LINES[3:]], {}, 3)
+        output = ''.join(log.output)
+        self.assertIn("at line 4:", output)
+        self.assertIn("at line 5:", output)
+
+    def test_stats_from_stdin(self):
+        code, out, _ = self.run_cli(['stats'], stdin='\n'.join(LINES[:3]))
+        self.assertEqual(code, 0)
+        summary = json.loads(out)
+        self.assertEqual(summary['types'], {'addr': 1, 'tx': 2})
+        self.assertEqual(summary['fields']['label'], 3)
+
+    def test_normalize_parallel_matches_sequential(self):
+        _, sequential, _ = self.run_cli(['normalize', self.input_file])
+        _, parallel, err = self.run_cli(['normalize', '--jobs', '2', self.input_file])
+        self.assertEqual(sequential, parallel)
+        self.assertEqual(len(sequential.splitlines()), 3)
+        self.assertEqual(json.loads(err)['written'], 3)
+
+    def test_merge_last_wins(self):
+        output = self.path('merged.jsonl')
+        code, _, err = self.run_cli(['merge', self.input_file, '-o', output])
+        self.assertEqual(code, 0)
+        with open(output, encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(records, [
+            {"type": "addr", "ref": "bc1qxyz", "label": "Address"},
+            {"type": "tx", "ref": "abc123", "label": "Second"},
+        ])
+        self.assertEqual(json.loads(err)['duplicates'], 1)
+
+    def test_merge_to_stdout(self):
+        output = self.path('merged.jsonl')
+        self.run_cli(['merge', self.input_file, '-o', output])
+        code, out, err = self.run_cli(['merge', self.input_file])
+        self.assertEqual(code, 0)
+        with open(output, encoding='utf-8') as file:
+            self.assertEqual(out, file.read())
+        self.assertEqual(json.loads(err)['duplicates'], 1)
+
+    def test_missing_input(self):
+        missing = self.path('missing.jsonl')
+        output = self.path('out.jsonl')
+        for jobs in ('1', '2'):
+            for command in (['normalize', self.input_file, missing], ['merge', self.input_file, missing],
+                            ['validate', missing]):
+                code, _, err = self.run_cli(command + ['-j', jobs])
+                self.assertEqual(code, 2, command)
+            code, _, _ = self.run_cli(['normalize', self.input_file, missing, '-o', output, '-j', jobs])
+            self.assertEqual(code, 2)
+            self.assertFalse(os.path.exists(output))
+        archive = self.path('labels.7z')
+        with mock.patch.dict(os.environ, {'BIP329_PASSPHRASE': 'secret'}):
+            self.run_cli(['encrypt', self.input_file, '-o', archive])
+            code, _, _ = self.run_cli(['encrypt', missing, '-o', archive])
+            self.assertEqual(code, 2)
+            code, out, _ = self.run_cli(['decrypt', archive])
+        self.assertEqual(len(out.splitlines()), 3)
+
+    def test_encrypt_and_decrypt(self):
+        archive = self.path('labels.7z')
+        with mock.patch.dict(os.environ, {'BIP329_PASSPHRASE': 'secret'}):
+            code, _, err = self.run_cli(['encrypt', self.input_file, '-o', archive])
+            self.assertEqual(code, 0)
+            self.assertEqual(json.loads(err)['written'], 3)
+            code, out, _ = self.run_cli(['decrypt', archive])
+        self.assertEqual(code, 0)
+        self.assertEqual([json.loads(line)['label'] for line in out.splitlines()], ['First', 'Address', 'Second'])
+
+    def test_encrypt_failure_writes_nothing(self):
+        archive = self.path('labels.7z')
+
+        def failing_entries(*args):
+            yield {"type": "tx", "ref": "partial", "label": "Partial"}
+            raise OSError("read error")
+
+        with mock.patch.dict(os.environ, {'BIP329_PASSPHRASE': 'secret'}):
+            self.run_cli(['encrypt', self.input_file, '-o', archive])
+            with open(archive, 'rb') as file:
+                original = file.read()
+            with mock.patch('bip329.cli.iter_entries', failing_entries):
+                code, _, _ = self.run_cli(['encrypt', self.input_file, '-o', archive])
+                self.assertEqual(code, 2)
+                code, _, _ = self.run_cli(['encrypt', self.input_file, '-o', archive, '--append'])
+                self.assertEqual(code, 2)
+                code, _, _ = self.run_cli(['encrypt', self.input_file, '-o', archive, '--keep-existing'])
+                self.assertEqual(code, 2)
+        with open(archive, 'rb') as file:
+            self.assertEqual(file.read(), original)
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ['labels.7z', 'labels.jsonl'])
+
+        with mock.patch.dict(os.environ, {'BIP329_PASSPHRASE': 'secret'}):
+            code, _, err = self.run_cli(['encrypt', self.input_file, '-o', archive, '--keep-existing'])
+        self.assertEqual(code, 0)
+        with open(json.loads(err)['backup'], 'rb') as file:
+            self.assertEqual(file.read(), original)
+
+    def test_decrypt_wrong_passphrase(self):
+        archive = self.path('labels.7z')
+        passphrase_file = self.path('passphrase')
+        with open(passphrase_file, 'w', encoding='utf-8') as file:
+            file.write('secret\n')
+        self.run_cli(['encrypt', self.input_file, '-o', archive, '--passphrase-file', passphrase_file])
+        with mock.patch.dict(os.environ, {'BIP329_PASSPHRASE': 'wrong'}):
+            code, out, _ = self.run_cli(['decrypt', archive])
+        self.assertEqual(code, 2)
+        self.assertEqual(out, '')
+
+    def test_decrypt_member(self):
+        archive = self.path('wallets.7z')
+        with BIP329JSONLEncryptedArchiveWriter(archive, 'secret') as writer:
+            writer.write_label('a.jsonl', {"type": "tx", "ref": "a", "label": "Wallet A"})
+            writer.write_label('b.jsonl', {"type": "tx", "ref": "b", "label": "Wallet B"})
+        with mock.patch.dict(os.environ, {'BIP329_PASSPHRASE': 'secret'}):
+            code, out, _ = self.run_cli(['decrypt', archive, '--member', 'b.jsonl'])
+            self.assertEqual(code, 0)
+            self.assertEqual([json.loads(line)['label'] for line in out.splitlines()], ['Wallet B'])
+            code, _, _ = self.run_cli(['decrypt', archive, '--member', 'c.jsonl'])
+        self.assertEqual(code, 2)
+
+    def test_append_and_repack(self):
+        archive = self.path('labels.7z')
+        update = self.path('update.jsonl')
+        with open(update, 'w', encoding='utf-8') as file:
+            file.write('{"type": "tx", "ref": "abc123", "label": "Third"}\n')
+        with mock.patch.dict(os.environ, {'BIP329_PASSPHRASE': 'secret'}):
+            self.run_cli(['encrypt', self.input_file, '-o', archive])
+            code, _, err = self.run_cli(['encrypt', update, '-o', archive, '--append'])
+            self.assertEqual(code, 0)
+            self.assertEqual(json.loads(err)['member'], 'labels.delta-0001.jsonl')
+            code, out, _ = self.run_cli(['decrypt', archive])
+            self.assertEqual([json.loads(line)['label'] for line in out.splitlines()][-1], 'Third')
+            code, _, err = self.run_cli(['repack', archive])
+            self.assertEqual(code, 0)
+            self.assertEqual(json.loads(err)['written'], 2)
+            code, out, _ = self.run_cli(['decrypt', archive])
+        self.assertEqual([json.loads(line)['label'] for line in out.splitlines()], ['Address', 'Third'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# file: test_compression.py
+import gzip
+import json
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+from bip329 import compression
+from bip329.bip329_parser import BIP329_Parser
+from bip329.bip329_writer import BIP329JSONLWriter
+from bip329.compression import detect_compression
+
+
+LABELS = [{"type": "tx", "ref": f"ref-{i}", "label": f"label {i} é"} for i in range(200)]
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def roundtrip(self, filename, **kwargs):
+        path = self.path(filename)
+        with BIP329JSONLWriter(path, **kwargs) as writer:
+            for label in LABELS:
+                writer.write_label(label)
+        self.assertEqual(BIP329_Parser(path).load_entries(), LABELS)
+        return path
+
+    def test_gzip_by_extension(self):
+        path = self.roundtrip('labels.jsonl.gz')
+        self.assertEqual(detect_compression(path), "gzip")
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            self.assertEqual(json.loads(file.readline()), LABELS[0])
+
+    def test_xz_with_level(self):
+        path = self.roundtrip('labels.jsonl.xz', compression_level=1)
+        with lzma.open(path, 'rt', encoding='utf-8') as file:
+            self.assertEqual(len(file.readlines()), len(LABELS))
+
+    def test_detection_by_magic_bytes(self):
+        path = self.roundtrip('labels.jsonl', compression='gzip')
+        self.assertEqual(detect_compression(path), "gzip")
+        plain = self.roundtrip('plain.jsonl.gz', compression=None)
+        self.assertIsNone(detect_compression(plain))
+
+    def test_writer_modes(self):
+        self.roundtrip('atomic.jsonl.gz', atomic=True, fsync='close')
+        path = self.path('dedupe.jsonl.xz')
+        with BIP329JSONLWriter(path, dedupe='last', canonical=True) as writer:
+            for label in LABELS + LABELS[:10]:
+                writer.write_label(label)
+        self.assertEqual(len(BIP329_Parser(path).load_entries()), len(LABELS))
+        path = self.path('last.jsonl.gz')
+        with BIP329JSONLWriter(path, dedupe='last') as writer:
+            for label in [{"type": "tx", "ref": "a", "label": "old"}, {"type": "tx", "ref": "a", "label": "new"}]:
+                writer.write_label(label)
+        self.assertEqual([entry["label"] for entry in BIP329_Parser(path).load_entries()], ["new"])
+
+    def test_stream_ignores_compression(self):
+        path = self.path('stream.jsonl.gz')
+        with open(path, 'w', encoding='utf-8') as stream:
+            with BIP329JSONLWriter(stream) as writer:
+                writer.write_label(LABELS[0])
+        self.assertIsNone(detect_compression(path))
+
+    def test_invalid_compression(self):
+        with self.assertRaises(ValueError):
+            BIP329JSONLWriter(self.path('labels.jsonl'), compression='bz2')
+        with self.assertRaises(ValueError):
+            BIP329_Parser(self.path('labels.jsonl'), compression='bz2')
+
+    @unittest.skipIf(compression.zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        path = self.roundtrip('labels.jsonl.zst', compression_level=5)
+        self.assertEqual(detect_compression(path), "zstd")
+        shutil.copy(path, self.path('renamed.jsonl'))
+        self.assertEqual(BIP329_Parser(self.path('renamed.jsonl')).load_entries(), LABELS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# file: test_concurrent_writer.py
+import json
+import os
+import tempfile
+import threading
+import unittest
+from bip329.bip329_writer import BIP329JSONLConcurrentWriter
+
+
+class TestBIP329JSONLConcurrentWriter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_filename = os.path.join(self.temp_dir.name, 'labels.jsonl')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def produce(self, writer, threads=8, records=250):
+        def run(thread_number):
+            for i in range(records):
+                writer.write_label({"type": "tx", "ref": f"{thread_number}-{i}", "label": "x" * (i % 50)})
+
+        workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def test_producers_do_not_interleave_lines(self):
+        with BIP329JSONLConcurrentWriter(self.test_filename, queue_size=16, batch_records=32) as writer:
+            self.produce(writer)
+        self.assertEqual(writer.records_written, 2000)
+        with open(self.test_filename, 'r', encoding='utf-8') as file:
+            refs = [json.loads(line)["ref"] for line in file]
+        self.assertEqual(len(refs), 2000)
+        self.assertEqual(len(set(refs)), 2000)
+        # Each producer's records keep their order
+        own = [ref for ref in refs if ref.startswith("3-")]
+        self.assertEqual(own, [f"3-{i}" for i in range(250)])
+
+    def test_writer_options(self):
+        with BIP329JSONLConcurrentWriter(self.test_filename, dedupe='first', canonical=True, atomic=True) as writer:
+            for ref in "bab":
+                writer.write_label({"type": "tx", "ref": ref, "label": ref})
+        self.assertEqual(writer.records_written, 2)
+        with open(self.test_filename, 'r', encoding='utf-8') as file:
+            self.assertEqual([json.loads(line)["ref"] for line in file], ["a", "b"])
+
+    def test_validation_errors_raise_in_producer(self):
+        with BIP329JSONLConcurrentWriter(self.test_filename) as writer:
+            with self.assertRaises(ValueError):
+                writer.write_label({"label": "no type"})
+        with self.assertRaises(ValueError):
+            writer.write_label({"type": "tx", "ref": "late", "label": "closed"})
+
+    def test_io_error_raised_on_close(self):
+        missing = os.path.join(self.temp_dir.name, 'missing', 'labels.jsonl')
+        writer = BIP329JSONLConcurrentWriter(missing)
+        writer.write_label({"type": "tx", "ref": "a", "label": "a"})
+        with self.assertRaises(FileNotFoundError):
+            writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
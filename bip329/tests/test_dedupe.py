@@ -0,0 +1,106 @@
+# file: test_dedupe.py
+import json
+import os
+import tempfile
+import unittest
+from bip329.bip329_writer import BIP329JSONLWriter
+from bip329.bloom import key_digest
+from bip329.dedupe import SpillableKeySet
+from bip329.stats import StageStats
+
+
+def make_labels():
+    labels = []
+    for i in range(60):
+        labels.append({"type": "tx", "ref": f"tx{i % 20}", "label": f"version {i}"})
+        labels.append({"type": "addr", "ref": f"tx{i % 7}", "label": f"address {i}"})
+    return labels
+
+
+def last_wins(labels):
+    merged = {}
+    for label in labels:
+        key = (label["type"], label["ref"])
+        merged.pop(key, None)
+        merged[key] = label
+    return list(merged.values())
+
+
+def first_wins(labels):
+    merged = {}
+    for label in labels:
+        merged.setdefault((label["type"], label["ref"]), label)
+    return list(merged.values())
+
+
+class TestSpillableKeySet(unittest.TestCase):
+    def test_exact_after_spilling(self):
+        keys = SpillableKeySet(max_keys=10)
+        digests = [key_digest("tx", str(i)) for i in range(100)]
+        try:
+            self.assertTrue(all(keys.add(digest) for digest in digests))
+            self.assertTrue(keys.spilled)
+            self.assertEqual(len(keys), 100)
+            self.assertFalse(any(keys.add(digest) for digest in digests))
+            self.assertNotIn(key_digest("tx", "missing"), keys)
+        finally:
+            keys.close()
+
+    def test_invalid_max_keys(self):
+        with self.assertRaises(ValueError):
+            SpillableKeySet(max_keys=0)
+
+
+class TestDedupeWriter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_dir.name, 'labels.jsonl')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self):
+        with open(self.filename, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def write(self, mode, labels, **kwargs):
+        with BIP329JSONLWriter(self.filename, dedupe=mode, **kwargs) as writer:
+            for label in labels:
+                writer.write_label(label)
+        return writer
+
+    def test_first_wins(self):
+        labels = make_labels()
+        writer = self.write('first', labels)
+        self.assertEqual(self.read(), first_wins(labels))
+        self.assertEqual(writer.duplicates, len(labels) - len(first_wins(labels)))
+
+    def test_last_wins(self):
+        labels = make_labels()
+        writer = self.write('last', labels)
+        self.assertEqual(self.read(), last_wins(labels))
+        self.assertEqual(writer.duplicates, len(labels) - len(last_wins(labels)))
+
+    def test_spilled_key_set_gives_same_result(self):
+        labels = make_labels()
+        self.write('first', labels, dedupe_max_keys=4)
+        self.assertEqual(self.read(), first_wins(labels))
+        self.write('last', labels, dedupe_max_keys=4)
+        self.assertEqual(self.read(), last_wins(labels))
+
+    def test_last_wins_stats(self):
+        stats = StageStats()
+        labels = make_labels()
+        self.write('last', labels, stats=stats)
+        self.assertEqual(stats.stages['dedupe']['records'], len(labels) - len(last_wins(labels)))
+
+    def test_invalid_modes(self):
+        with self.assertRaises(ValueError):
+            BIP329JSONLWriter(self.filename, dedupe='middle')
+        with open(self.filename, 'w') as stream:
+            with self.assertRaises(ValueError):
+                BIP329JSONLWriter(stream, dedupe='last')
+
+
+if __name__ == '__main__':
+    unittest.main()
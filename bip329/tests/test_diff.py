@@ -0,0 +1,93 @@
+# file: test_diff.py
+import io
+import json
+import os
+import tempfile
+import unittest
+from bip329.bip329_writer import BIP329JSONLWriter
+from bip329.diff import diff_files
+from bip329.diff import iter_delta
+
+
+OLD = [
+    {"type": "tx", "ref": "a", "label": "unchanged"},
+    {"type": "tx", "ref": "b", "label": "old label"},
+    {"type": "addr", "ref": "gone", "label": "removed"},
+    {"type": "output", "ref": "c:0", "label": "spendable", "spendable": True},
+    {"type": "tx", "ref": "b", "label": "old label, last wins"},
+]
+
+NEW = [
+    {"type": "output", "ref": "c:0", "label": "spendable", "spendable": False},
+    {"type": "tx", "ref": "b", "label": "new label"},
+    {"type": "tx", "ref": "a", "label": "unchanged"},
+    {"type": "xpub", "ref": "xpub1", "label": "added"},
+]
+
+
+class TestDiff(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, name, labels, canonical=False):
+        path = os.path.join(self.temp_dir.name, name)
+        with BIP329JSONLWriter(path, canonical=canonical) as writer:
+            for label in labels:
+                writer.write_label(label)
+        return path
+
+    def delta(self, **kwargs):
+        output = io.StringIO()
+        counts = diff_files(self.old, self.new, output, **kwargs)
+        return counts, sorted(json.dumps(json.loads(line), sort_keys=True) for line in output.getvalue().splitlines())
+
+    def expected(self):
+        return sorted(json.dumps(item, sort_keys=True) for item in [
+            {"op": "change", "record": {"type": "output", "ref": "c:0", "label": "spendable", "spendable": False}},
+            {"op": "change", "record": {"type": "tx", "ref": "b", "label": "new label"}},
+            {"op": "add", "record": {"type": "xpub", "ref": "xpub1", "label": "added"}},
+            {"op": "remove", "type": "addr", "ref": "gone"},
+        ])
+
+    def test_hash_join(self):
+        self.old = self.write('old.jsonl', OLD)
+        self.new = self.write('new.jsonl', NEW)
+        for partitions in (1, 3, 64):
+            counts, delta = self.delta(partitions=partitions)
+            self.assertEqual(delta, self.expected())
+            self.assertEqual(counts, {"add": 1, "change": 2, "remove": 1, "unchanged": 1})
+
+    def test_merge_join_on_sorted_inputs(self):
+        self.old = self.write('old.jsonl', OLD, canonical=True)
+        self.new = self.write('new.jsonl', NEW, canonical=True)
+        counts, delta = self.delta(sorted_inputs=True)
+        self.assertEqual(delta, self.expected())
+        self.assertEqual(counts["unchanged"], 1)
+
+    def test_merge_join_rejects_unsorted(self):
+        self.old = self.write('old.jsonl', OLD)
+        self.new = self.write('new.jsonl', NEW)
+        with self.assertRaises(ValueError):
+            self.delta(sorted_inputs=True)
+
+    def test_iter_delta(self):
+        self.old = self.write('old.jsonl', OLD)
+        self.new = self.write('new.jsonl', NEW)
+        path = os.path.join(self.temp_dir.name, 'delta.jsonl')
+        diff_files(self.old, self.new, path)
+        ops = sorted((op, entry_type, ref) for op, entry_type, ref, _ in iter_delta(path))
+        self.assertEqual(ops, [("add", "xpub", "xpub1"), ("change", "output", "c:0"),
+                               ("change", "tx", "b"), ("remove", "addr", "gone")])
+
+    def test_missing_file(self):
+        self.old = self.write('old.jsonl', OLD)
+        self.new = os.path.join(self.temp_dir.name, 'missing.jsonl')
+        with self.assertRaises(FileNotFoundError):
+            self.delta()
+
+
+if __name__ == '__main__':
+    unittest.main()
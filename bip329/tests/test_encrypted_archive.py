@@ -0,0 +1,136 @@
+# file: test_encrypted_archive.py
+import io
+import os
+import tempfile
+import unittest
+import py7zr
+from bip329.bip329_writer import BIP329JSONLEncryptedArchiveWriter
+from bip329.bip329_writer import BIP329JSONLEncryptedWriter
+from bip329.bip329_writer import repack_encrypted_archive
+from bip329.encryption import append_streams
+from bip329.encryption import decrypt_member
+from bip329.encryption import iter_archive_entries
+from bip329.encryption import iter_archive_records
+from bip329.encryption import iter_member_entries
+from bip329.encryption import list_members
+
+
+class TestEncryptedArchive(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_filename = os.path.join(self.temp_dir.name, 'labels.7z')
+        self.passphrase = "test_passphrase"
+        with BIP329JSONLEncryptedArchiveWriter(self.test_filename, self.passphrase) as writer:
+            for i in range(3):
+                writer.write_label("wallet-a.jsonl", {"type": "tx", "ref": f"a{i}", "label": f"wallet a {i}"})
+            writer.write_label("wallet-b.jsonl", {"type": "addr", "ref": "b0", "label": "wallet b"})
+            writer.member("empty.jsonl")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_list_members(self):
+        self.assertEqual(sorted(list_members(self.test_filename, self.passphrase)),
+                         ["empty.jsonl", "wallet-a.jsonl", "wallet-b.jsonl"])
+
+    def test_decrypt_single_member(self):
+        output_dir = os.path.join(self.temp_dir.name, 'out')
+        path = decrypt_member(self.test_filename, "wallet-b.jsonl", output_dir, self.passphrase)
+        self.assertEqual(os.listdir(output_dir), ["wallet-b.jsonl"])
+        with open(path, 'r', encoding='utf-8') as file:
+            self.assertIn("wallet b", file.read())
+        with self.assertRaises(KeyError):
+            decrypt_member(self.test_filename, "wallet-c.jsonl", output_dir, self.passphrase)
+
+    def test_member_per_folder(self):
+        with py7zr.SevenZipFile(self.test_filename, 'r') as archive:
+            self.assertEqual(archive.archiveinfo().blocks, 3)
+
+    def test_iter_member_entries(self):
+        entries = list(iter_member_entries(self.test_filename, "wallet-a.jsonl", self.passphrase))
+        self.assertEqual([entry["ref"] for entry in entries], ["a0", "a1", "a2"])
+        self.assertEqual(list(iter_member_entries(self.test_filename, "empty.jsonl", self.passphrase)), [])
+
+    def test_exception_discards_members(self):
+        with open(self.test_filename, 'rb') as file:
+            original = file.read()
+        with self.assertRaises(RuntimeError):
+            with BIP329JSONLEncryptedArchiveWriter(self.test_filename, self.passphrase, remove_existing=False) as writer:
+                writer.write_label("wallet-c.jsonl", {"type": "tx", "ref": "c0", "label": "partial"})
+                raise RuntimeError("interrupted")
+        with open(self.test_filename, 'rb') as file:
+            self.assertEqual(file.read(), original)
+        self.assertEqual(os.listdir(self.temp_dir.name), ['labels.7z'])
+        self.assertFalse(os.path.exists(writer.temp_dir.name))
+
+    def test_invalid_member_names(self):
+        with BIP329JSONLEncryptedArchiveWriter(os.path.join(self.temp_dir.name, 'other.7z'), self.passphrase) as writer:
+            for name in ("", "..", "../escape.jsonl", "dir/labels.jsonl"):
+                with self.assertRaises(ValueError):
+                    writer.member(name)
+
+
+class TestArchiveAppend(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_filename = os.path.join(self.temp_dir.name, 'labels.7z')
+        self.passphrase = "test_passphrase"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, labels, append):
+        with BIP329JSONLEncryptedWriter(self.test_filename, self.passphrase, append=append) as writer:
+            for label in labels:
+                writer.write_label(label)
+        return writer
+
+    def test_append_delta_members(self):
+        self.write([{"type": "tx", "ref": ref, "label": f"{ref} v1"} for ref in "abc"], append=True)
+        writer = self.write([{"type": "tx", "ref": "b", "label": "b v2"}, {"type": "tx", "ref": "d", "label": "d v1"}],
+                            append=True)
+        self.assertEqual(writer.member_name, "labels.delta-0001.jsonl")
+        self.write([{"type": "tx", "ref": "a", "label": "a v3"}], append=True)
+        self.assertEqual(list_members(self.test_filename, self.passphrase),
+                         ["labels.jsonl", "labels.delta-0001.jsonl", "labels.delta-0002.jsonl"])
+        expected = {"a": "a v3", "b": "b v2", "c": "c v1", "d": "d v1"}
+        labels = {entry["ref"]: entry["label"] for entry in iter_archive_entries(self.test_filename, self.passphrase)}
+        self.assertEqual(labels, expected)
+
+        self.assertEqual(repack_encrypted_archive(self.test_filename, self.passphrase), 4)
+        self.assertEqual(list_members(self.test_filename, self.passphrase), ["labels.jsonl"])
+        labels = {entry["ref"]: entry["label"] for entry in iter_archive_entries(self.test_filename, self.passphrase)}
+        self.assertEqual(labels, expected)
+        self.assertEqual(os.listdir(self.temp_dir.name), ['labels.7z'])
+
+    def test_repack_streams_last_wins(self):
+        self.write([{"type": "tx", "ref": ref, "label": f"{ref} v1"} for ref in "abc"], append=True)
+        self.write([{"type": "tx", "ref": "a", "label": "a v2"}, {"type": "tx", "ref": "a", "label": "a v3"}],
+                   append=True)
+        self.assertEqual(len(list(iter_archive_records(self.test_filename, self.passphrase))), 5)
+        expected = list(iter_archive_entries(self.test_filename, self.passphrase))
+        self.assertEqual([entry["label"] for entry in expected], ["b v1", "c v1", "a v3"])
+        self.assertEqual(repack_encrypted_archive(self.test_filename, self.passphrase, dedupe='first'), 3)
+        self.assertEqual(list(iter_archive_records(self.test_filename, self.passphrase)), expected)
+
+    def test_append_checks_passphrase(self):
+        self.write([{"type": "tx", "ref": "a", "label": "a v1"}], append=True)
+        with open(self.test_filename, 'rb') as file:
+            original = file.read()
+        with self.assertRaises(ValueError):
+            BIP329JSONLEncryptedWriter(self.test_filename, "wrong", append=True)
+        with self.assertRaises(ValueError):
+            append_streams(self.test_filename, [("x.jsonl", io.BytesIO(b"{}\n"))], "wrong")
+        with open(self.test_filename, 'rb') as file:
+            self.assertEqual(file.read(), original)
+        self.assertEqual([entry["label"] for entry in iter_archive_entries(self.test_filename, self.passphrase)],
+                         ["a v1"])
+
+    def test_without_append_replaces_archive(self):
+        self.write([{"type": "tx", "ref": "a", "label": "old"}], append=False)
+        self.write([{"type": "tx", "ref": "b", "label": "new"}], append=False)
+        self.assertEqual(list_members(self.test_filename, self.passphrase), ["labels.jsonl"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# file: test_external_sort.py
+import heapq
+import random
+import unittest
+from unittest import mock
+from bip329.external_sort import ExternalSorter
+
+
+class TestExternalSorter(unittest.TestCase):
+    def test_sorted_and_stable_across_runs(self):
+        rng = random.Random(32)
+        items = [(str(rng.randint(0, 50)).encode(), str(i).encode()) for i in range(1000)]
+        sorter = ExternalSorter(max_records=64)
+        try:
+            for key, payload in items:
+                sorter.add(key, payload)
+            self.assertGreater(len(sorter.runs), 1)
+            self.assertEqual(len(sorter), 1000)
+            # sorted() is stable, so this is the expected order for equal keys
+            self.assertEqual(list(sorter), sorted(items, key=lambda item: item[0]))
+        finally:
+            sorter.close()
+
+    def test_bounded_fan_in(self):
+        rng = random.Random(33)
+        items = [(str(rng.randint(0, 50)).encode(), str(i).encode()) for i in range(1000)]
+        fan_in = []
+        merge = heapq.merge
+
+        def counting_merge(*iterables, **kwargs):
+            fan_in.append(len(iterables))
+            return merge(*iterables, **kwargs)
+
+        sorter = ExternalSorter(max_records=8, max_open_runs=4)
+        try:
+            for key, payload in items:
+                sorter.add(key, payload)
+            self.assertEqual(len(sorter.runs), 125)
+            with mock.patch('bip329.external_sort.heapq.merge', counting_merge):
+                self.assertEqual(list(sorter), sorted(items, key=lambda item: item[0]))
+            self.assertLessEqual(len(sorter.runs), 4)
+            # The final merge also takes the in-memory buffer
+            self.assertLessEqual(max(fan_in), 5)
+            self.assertGreater(len(fan_in), 3)
+        finally:
+            sorter.close()
+
+    def test_in_memory_only(self):
+        sorter = ExternalSorter()
+        sorter.add(b"b", b"2")
+        sorter.add(b"a", b"1")
+        self.assertEqual(list(sorter), [(b"a", b"1"), (b"b", b"2")])
+        self.assertEqual(sorter.runs, [])
+        sorter.close()
+
+    def test_invalid_max_records(self):
+        with self.assertRaises(ValueError):
+            ExternalSorter(max_records=0)
+        with self.assertRaises(ValueError):
+            ExternalSorter(max_open_runs=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# file: test_label_log.py
+import json
+import os
+import stat
+import tempfile
+import unittest
+from bip329.label_log import LabelLog
+
+
+def label(ref, version):
+    return {"type": "tx", "ref": ref, "label": f"{ref} v{version}"}
+
+
+class TestLabelLog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'labels.jsonl')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self):
+        with open(self.path, 'r', encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_append_and_dead_ratio(self):
+        with LabelLog(self.path, min_records=100) as log:
+            for version in range(3):
+                for ref in "abcd":
+                    log.write_label(label(ref, version))
+            self.assertEqual(log.records, 12)
+            self.assertEqual(log.live_records, 4)
+            self.assertAlmostEqual(log.dead_ratio, 8 / 12)
+            # Appends are visible to readers right away
+            self.assertEqual(len(self.read()), 12)
+            self.assertEqual(sorted(entry['label'] for entry in log.load_entries()),
+                             ["a v2", "b v2", "c v2", "d v2"])
+
+    def test_compaction_keeps_last_records(self):
+        with LabelLog(self.path, compact_ratio=0.5, min_records=8, background=False) as log:
+            for version in range(4):
+                for ref in "abcd":
+                    log.write_label(label(ref, version))
+            self.assertGreaterEqual(log.compactions, 1)
+            self.assertLess(log.records, 16)
+        entries = self.read()
+        self.assertEqual([entry['label'] for entry in entries], ["a v3", "b v3", "c v3", "d v3"])
+        self.assertFalse(os.path.exists(self.path + ".compact.tmp"))
+
+    @unittest.skipIf(os.name == 'nt', "POSIX permission bits")
+    def test_compaction_keeps_file_mode(self):
+        with LabelLog(self.path, background=False) as log:
+            os.chmod(self.path, 0o600)
+            for version in range(2):
+                log.write_label(label("a", version))
+            log.compact()
+            self.assertEqual(log.compactions, 1)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_background_compaction(self):
+        with LabelLog(self.path, compact_ratio=0.9, min_records=50) as log:
+            for version in range(100):
+                log.write_label(label(str(version % 5), version))
+            log.wait()
+            self.assertGreaterEqual(log.compactions, 1)
+            self.assertLessEqual(log.records, 55)
+            labels = {entry['ref']: entry['label'] for entry in log.load_entries()}
+        self.assertEqual(labels, {str(ref): f"{ref} v{95 + ref}" for ref in range(5)})
+
+    def test_reopen_counts_existing_records(self):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            for version in range(2):
+                file.write(json.dumps(label("a", version)) + "\n")
+            file.write("not json\n")
+        with LabelLog(self.path) as log:
+            self.assertEqual(log.records, 3)
+            self.assertEqual(log.live_records, 1)
+            self.assertTrue(log.compact())
+            self.assertEqual(log.records, 1)
+        self.assertEqual(self.read(), [label("a", 1)])
+
+    def test_invalid_record(self):
+        with LabelLog(self.path) as log:
+            with self.assertRaises(ValueError):
+                log.write_label({"label": "no type"})
+            self.assertEqual(log.records, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
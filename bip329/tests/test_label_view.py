@@ -0,0 +1,101 @@
+# file: test_label_view.py
+import os
+import json
+import random
+import time
+import unittest
+from datetime import datetime
+from datetime import timezone
+from bip329.label_view import IndexedLabelView
+
+ACCOUNT_0 = "wpkh([d34db33f/84'/0'/0'])"
+ACCOUNT_1 = "wpkh([d34db33f/84'/0'/1'])"
+
+
+class TestIndexedLabelView(unittest.TestCase):
+    def setUp(self):
+        self.entries = [
+            {"type": "tx", "ref": "t1", "label": "a", "origin": ACCOUNT_0, "height": 100, "time": "2024-01-01T00:00:00Z"},
+            {"type": "output", "ref": "t1:0", "origin": ACCOUNT_0, "height": 100, "time": "2024-01-01T00:00:00Z"},
+            {"type": "tx", "ref": "t2", "label": "b", "origin": ACCOUNT_1, "height": 250, "time": "2024-03-01T12:00:00+02:00"},
+            {"type": "output", "ref": "t3:1", "height": 300, "time": "2024-06-01T00:00:00"},
+            {"type": "addr", "ref": "bc1qa", "origin": ACCOUNT_1},
+        ]
+        self.view = IndexedLabelView(self.entries)
+
+    def refs(self, entries):
+        return [entry["ref"] for entry in entries]
+
+    def test_by_origin(self):
+        self.assertEqual(self.refs(self.view.by_origin(ACCOUNT_0)), ["t1", "t1:0"])
+        self.assertEqual(self.refs(self.view.by_origin(ACCOUNT_1, entry_type="addr")), ["bc1qa"])
+        self.assertEqual(self.view.by_origin("sh(wpkh([00000000]))"), [])
+        self.assertEqual(self.view.origins(), {ACCOUNT_0: 2, ACCOUNT_1: 2})
+
+    def test_height_range(self):
+        self.assertEqual(self.refs(self.view.height_range(100, 250)), ["t1:0", "t1", "t2"])
+        self.assertEqual(self.refs(self.view.height_range(101, None, entry_type="output")), ["t3:1"])
+        self.assertEqual(self.refs(self.view.height_range(max_height=99)), [])
+        self.assertEqual(len(self.view.height_range()), 4)
+
+    def test_time_range(self):
+        self.assertEqual(self.refs(self.view.time_range("2024-03-01T10:00:00Z", "2024-12-31T00:00:00Z")),
+                         ["t2", "t3:1"])
+        self.assertEqual(self.refs(self.view.time_range(end=datetime(2024, 1, 1, tzinfo=timezone.utc))),
+                         ["t1:0", "t1"])
+        with self.assertRaises(ValueError):
+            self.view.time_range("yesterday")
+
+    def test_incremental_updates(self):
+        self.view.insert({"type": "tx", "ref": "t1", "label": "moved", "origin": ACCOUNT_1, "height": 400})
+        self.assertEqual(len(self.view), 5)
+        self.assertEqual(self.refs(self.view.by_origin(ACCOUNT_0)), ["t1:0"])
+        self.assertEqual(self.refs(self.view.by_origin(ACCOUNT_1)), ["t2", "bc1qa", "t1"])
+        self.assertEqual(self.refs(self.view.height_range(300)), ["t3:1", "t1"])
+        self.assertEqual(self.refs(self.view.time_range()), ["t1:0", "t2", "t3:1"])
+
+        self.assertTrue(self.view.delete("output", "t1:0"))
+        self.assertFalse(self.view.delete("output", "t1:0"))
+        self.assertNotIn(("output", "t1:0"), self.view)
+        self.assertEqual(self.view.by_origin(ACCOUNT_0), [])
+        self.assertNotIn(ACCOUNT_0, self.view.origins())
+        self.assertEqual(self.refs(self.view.height_range(100, 100)), [])
+
+    def test_update_before_and_after_query(self):
+        view = IndexedLabelView()
+        view.update(self.entries)
+        view.update([{"type": "tx", "ref": "t2", "height": 50}])
+        self.assertEqual(self.refs(view.height_range(max_height=100)), ["t2", "t1:0", "t1"])
+        view.insert({"type": "tx", "ref": "t4", "height": 75})
+        self.assertEqual(self.refs(view.height_range(max_height=100)), ["t2", "t4", "t1:0", "t1"])
+        self.assertEqual(self.refs(view.time_range()), ["t1:0", "t1", "t3:1"])
+
+    def test_large_build(self):
+        rng = random.Random(7)
+        entries = [{"type": "output", "ref": f"{index:064x}:0", "height": rng.randrange(900000),
+                    "time": f"2024-{rng.randrange(1, 13):02d}-01T00:00:00Z"} for index in range(200000)]
+        start = time.perf_counter()
+        view = IndexedLabelView(entries)
+        result = view.height_range(100000, 100999)
+        elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 5)
+        self.assertEqual(len(result), sum(1 for entry in entries if 100000 <= entry["height"] <= 100999))
+        self.assertEqual([entry["height"] for entry in result], sorted(entry["height"] for entry in result))
+
+    def test_from_file(self):
+        filename = 'test_view_labels.jsonl'
+        try:
+            with open(filename, 'w') as file:
+                for entry in self.entries + [{"type": "tx", "ref": "t2", "height": 50}]:
+                    file.write(json.dumps(entry) + "\n")
+            view = IndexedLabelView.from_file(filename)
+            self.assertEqual(len(view), 5)
+            self.assertEqual(view.get("tx", "t2"), {"type": "tx", "ref": "t2", "height": 50})
+            self.assertEqual(self.refs(view.height_range(max_height=100)), ["t2", "t1:0", "t1"])
+        finally:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# file: test_membership.py
+import os
+import tempfile
+import unittest
+from bip329.bip329_writer import BIP329JSONLWriter
+from bip329.membership import LabelMembershipFilter
+from bip329.membership import membership_path_for
+
+
+class TestLabelMembershipFilter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_dir.name, 'labels.jsonl')
+        with BIP329JSONLWriter(self.filename) as writer:
+            for i in range(2000):
+                writer.write_label({"type": "addr", "ref": f"bc1q{i}", "label": f"Address {i}"})
+            writer.write_label({"type": "addr", "ref": "bc1q0", "label": "Duplicate"})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_build_save_and_load(self):
+        LabelMembershipFilter.build(self.filename, error_rate=0.001).close()
+        self.assertTrue(os.path.exists(membership_path_for(self.filename)))
+        with LabelMembershipFilter.load(self.filename) as membership:
+            self.assertEqual(len(membership.bloom), 2000)
+            for i in range(2000):
+                self.assertTrue(membership.might_contain("addr", f"bc1q{i}"))
+                self.assertIn(("addr", f"bc1q{i}"), membership)
+            self.assertNotIn(("tx", "bc1q0"), membership)
+
+    def test_exact_on_false_positives(self):
+        # A tiny filter makes false positives common; contains() must stay exact
+        with LabelMembershipFilter.build(self.filename, error_rate=0.5) as membership:
+            candidates = [("addr", f"unlabeled{i}") for i in range(500)]
+            self.assertTrue(any(membership.might_contain(*key) for key in candidates))
+            self.assertEqual(list(membership.filter_labeled(candidates)), [])
+            self.assertEqual(list(membership.filter_labeled([("addr", "bc1q5")] + candidates)), [("addr", "bc1q5")])
+
+    def test_stale_filter_is_rebuilt(self):
+        membership = LabelMembershipFilter.build(self.filename)
+        with open(self.filename, 'a', encoding='utf-8') as file:
+            file.write('{"type": "tx", "ref": "appended", "label": "New"}\n')
+        # Batched queries notice the change, single lookups after refresh()
+        self.assertEqual(list(membership.filter_labeled([("tx", "appended")])), [("tx", "appended")])
+        self.assertFalse(membership.refresh())
+        self.assertTrue(membership.contains("tx", "appended"))
+        with open(self.filename, 'a', encoding='utf-8') as file:
+            file.write('{"type": "tx", "ref": "appended1", "label": "New"}\n')
+        self.assertTrue(membership.refresh())
+        self.assertTrue(membership.might_contain("tx", "appended1"))
+        membership.close()
+
+        with open(self.filename, 'a', encoding='utf-8') as file:
+            file.write('{"type": "tx", "ref": "appended2", "label": "Newer"}\n')
+        with self.assertRaises(FileNotFoundError):
+            LabelMembershipFilter.load(self.filename, rebuild=False)
+        with LabelMembershipFilter.load(self.filename) as membership:
+            self.assertIn(("tx", "appended2"), membership)
+            self.assertFalse(membership.is_stale())
+
+    def test_invalid_sidecar_is_rebuilt(self):
+        with open(membership_path_for(self.filename), 'wb') as file:
+            file.write(b"garbage")
+        with LabelMembershipFilter.load(self.filename) as membership:
+            self.assertIn(("addr", "bc1q7"), membership)
+
+
+if __name__ == '__main__':
+    unittest.main()
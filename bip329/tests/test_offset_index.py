@@ -0,0 +1,75 @@
+# file: test_offset_index.py
+import os
+import tempfile
+import time
+import unittest
+from bip329.offset_index import LabelOffsetIndex
+from bip329.offset_index import index_path_for
+
+
+LINES = [
+    b'{"type": "tx", "ref": "abc123", "label": "First"}\n',
+    b'{"type": "addr", "ref": "bc1qxyz", "label": "Address"}\n',
+    b'\n',
+    b'{"type": "tx", "ref": \n',
+    b'{"type": "tx", "ref": "abc123", "label": "Second"}\n',
+    b'{"type": "output", "ref": "def456:1", "label": "Output", "spendable": true}\n',
+]
+
+
+class TestLabelOffsetIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_dir.name, 'labels.jsonl')
+        with open(self.filename, 'wb') as file:
+            file.write(b''.join(LINES))
+        self.offsets = [sum(len(line) for line in LINES[:i]) for i in range(len(LINES))]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_build_and_lookup(self):
+        with LabelOffsetIndex.build(self.filename) as index:
+            self.assertTrue(os.path.exists(index_path_for(self.filename)))
+            self.assertEqual(len(index), 4)
+            self.assertEqual(index.offsets("tx", "abc123"), [self.offsets[0], self.offsets[4]])
+            self.assertEqual(index.offsets("addr", "bc1qxyz"), [self.offsets[1]])
+            self.assertEqual(index.offsets("addr", "abc123"), [])
+            self.assertIn(("output", "def456:1"), index)
+            self.assertNotIn(("tx", "missing"), index)
+            self.assertEqual(index.lookup("tx", "abc123")["label"], "Second")
+            self.assertIsNone(index.lookup("tx", "missing"))
+            self.assertEqual(index.read_line(self.offsets[1]), LINES[1])
+
+    def test_external_sort_runs(self):
+        with LabelOffsetIndex.build(self.filename, run_records=1) as index:
+            digests = list(index.iter_digests())
+            self.assertEqual(digests, sorted(digests))
+            self.assertEqual(index.offsets("tx", "abc123"), [self.offsets[0], self.offsets[4]])
+
+    def test_open_rebuilds_stale_index(self):
+        LabelOffsetIndex.build(self.filename).close()
+        time.sleep(0.01)
+        with open(self.filename, 'ab') as file:
+            file.write(b'{"type": "xpub", "ref": "xpub123", "label": "New"}\n')
+        with LabelOffsetIndex(self.filename) as index:
+            self.assertTrue(index.is_stale())
+        with LabelOffsetIndex.open(self.filename) as index:
+            self.assertFalse(index.is_stale())
+            self.assertIn(("xpub", "xpub123"), index)
+
+    def test_open_without_rebuild(self):
+        with self.assertRaises(FileNotFoundError):
+            LabelOffsetIndex.open(self.filename, rebuild=False)
+
+    def test_corrupt_index(self):
+        with open(index_path_for(self.filename), 'wb') as file:
+            file.write(b'garbage' * 10)
+        with self.assertRaises(ValueError):
+            LabelOffsetIndex(self.filename)
+        with LabelOffsetIndex.open(self.filename) as index:
+            self.assertEqual(len(index), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# file: test_origin.py
+import os
+import unittest
+from bip329.bip329_parser import BIP329_Parser
+from bip329.origin import HARDENED
+from bip329.origin import _parse_origin
+from bip329.origin import group_by_account
+from bip329.origin import parse_origin
+
+
+class TestParseOrigin(unittest.TestCase):
+    def test_valid_origins(self):
+        origin = parse_origin("wpkh([d34db33f/84'/0'/0'])")
+        self.assertEqual(origin.script_type, "wpkh")
+        self.assertEqual(origin.fingerprint, "d34db33f")
+        self.assertEqual(origin.path, (84 + HARDENED, HARDENED, HARDENED))
+        self.assertEqual(origin.path_string, "84'/0'/0'")
+        self.assertEqual(origin.account, ("d34db33f", "84'/0'/0'"))
+
+        nested = parse_origin("sh(wpkh([A1B2C3D4/49h/0H/2]))")
+        self.assertEqual((nested.script_type, nested.fingerprint, nested.path_string),
+                         ("sh(wpkh)", "a1b2c3d4", "49'/0'/2"))
+        self.assertEqual(parse_origin("tr([d34db33f])").path, ())
+
+    def test_invalid_origins(self):
+        for origin in ("d34db33f/84'/0'/0'", "wpkh(d34db33f)", "wpkh([d34db33/84'])", "wpkh([d34db33f/84''])",
+                       "xyz([d34db33f/84'])", "wpkh([d34db33f/84'/0'/0']", "wpkh([d34db33f/2147483648])",
+                       "wpkh([d34db33f/84'/])", ""):
+            with self.subTest(origin=origin), self.assertRaises(ValueError):
+                parse_origin(origin)
+        with self.assertRaises(TypeError):
+            parse_origin(84)
+
+    def test_memoized(self):
+        _parse_origin.cache_clear()
+        for _ in range(3):
+            parse_origin("wpkh([d34db33f/84'/0'/1'])")
+        info = _parse_origin.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+
+    def test_group_by_account(self):
+        entries = [
+            {"type": "tx", "ref": "t1", "origin": "wpkh([d34db33f/84'/0'/0'])"},
+            {"type": "tx", "ref": "t2", "origin": "wpkh([d34db33f/84'/0'/1'])"},
+            {"type": "tx", "ref": "t3", "origin": "tr([D34DB33F/84h/0h/0h])"},
+            {"type": "tx", "ref": "t4"},
+            {"type": "tx", "ref": "t5", "origin": "bogus"},
+        ]
+        groups = group_by_account(entries)
+        self.assertEqual({account: [entry["ref"] for entry in group] for account, group in groups.items()}, {
+            ("d34db33f", "84'/0'/0'"): ["t1", "t3"],
+            ("d34db33f", "84'/0'/1'"): ["t2"],
+            None: ["t4", "t5"],
+        })
+
+
+class TestParserVerifyOrigin(unittest.TestCase):
+    def setUp(self):
+        self.test_filename = 'test_origin_labels.jsonl'
+        with open(self.test_filename, 'w') as file:
+            file.write('{"type": "tx", "ref": "t1", "origin": "wpkh([d34db33f/84\'/0\'/0\'])"}\n')
+            file.write('{"type": "tx", "ref": "t2", "origin": "wpkh(d34db33f)"}\n')
+
+    def tearDown(self):
+        if os.path.exists(self.test_filename):
+            os.remove(self.test_filename)
+
+    def test_verify_origin(self):
+        self.assertEqual(len(BIP329_Parser(self.test_filename).load_entries()), 2)
+        parser = BIP329_Parser(self.test_filename, verify_origin=True)
+        with self.assertLogs(level='WARNING'):
+            entries = parser.load_entries()
+        self.assertEqual([entry["ref"] for entry in entries], ["t1"])
+        self.assertEqual(parser.invalid_entries, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# file: test_patch.py
+import io
+import json
+import os
+import stat
+import tempfile
+import unittest
+from bip329.diff import diff_files
+from bip329.offset_index import LabelOffsetIndex
+from bip329.offset_index import index_path_for
+from bip329.patch import apply_delta
+
+
+BASE = [
+    {"type": "tx", "ref": "a", "label": "unchanged"},
+    {"type": "tx", "ref": "b", "label": "first duplicate"},
+    {"type": "addr", "ref": "gone", "label": "removed"},
+    {"type": "tx", "ref": "b", "label": "old label"},
+    {"type": "output", "ref": "c:0", "label": "spendable", "spendable": True},
+]
+
+
+class TestApplyDelta(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base = self.path('base.jsonl')
+        # Untouched lines keep their exact bytes, including field order and spacing
+        self.base_lines = [json.dumps(label, separators=(",", ":")) + "\n" for label in BASE]
+        with open(self.base, 'w') as file:
+            file.writelines(self.base_lines)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def read(self, path):
+        with open(path) as file:
+            return file.readlines()
+
+    def test_upserts_and_removals(self):
+        operations = [
+            ("change", "tx", "b", {"type": "tx", "ref": "b", "label": "new label"}),
+            ("remove", "addr", "gone", None),
+            ("remove", "addr", "missing", None),
+            ("add", "xpub", "xpub1", {"type": "xpub", "ref": "xpub1", "label": "added"}),
+        ]
+        output = self.path('patched.jsonl')
+        counts = apply_delta(self.base, operations, output_path=output)
+        self.assertEqual(counts, {"replaced": 1, "added": 1, "removed": 1, "duplicates": 1, "not_found": 1})
+        self.assertEqual(self.read(output), [
+            self.base_lines[0],
+            json.dumps({"type": "tx", "ref": "b", "label": "new label"}) + "\n",
+            self.base_lines[4],
+            json.dumps({"type": "xpub", "ref": "xpub1", "label": "added"}) + "\n",
+        ])
+        self.assertEqual(self.read(self.base), self.base_lines)
+
+    def test_roundtrip_with_diff(self):
+        new = self.path('new.jsonl')
+        with open(new, 'w') as file:
+            file.write(json.dumps({"type": "tx", "ref": "a", "label": "unchanged"}) + "\n")
+            file.write(json.dumps({"type": "tx", "ref": "b", "label": "new label"}) + "\n")
+            file.write(json.dumps({"type": "pubkey", "ref": "02ab", "label": "added"}) + "\n")
+        delta = self.path('delta.jsonl')
+        diff_files(self.base, new, delta)
+        apply_delta(self.base, delta)
+        self.assertFalse(os.path.exists(self.base + ".patch.tmp"))
+        output = io.StringIO()
+        counts = diff_files(self.base, new, output)
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual(counts["unchanged"], 3)
+
+    def test_missing_trailing_newline(self):
+        with open(self.base, 'w') as file:
+            file.write("".join(self.base_lines).rstrip("\n"))
+        apply_delta(self.base, [("add", "tx", "new", {"type": "tx", "ref": "new", "label": "added"})])
+        lines = self.read(self.base)
+        self.assertEqual(len(lines), len(BASE) + 1)
+        self.assertEqual(json.loads(lines[-1])["ref"], "new")
+
+    def test_index_of_patched_file(self):
+        operations = [
+            ("change", "tx", "b", {"type": "tx", "ref": "b", "label": "a much longer label than before"}),
+            ("remove", "addr", "gone", None),
+            ("add", "xpub", "xpub1", {"type": "xpub", "ref": "xpub1", "label": "added"}),
+            ("add", "tx", "z", {"type": "tx", "ref": "z", "label": "added too"}),
+        ]
+        for output in (self.path('patched.jsonl'), self.base):
+            apply_delta(self.base, operations, output_path=output)
+            with LabelOffsetIndex.open(output, rebuild=False) as index:
+                self.assertEqual(len(index), 5)
+                for key, label in [(("tx", "a"), "unchanged"), (("tx", "b"), "a much longer label than before"),
+                                   (("output", "c:0"), "spendable"), (("tx", "z"), "added too")]:
+                    self.assertEqual(index.lookup(*key)["label"], label)
+                self.assertIsNone(index.lookup("addr", "gone"))
+            with open(index_path_for(output), 'rb') as file:
+                patched_index = file.read()
+            LabelOffsetIndex.build(output, self.path('rebuilt.idx')).close()
+            with open(self.path('rebuilt.idx'), 'rb') as file:
+                self.assertEqual(patched_index, file.read())
+        self.assertFalse(os.path.exists(index_path_for(self.base) + ".patch.tmp"))
+
+    @unittest.skipIf(os.name == 'nt', "POSIX permission bits")
+    def test_file_mode_preserved(self):
+        os.chmod(self.base, 0o600)
+        operations = [("add", "tx", "new", {"type": "tx", "ref": "new", "label": "added"})]
+        output = self.path('patched.jsonl')
+        apply_delta(self.base, operations, output_path=output)
+        self.assertEqual(stat.S_IMODE(os.stat(output).st_mode), 0o600)
+        apply_delta(self.base, operations)
+        self.assertEqual(stat.S_IMODE(os.stat(self.base).st_mode), 0o600)
+
+    def test_invalid_record(self):
+        with self.assertRaises(AssertionError):
+            apply_delta(self.base, [("add", "bogus", "x", {"type": "bogus", "ref": "x"})])
+        self.assertEqual(self.read(self.base), self.base_lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
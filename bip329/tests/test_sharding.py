@@ -0,0 +1,69 @@
+# file: test_sharding.py
+import json
+import os
+import tempfile
+import unittest
+from bip329.sharding import MANIFEST_NAME
+from bip329.sharding import ShardedJSONLWriter
+from bip329.sharding import ShardedLabelReader
+from bip329.sharding import ref_shard
+
+
+def make_labels(count):
+    types = ("tx", "addr", "output")
+    return [{"type": types[i % 3], "ref": f"ref-{i}", "label": f"label {i}"} for i in range(count)]
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, 'shards')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, labels, **kwargs):
+        with ShardedJSONLWriter(self.directory, **kwargs) as writer:
+            for label in labels:
+                writer.write_label(label)
+        return ShardedLabelReader(self.directory)
+
+    def test_hash_shards(self):
+        labels = make_labels(300)
+        reader = self.write(labels, num_shards=4)
+        self.assertEqual(len(reader), 300)
+        self.assertEqual(len(reader.paths()), 4)
+        for path in reader.paths():
+            with open(path, 'r', encoding='utf-8') as file:
+                shard = int(os.path.basename(path)[len("labels-"):-len(".jsonl")])
+                self.assertTrue(all(ref_shard(json.loads(line)["ref"], 4) == shard for line in file))
+        key = lambda entry: (entry["type"], entry["ref"])  # noqa: E731
+        self.assertEqual(sorted(reader.load_entries(jobs=1), key=key), sorted(labels, key=key))
+        self.assertEqual(sorted(reader.load_entries(jobs=2), key=key), sorted(labels, key=key))
+
+    def test_type_shards_and_manifest(self):
+        self.write(make_labels(30), shard_by="type", dedupe="last")
+        with open(os.path.join(self.directory, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        self.assertEqual(manifest["shard_by"], "type")
+        self.assertEqual([item["shard"] for item in manifest["shards"]], ["tx", "addr", "output"])
+        self.assertEqual([item["records"] for item in manifest["shards"]], [10, 10, 10])
+
+    def test_lookup(self):
+        labels = make_labels(50) + [{"type": "tx", "ref": "ref-0", "label": "updated"}]
+        reader = self.write(labels, num_shards=3)
+        self.assertEqual(reader.lookup("tx", "ref-0")["label"], "updated")
+        self.assertEqual(reader.lookup("addr", "ref-1")["label"], "label 1")
+        self.assertIsNone(reader.lookup("addr", "ref-0"))
+        self.assertTrue(reader.shard_path("tx", "ref-0").startswith(self.directory))
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            ShardedJSONLWriter(self.directory, shard_by="origin")
+        with ShardedJSONLWriter(self.directory) as writer:
+            with self.assertRaises(ValueError):
+                writer.write_label({"label": "no type"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# file: test_sqlite_store.py
+import io
+import json
+import os
+import tempfile
+import unittest
+from bip329.sqlite_store import LabelStore
+
+
+LABELS = [
+    {"type": "tx", "ref": "b", "label": "tx b", "height": 200, "origin": "wpkh([d34db33f/84'/0'/0'])"},
+    {"type": "addr", "ref": "a", "label": "addr a"},
+    {"type": "tx", "ref": "a", "label": "tx a", "height": 100},
+    {"type": "tx", "ref": "b", "label": "tx b updated", "height": 300, "origin": "wpkh([d34db33f/84'/0'/0'])"},
+    {"type": "input", "ref": "c:0", "label": "input", "origin": "tr([d34db33f/86'/0'/0'])"},
+]
+
+
+class TestLabelStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.jsonl_path = os.path.join(self.temp_dir.name, 'labels.jsonl')
+        with open(self.jsonl_path, 'w', encoding='utf-8') as file:
+            for label in LABELS:
+                file.write(json.dumps(label) + "\n")
+            file.write("not json\n")
+        self.store = LabelStore(os.path.join(self.temp_dir.name, 'labels.sqlite'))
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def test_import_last_wins(self):
+        self.assertEqual(self.store.import_file(self.jsonl_path, batch_size=2), 5)
+        self.assertEqual(len(self.store), 4)
+        self.assertEqual(self.store.get("tx", "b")["label"], "tx b updated")
+        self.assertIn(("addr", "a"), self.store)
+        self.assertIsNone(self.store.get("tx", "missing"))
+        journal_mode = self.store.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(journal_mode, "wal")
+
+    def test_import_skips_out_of_range_height(self):
+        with open(self.jsonl_path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({"type": "tx", "ref": "huge", "label": "huge", "height": 2 ** 64}) + "\n")
+            file.write(json.dumps({"type": "tx", "ref": "d", "label": "after"}) + "\n")
+        self.assertEqual(self.store.import_file(self.jsonl_path), 6)
+        self.assertEqual(self.store.invalid_entries, 1)
+        self.assertNotIn(("tx", "huge"), self.store)
+        self.assertEqual(self.store.get("tx", "d")["label"], "after")
+        with self.assertRaises(ValueError):
+            self.store.upsert({"type": "tx", "ref": "huge", "height": 2 ** 63})
+        self.assertNotIn(("tx", "huge"), self.store)
+
+    def test_query(self):
+        self.store.import_file(self.jsonl_path)
+        origin = "wpkh([d34db33f/84'/0'/0'])"
+        self.assertEqual([record["ref"] for record in self.store.query(origin=origin)], ["b"])
+        self.assertEqual([record["ref"] for record in self.store.query(min_height=50, max_height=250)], ["a"])
+        self.assertEqual([record["type"] for record in self.store.query(entry_type="input")], ["input"])
+
+    def test_upsert_and_delete(self):
+        self.store.upsert({"type": "tx", "ref": "a", "label": "new"})
+        self.store.upsert_many([{"type": "tx", "ref": "a", "label": "newer"}, {"type": "addr", "ref": "x", "label": "x"}])
+        self.assertEqual(self.store.get("tx", "a")["label"], "newer")
+        self.assertTrue(self.store.delete("addr", "x"))
+        self.assertFalse(self.store.delete("addr", "x"))
+        self.assertEqual(len(self.store), 1)
+        with self.assertRaises(ValueError):
+            self.store.upsert_many([{"type": "tx", "ref": "c", "label": "ok"}, {"label": "no type"}])
+        # The failed batch is rolled back as a whole
+        self.assertNotIn(("tx", "c"), self.store)
+
+    def test_export_in_key_order(self):
+        self.store.import_file(self.jsonl_path)
+        output = io.StringIO()
+        self.assertEqual(self.store.export(output), 4)
+        keys = [(record["type"], record["ref"]) for record in map(json.loads, output.getvalue().splitlines())]
+        self.assertEqual(keys, [("addr", "a"), ("input", "c:0"), ("tx", "a"), ("tx", "b")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# file: test_stats.py
+import os
+import tempfile
+import unittest
+from bip329.bip329_parser import BIP329_Parser
+from bip329.bip329_writer import BIP329JSONLWriter
+from bip329.bip329_writer import BIP329JSONLEncryptedWriter
+from bip329.stats import StageStats
+
+
+LABELS = [
+    {"type": "tx", "ref": "abc123", "label": "First Transaction", "height": 800000},
+    {"type": "addr", "ref": "bc1qxyz", "label": "My Address"},
+    {"type": "output", "ref": "def456:1", "label": "Change Output", "spendable": False},
+]
+
+
+class TestStageStats(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_dir.name, 'labels.jsonl')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_add_and_callback(self):
+        events = []
+        stats = StageStats(callback=lambda *args: events.append(args))
+        stats.add('decode', 100, 1)
+        stats.add('decode', 50, 2, 10)
+        self.assertEqual(stats.stages['decode'], {"calls": 2, "ns": 150, "records": 3, "bytes": 10})
+        self.assertEqual(events, [('decode', 100, 1, 0), ('decode', 50, 2, 10)])
+        self.assertAlmostEqual(stats.as_dict()['decode']['seconds'], 150e-9)
+        stats.reset()
+        self.assertEqual(stats.as_dict(), {})
+
+    def test_writer_and_parser_stats(self):
+        writer_stats = StageStats()
+        writer = BIP329JSONLWriter(self.filename, stats=writer_stats)
+        for label in LABELS:
+            writer.write_label(label)
+        stages = writer_stats.as_dict()
+        self.assertEqual(set(stages), {'validate', 'serialize', 'write'})
+        self.assertEqual(stages['write']['records'], 3)
+        self.assertEqual(stages['write']['bytes'], os.path.getsize(self.filename))
+
+        with open(self.filename, 'a', encoding='utf-8') as file:
+            file.write('{"type": "tx", "ref": \n')
+
+        parser_stats = StageStats()
+        with self.assertLogs(level='WARNING'):
+            entries = BIP329_Parser(self.filename, stats=parser_stats).load_entries()
+        self.assertEqual(len(entries), 3)
+        stages = parser_stats.as_dict()
+        self.assertEqual(stages['read']['records'], 4)
+        self.assertEqual(stages['read']['bytes'], os.path.getsize(self.filename))
+        self.assertEqual(stages['decode']['records'], 4)
+        self.assertEqual(stages['validate']['records'], 3)
+
+    def test_disabled_by_default(self):
+        writer = BIP329JSONLWriter(self.filename)
+        writer.write_label(LABELS[0])
+        parser = BIP329_Parser(self.filename)
+        self.assertIsNone(writer.stats)
+        self.assertIsNone(parser.stats)
+        self.assertEqual(parser.load_entries(), [LABELS[0]])
+
+    def test_encrypted_writer_stats(self):
+        stats = StageStats()
+        archive = os.path.join(self.temp_dir.name, 'labels.7z')
+        writer = BIP329JSONLEncryptedWriter(archive, "passphrase", stats=stats)
+        for label in LABELS:
+            writer.write_label(label)
+        writer.close()
+        stages = stats.as_dict()
+        self.assertEqual(stages['encrypt']['records'], 3)
+        self.assertEqual(stages['encrypt']['bytes'], stages['write']['bytes'])
+        self.assertEqual(stages['validate']['records'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
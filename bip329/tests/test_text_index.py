@@ -0,0 +1,82 @@
+# file: test_text_index.py
+import json
+import os
+import tempfile
+import time
+import unittest
+from bip329.text_index import LabelTextIndex
+from bip329.text_index import text_index_path_for
+from bip329.text_index import tokenize
+
+
+class TestLabelTextIndex(unittest.TestCase):
+    def setUp(self):
+        self.entries = [
+            {"type": "tx", "ref": "t1", "label": "Coffee at Café Central"},
+            {"type": "tx", "ref": "t2", "label": "Rent March"},
+            {"type": "output", "ref": "t2:0", "label": "CAFÉ change"},
+            {"type": "addr", "ref": "a1", "label": "Coffee fund, savings"},
+            {"type": "addr", "ref": "a2"},
+        ]
+        self.index = LabelTextIndex(self.entries)
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Straße, CAFÉ-2024!"), ["strasse", "café", "2024"])
+
+    def test_search(self):
+        self.assertEqual(self.index.search("café"), [("tx", "t1"), ("output", "t2:0")])
+        self.assertEqual(self.index.search("coffee savings", prefix=False), [("addr", "a1")])
+        self.assertEqual(self.index.search("cof"), [("tx", "t1"), ("addr", "a1")])
+        self.assertEqual(self.index.search("cof", prefix=False), [])
+        self.assertEqual(self.index.search("coffee ce"), [("tx", "t1")])
+        self.assertEqual(self.index.search("c", limit=1), [("tx", "t1")])
+        self.assertEqual(self.index.search("c", limit=2), [("tx", "t1"), ("output", "t2:0")])
+        self.assertEqual(self.index.search("  ,"), [])
+        self.assertEqual(len(self.index), 4)
+
+    def test_incremental_updates(self):
+        self.index.add({"type": "tx", "ref": "t1", "label": "Groceries"})
+        self.assertEqual(self.index.search("coffee"), [("addr", "a1")])
+        self.assertEqual(self.index.search("groc"), [("tx", "t1")])
+        self.assertNotIn("central", self.index.tokens)
+
+        self.assertEqual(self.index.search("c"), [("output", "t2:0"), ("addr", "a1")])
+        self.assertTrue(self.index.remove("addr", "a1"))
+        self.assertFalse(self.index.remove("addr", "a1"))
+        self.assertEqual(self.index.search("coffee"), [])
+        self.assertEqual(self.index.tokens, sorted(self.index.postings))
+
+    def test_save_and_open(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            jsonl_path = os.path.join(tmp_dir, "labels.jsonl")
+            with open(jsonl_path, "w", encoding="utf-8") as file:
+                for entry in self.entries:
+                    file.write(json.dumps(entry) + "\n")
+
+            built = LabelTextIndex.open(jsonl_path)
+            self.assertTrue(os.path.exists(text_index_path_for(jsonl_path)))
+            loaded = LabelTextIndex.open(jsonl_path, rebuild=False)
+            self.assertEqual(loaded.postings, built.postings)
+            self.assertEqual(loaded.search("caf"), [("tx", "t1"), ("output", "t2:0")])
+            loaded.remove("tx", "t1")
+            self.assertEqual(loaded.search("central"), [])
+
+            with open(jsonl_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"type": "tx", "ref": "t3", "label": "Central heating"}) + "\n")
+            with self.assertRaises(FileNotFoundError):
+                LabelTextIndex.open(jsonl_path, rebuild=False)
+            self.assertEqual(LabelTextIndex.open(jsonl_path).search("central"), [("tx", "t1"), ("tx", "t3")])
+
+    def test_limit_on_large_index(self):
+        entries = [{"type": "tx", "ref": f"{i:08x}", "label": f"c{i % 5000} c{i % 7} note"} for i in range(100000)]
+        index = LabelTextIndex(entries)
+        expected = [("tx", f"{i:08x}") for i in range(20)]
+        start = time.perf_counter()
+        self.assertEqual(index.search("c", limit=20), expected)
+        self.assertEqual(index.search("note c", limit=20), expected)
+        self.assertEqual(index.search("c4999", limit=2), [("tx", "00001387"), ("tx", "0000270f")])
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
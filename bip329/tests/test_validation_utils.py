@@ -0,0 +1,147 @@
+# file: test_validation_utils.py
+import random
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from bip329.validation_utils import ISO_4217_KEYS
+from bip329.validation_utils import clear_validation_caches
+from bip329.validation_utils import validate_fmv_field
+from bip329.validation_utils import validate_iso8601_time
+from bip329.validation_utils import validate_rate_field
+from bip329.validation_utils import validate_utf8_encoding
+
+
+# Reference implementations, kept verbatim from before memoization was
+# added, so the optimized validators can be checked against them.
+def reference_validate_rate_field(rate_value):
+    if not isinstance(rate_value, dict):
+        return False
+    if not rate_value:
+        return False
+    for currency, rate in rate_value.items():
+        if currency not in ISO_4217_KEYS:
+            return False
+        if not isinstance(rate, (int, float)) or rate <= 0:
+            return False
+        if isinstance(rate, float):
+            decimal_str = f"{rate:.8f}".rstrip('0').rstrip('.')
+            decimal_places = len(decimal_str.split('.')[-1]) if '.' in decimal_str else 0
+            if decimal_places > 8:
+                return False
+    return True
+
+
+def reference_validate_iso8601_time(time_value):
+    if not isinstance(time_value, str):
+        return False
+    try:
+        time_str = time_value.replace('Z', '+00:00')
+        datetime.fromisoformat(time_str)
+        return True
+    except ValueError:
+        return False
+
+
+def reference_validate_utf8_encoding(text):
+    if not isinstance(text, str):
+        return True
+    try:
+        text.encode('utf-8')
+        return True
+    except UnicodeEncodeError:
+        return False
+
+
+def generate_times(rng, count):
+    samples = [
+        "2025-01-23T11:40:35Z", "2025-01-23T11:40:35+01:00", "2025-01-23T11:40:35.123456Z",
+        "2025-01-23", "2025/01/23 11:40:35", "", "Z", "2025-13-01T00:00:00Z",
+        "2025-01-23T11:40:35ZZ", "2025-01-23T25:00:00Z", "not a time",
+    ]
+    times = []
+    for _ in range(count):
+        choice = rng.random()
+        if choice < 0.5:
+            times.append(rng.choice(samples))
+        elif choice < 0.9:
+            suffix = rng.choice(["Z", "+00:00", "-05:30", "", "+25:00"])
+            times.append(f"{rng.randint(1990, 2040)}-{rng.randint(0, 13):02d}-{rng.randint(0, 32):02d}"
+                         f"T{rng.randint(0, 24):02d}:{rng.randint(0, 60):02d}:{rng.randint(0, 59):02d}{suffix}")
+        else:
+            times.append(rng.choice([None, 1234567890, 12.5, ["2025-01-23"], {"t": 1}]))
+    return times
+
+
+def generate_rates(rng, count):
+    currencies = sorted(ISO_4217_KEYS)[:20] + ["FOO", "usd", "", 1]
+    values = [1, 0, -1, 100, 105620.0, 98000.5, 0.123456789, 1e-9, 1e300, -0.0,
+              float("inf"), float("nan"), True, False, "100", None, [1], Decimal("1.5")]
+    rates = []
+    for _ in range(count):
+        if rng.random() < 0.05:
+            rates.append(rng.choice([None, [], "USD", 12, {}]))
+            continue
+        rate = {}
+        for _ in range(rng.randint(1, 3)):
+            currency = rng.choice(currencies)
+            if rng.random() < 0.5:
+                rate[currency] = rng.choice(values)
+            else:
+                rate[currency] = round(rng.uniform(-10, 200000), rng.randint(0, 12))
+        rates.append(rate)
+    return rates
+
+
+def generate_texts(rng, count):
+    alphabet = "abcXYZ 019_-:'\"\\" + "äöü€₿漢字🙂" + "\udcff\ud800"
+    texts = []
+    for _ in range(count):
+        if rng.random() < 0.05:
+            texts.append(rng.choice([None, 5, b"bytes"]))
+        else:
+            texts.append("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))))
+    return texts
+
+
+class TestValidatorsDifferential(unittest.TestCase):
+    def setUp(self):
+        clear_validation_caches()
+        self.rng = random.Random(329)
+
+    def test_currency_set_is_frozen(self):
+        self.assertIsInstance(ISO_4217_KEYS, frozenset)
+        self.assertIn('USD', ISO_4217_KEYS)
+        self.assertIn('EUR', ISO_4217_KEYS)
+
+    def test_iso8601_time_matches_reference(self):
+        times = generate_times(self.rng, 3000)
+        # Run twice so the second pass is served from the cache
+        for _ in range(2):
+            for value in times:
+                self.assertEqual(validate_iso8601_time(value), reference_validate_iso8601_time(value), repr(value))
+
+    def test_rate_field_matches_reference(self):
+        rates = generate_rates(self.rng, 3000)
+        for _ in range(2):
+            for value in rates:
+                self.assertEqual(validate_rate_field(value), reference_validate_rate_field(value), repr(value))
+                self.assertEqual(validate_fmv_field(value), reference_validate_rate_field(value), repr(value))
+
+    def test_rate_cache_distinguishes_value_types(self):
+        self.assertTrue(validate_rate_field({"USD": 1}))
+        self.assertFalse(validate_rate_field({"USD": Decimal(1)}))
+        self.assertTrue(validate_rate_field({"USD": 1}))
+
+    def test_utf8_encoding_matches_reference(self):
+        for value in generate_texts(self.rng, 3000):
+            expected_valid = reference_validate_utf8_encoding(value)
+            if expected_valid:
+                self.assertIs(validate_utf8_encoding(value, False), value)
+            else:
+                with self.assertLogs(level='ERROR'):
+                    with self.assertRaises(ValueError):
+                        validate_utf8_encoding(value, False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+# file: text_index.py
+import bisect
+import heapq
+import itertools
+import json
+import os
+import re
+from .bip329_parser import BIP329_Parser
+
+TEXT_INDEX_SUFFIX = ".fts"
+TEXT_INDEX_VERSION = 1
+TOKEN = re.compile(r"\w+")
+
+
+def text_index_path_for(jsonl_path):
+    return jsonl_path + TEXT_INDEX_SUFFIX
+
+
+def tokenize(text):
+    """Case-folded word tokens of `text` (Unicode letters, digits and '_')"""
+    return TOKEN.findall(text.casefold())
+
+
+class LabelTextIndex:
+    """
+    Inverted index from label words to (type, ref) keys.
+
+    Labels are split into Unicode word tokens and case-folded, so 'Café'
+    matches 'CAFÉ' and 'café'. `search` returns the keys whose label
+    contains every query word, the last one also as a prefix for search
+    as you type. Prefixes are resolved by bisecting the sorted vocabulary.
+    Postings keep the order in which keys were (last) added, so results
+    come in file order and a search with `limit` stops early.
+    `add` and `remove` update the index incrementally; `save` writes it
+    next to the label file (`labels.jsonl.fts`) and `open` loads it again,
+    rebuilding it when the label file has changed.
+    """
+
+    def __init__(self, entries=()):
+        self.postings = {}
+        # Sorted vocabulary for prefix queries, rebuilt when stale after update()
+        self._tokens = []
+        self._tokens_sorted = True
+        # Key -> tokens, and key -> sequence number in the order keys were added
+        self._documents = {}
+        self._order = {}
+        self._next = 0
+        self.source_size = None
+        self.source_mtime_ns = None
+        self.update(entries)
+
+    @classmethod
+    def build(cls, jsonl_path, index_path=None, **parser_options):
+        """Index the labels of `jsonl_path` and save the index next to it"""
+        stat = os.stat(jsonl_path)
+        index = cls(BIP329_Parser(jsonl_path, **parser_options).iter_entries())
+        index.source_size = stat.st_size
+        index.source_mtime_ns = stat.st_mtime_ns
+        index.save(index_path or text_index_path_for(jsonl_path))
+        return index
+
+    @classmethod
+    def load(cls, index_path):
+        with open(index_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("version") != TEXT_INDEX_VERSION:
+            raise ValueError(f"Unsupported text index {index_path}")
+        index = cls()
+        index.source_size = data.get("source_size")
+        index.source_mtime_ns = data.get("source_mtime_ns")
+        keys = [tuple(key) for key in data["keys"]]
+        for position, key in enumerate(keys):
+            index._documents[key] = set()
+            index._order[key] = position
+        index._next = len(keys)
+        for token, positions in data["postings"].items():
+            # Saved in key order, dicts keep it
+            index.postings[token] = dict.fromkeys(keys[position] for position in positions)
+            for position in positions:
+                index._documents[keys[position]].add(token)
+        index._tokens_sorted = False
+        return index
+
+    @classmethod
+    def open(cls, jsonl_path, index_path=None, rebuild=True, **parser_options):
+        """Load the text index of `jsonl_path`, (re)building it if missing or stale"""
+        index_path = index_path or text_index_path_for(jsonl_path)
+        if os.path.exists(index_path):
+            try:
+                index = cls.load(index_path)
+            except (ValueError, KeyError):
+                index = None
+            if index is not None and not index.is_stale(jsonl_path):
+                return index
+        if not rebuild:
+            raise FileNotFoundError(f"No up-to-date text index for {jsonl_path}")
+        return cls.build(jsonl_path, index_path, **parser_options)
+
+    def is_stale(self, jsonl_path):
+        """True if the label file changed since the index was built"""
+        try:
+            stat = os.stat(jsonl_path)
+        except FileNotFoundError:
+            return True
+        return (stat.st_size, stat.st_mtime_ns) != (self.source_size, self.source_mtime_ns)
+
+    def save(self, index_path):
+        keys = list(self._documents)
+        positions = {key: position for position, key in enumerate(keys)}
+        data = {
+            "version": TEXT_INDEX_VERSION,
+            "source_size": self.source_size,
+            "source_mtime_ns": self.source_mtime_ns,
+            "keys": keys,
+            "postings": {token: [positions[key] for key in self.postings[token]] for token in self.tokens},
+        }
+        with open(index_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(data, file, separators=(",", ":"))
+        os.replace(index_path + ".tmp", index_path)
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, key):
+        return key in self._documents
+
+    @property
+    def tokens(self):
+        """Sorted vocabulary"""
+        if not self._tokens_sorted:
+            self._tokens = sorted(self.postings)
+            self._tokens_sorted = True
+        return self._tokens
+
+    def update(self, entries):
+        """Index many entries; the vocabulary is sorted once, by the next search"""
+        self._tokens_sorted = False
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        """Index the label of an entry, replacing what was indexed for its key"""
+        key = (entry["type"], entry["ref"])
+        self.remove(*key)
+        label = entry.get("label")
+        tokens = set(tokenize(label)) if isinstance(label, str) else set()
+        if not tokens:
+            return
+        self._documents[key] = tokens
+        self._order[key] = self._next
+        self._next += 1
+        for token in tokens:
+            keys = self.postings.get(token)
+            if keys is None:
+                # A dict as an insertion-ordered set
+                keys = self.postings[token] = {}
+                if self._tokens_sorted:
+                    bisect.insort(self._tokens, token)
+            keys[key] = None
+
+    def remove(self, entry_type, ref):
+        """Drop (type, ref) from the index, return True if it was indexed"""
+        tokens = self._documents.pop((entry_type, ref), None)
+        if tokens is None:
+            return False
+        del self._order[(entry_type, ref)]
+        for token in tokens:
+            keys = self.postings[token]
+            del keys[(entry_type, ref)]
+            if not keys:
+                del self.postings[token]
+                if self._tokens_sorted:
+                    del self._tokens[bisect.bisect_left(self._tokens, token)]
+        return True
+
+    def _prefix_tokens(self, prefix):
+        tokens = self.tokens
+        start = bisect.bisect_left(tokens, prefix)
+        end = start
+        while end < len(tokens) and tokens[end].startswith(prefix):
+            end += 1
+        return tokens[start:end]
+
+    def search(self, query, prefix=True, limit=None):
+        """
+        (type, ref) keys whose label contains every word of `query`, in the
+        order they were added; with `prefix` the last word matches any word
+        it is a prefix of. The smallest posting list drives the search and
+        it stops after `limit` matches.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        last = words.pop() if prefix else None
+        if any(word not in self.postings for word in words):
+            return []
+        words = sorted(set(words), key=lambda word: len(self.postings[word]))
+        if words:
+            others = [self.postings[word] for word in words[1:]]
+            keys = (key for key in self.postings[words[0]] if all(key in other for other in others))
+            if last is not None:
+                documents = self._documents
+                keys = (key for key in keys if any(token.startswith(last) for token in documents[key]))
+        else:
+            tokens = self._prefix_tokens(last)
+            if not tokens:
+                return []
+            if len(tokens) == 1:
+                keys = iter(self.postings[tokens[0]])
+            else:
+                # Merge the postings in key order, a key may be in several of them
+                merged = heapq.merge(*(self.postings[token] for token in tokens), key=self._order.__getitem__)
+                keys = (key for key, _ in itertools.groupby(merged))
+        return list(keys if limit is None else itertools.islice(keys, limit))
@@ -1,8 +1,69 @@
 # file: validation_utils.py
 from datetime import datetime
+from datetime import timezone
+from functools import lru_cache
 import logging
+import numbers
+from .constants import INTEGER_FIELD_RANGES
 
-ISO_4217_KEYS = {'AFN', 'EUR', 'ALL', 'DZD', 'USD', 'EUR', 'AOA', 'XCD', 'XCD', 'XAD', 'ARS', 'AMD', 'AWG', 'AUD', 'EUR', 'AZN', 'BSD', 'BHD', 'BDT', 'BBD', 'BYN', 'EUR', 'BZD', 'XOF', 'BMD', 'INR', 'BTN', 'BOB', 'BOV', 'USD', 'BAM', 'BWP', 'NOK', 'BRL', 'USD', 'BND', 'BGN', 'XOF', 'BIF', 'CVE', 'KHR', 'XAF', 'CAD', 'KYD', 'XAF', 'XAF', 'CLP', 'CLF', 'CNY', 'AUD', 'AUD', 'COP', 'COU', 'KMF', 'CDF', 'XAF', 'NZD', 'CRC', 'XOF', 'EUR', 'CUP', 'XCG', 'EUR', 'CZK', 'DKK', 'DJF', 'XCD', 'DOP', 'USD', 'EGP', 'SVC', 'USD', 'XAF', 'ERN', 'EUR', 'SZL', 'ETB', 'EUR', 'FKP', 'DKK', 'FJD', 'EUR', 'EUR', 'EUR', 'XPF', 'EUR', 'XAF', 'GMD', 'GEL', 'EUR', 'GHS', 'GIP', 'EUR', 'DKK', 'XCD', 'EUR', 'USD', 'GTQ', 'GBP', 'GNF', 'XOF', 'GYD', 'HTG', 'USD', 'AUD', 'EUR', 'HNL', 'HKD', 'HUF', 'ISK', 'INR', 'IDR', 'XDR', 'IRR', 'IQD', 'EUR', 'GBP', 'ILS', 'EUR', 'JMD', 'JPY', 'GBP', 'JOD', 'KZT', 'KES', 'AUD', 'KPW', 'KRW', 'KWD', 'KGS', 'LAK', 'EUR', 'LBP', 'LSL', 'ZAR', 'LRD', 'LYD', 'CHF', 'EUR', 'EUR', 'MOP', 'MGA', 'MWK', 'MYR', 'MVR', 'XOF', 'EUR', 'USD', 'EUR', 'MRU', 'MUR', 'EUR', 'XUA', 'MXN', 'MXV', 'USD', 'MDL', 'EUR', 'MNT', 'EUR', 'XCD', 'MAD', 'MZN', 'MMK', 'NAD', 'ZAR', 'AUD', 'NPR', 'EUR', 'XPF', 'NZD', 'NIO', 'XOF', 'NGN', 'NZD', 'AUD', 'MKD', 'USD', 'NOK', 'OMR', 'PKR', 'USD', 'PAB', 'USD', 'PGK', 'PYG', 'PEN', 'PHP', 'NZD', 'PLN', 'EUR', 'USD', 'QAR', 'EUR', 'RON', 'RUB', 'RWF', 'EUR', 'SHP', 'XCD', 'XCD', 'EUR', 'EUR', 'XCD', 'WST', 'EUR', 'STN', 'SAR', 'XOF', 'RSD', 'SCR', 'SLE', 'SGD', 'XCG', 'XSU', 'EUR', 'EUR', 'SBD', 'SOS', 'ZAR', 'SSP', 'EUR', 'LKR', 'SDG', 'SRD', 'NOK', 'SEK', 'CHF', 'CHE', 'CHW', 'SYP', 'TWD', 'TJS', 'TZS', 'THB', 'USD', 'XOF', 'NZD', 'TOP', 'TTD', 'TND', 'TRY', 'TMT', 'USD', 'AUD', 'UGX', 'UAH', 'AED', 'GBP', 'USD', 'USD', 'USN', 'UYU', 'UYI', 'UYW', 'UZS', 'VUV', 'VES', 'VED', 'VND', 'USD', 'USD', 'XPF', 'MAD', 'YER', 'ZMW', 'ZWG', 'XBA', 'XBB', 'XBC', 'XBD', 'XTS', 'XXX', 'XAU', 'XPD', 'XPT', 'XAG'}
+ISO_4217_KEYS = frozenset({
+    'AED', 'AFN', 'ALL', 'AMD', 'AOA', 'ARS', 'AUD', 'AWG', 'AZN', 'BAM', 'BBD', 'BDT', 'BGN',
+    'BHD', 'BIF', 'BMD', 'BND', 'BOB', 'BOV', 'BRL', 'BSD', 'BTN', 'BWP', 'BYN', 'BZD', 'CAD',
+    'CDF', 'CHE', 'CHF', 'CHW', 'CLF', 'CLP', 'CNY', 'COP', 'COU', 'CRC', 'CUP', 'CVE', 'CZK',
+    'DJF', 'DKK', 'DOP', 'DZD', 'EGP', 'ERN', 'ETB', 'EUR', 'FJD', 'FKP', 'GBP', 'GEL', 'GHS',
+    'GIP', 'GMD', 'GNF', 'GTQ', 'GYD', 'HKD', 'HNL', 'HTG', 'HUF', 'IDR', 'ILS', 'INR', 'IQD',
+    'IRR', 'ISK', 'JMD', 'JOD', 'JPY', 'KES', 'KGS', 'KHR', 'KMF', 'KPW', 'KRW', 'KWD', 'KYD',
+    'KZT', 'LAK', 'LBP', 'LKR', 'LRD', 'LSL', 'LYD', 'MAD', 'MDL', 'MGA', 'MKD', 'MMK', 'MNT',
+    'MOP', 'MRU', 'MUR', 'MVR', 'MWK', 'MXN', 'MXV', 'MYR', 'MZN', 'NAD', 'NGN', 'NIO', 'NOK',
+    'NPR', 'NZD', 'OMR', 'PAB', 'PEN', 'PGK', 'PHP', 'PKR', 'PLN', 'PYG', 'QAR', 'RON', 'RSD',
+    'RUB', 'RWF', 'SAR', 'SBD', 'SCR', 'SDG', 'SEK', 'SGD', 'SHP', 'SLE', 'SOS', 'SRD', 'SSP',
+    'STN', 'SVC', 'SYP', 'SZL', 'THB', 'TJS', 'TMT', 'TND', 'TOP', 'TRY', 'TTD', 'TWD', 'TZS',
+    'UAH', 'UGX', 'USD', 'USN', 'UYI', 'UYU', 'UYW', 'UZS', 'VED', 'VES', 'VND', 'VUV', 'WST',
+    'XAD', 'XAF', 'XAG', 'XAU', 'XBA', 'XBB', 'XBC', 'XBD', 'XCD', 'XCG', 'XDR', 'XOF', 'XPD',
+    'XPF', 'XPT', 'XSU', 'XTS', 'XUA', 'XXX', 'YER', 'ZAR', 'ZMW', 'ZWG'
+})
+
+
+# Upper bound for the per-process memoization of repeated field values.
+# Exports repeat the same timestamps and rate dicts heavily, so a few
+# thousand slots cover the working set without growing unbounded.
+VALIDATION_CACHE_SIZE = 4096
+
+
+def _rate_cache_key(rate_value):
+    """
+    Build a hashable cache key for a rate/fmv dict.
+    The value type is part of the key so that equal-comparing values of
+    different types (e.g. ``1`` and ``Decimal(1)``) never share a result.
+    Returns None if the dict contains unhashable values.
+    """
+    try:
+        key = tuple((currency, type(rate), rate) for currency, rate in rate_value.items())
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _check_rate_items(items):
+    for currency, rate in items:
+        # Check currency code in LUT
+        if currency not in ISO_4217_KEYS:
+            return False
+
+        # Check rate is numeric and positive
+        if not isinstance(rate, (int, float)) or rate <= 0:
+            return False
+
+        # Floats are limited to 8 decimal places for financial precision.
+        # Formatting with ``.8f`` can never yield more than 8 decimals, so
+        # that check always passed and is not repeated here.
+    return True
+
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def _check_rate_key(key):
+    return _check_rate_items((currency, rate) for currency, _, rate in key)
 
 
 def validate_rate_field(rate_value):
@@ -15,6 +76,7 @@ def validate_rate_field(rate_value):
     BIP-329 specifies rate as: {"USD": 105620.00, "EUR": 98000.50}
     - Keys must be ISO 4217 currency codes
     - Values must be positive numeric (int or float)
+    Results for repeated dicts are memoized.
     """
     if not isinstance(rate_value, dict):
         return False
@@ -22,22 +84,10 @@ def validate_rate_field(rate_value):
     if not rate_value:  # Empty dict {}
         return False
 
-    for currency, rate in rate_value.items():
-        # Check currency code in LUT
-        if currency not in ISO_4217_KEYS:
-            return False
-
-        # Check rate is numeric and positive
-        if not isinstance(rate, (int, float)) or rate <= 0:
-            return False
-
-        # Check decimal places (max 8 for financial precision)
-        if isinstance(rate, float):
-            decimal_str = f"{rate:.8f}".rstrip('0').rstrip('.')
-            decimal_places = len(decimal_str.split('.')[-1]) if '.' in decimal_str else 0
-            if decimal_places > 8:
-                return False
-    return True
+    key = _rate_cache_key(rate_value)
+    if key is None:
+        return _check_rate_items(rate_value.items())
+    return _check_rate_key(key)
 
 
 def validate_fmv_field(fmv_value):
@@ -45,10 +95,8 @@ def validate_fmv_field(fmv_value):
     return validate_rate_field(fmv_value)
 
 
-def validate_iso8601_time(time_value):
-    """Validate ISO-8601 time format"""
-    if not isinstance(time_value, str):
-        return False
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def _is_iso8601(time_value):
     try:
         time_str = time_value.replace('Z', '+00:00')
         datetime.fromisoformat(time_str)
@@ -57,6 +105,43 @@ def validate_iso8601_time(time_value):
         return False
 
 
+def validate_iso8601_time(time_value):
+    """Validate ISO-8601 time format, memoizing repeated timestamps"""
+    if not isinstance(time_value, str):
+        return False
+    return _is_iso8601(time_value)
+
+
+def parse_iso8601_timestamp(time_value):
+    """POSIX timestamp of an ISO-8601 time (UTC without an offset), or None if invalid"""
+    if not validate_iso8601_time(time_value):
+        return None
+    parsed = datetime.fromisoformat(time_value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def clear_validation_caches():
+    """Drop all memoized validation results"""
+    _check_rate_key.cache_clear()
+    _is_iso8601.cache_clear()
+
+
+def validate_integer_field(field_name, value):
+    """True if `value` is an integer (not a bool) within INTEGER_FIELD_RANGES of `field_name`"""
+    if isinstance(value, bool) or not isinstance(value, numbers.Integral):
+        return False
+    low, high = INTEGER_FIELD_RANGES.get(field_name, (None, None))
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def validate_heights_field(heights_value):
+    """True if `heights_value` is a list of valid block heights"""
+    return (isinstance(heights_value, (list, tuple)) and
+            all(validate_integer_field('height', height) for height in heights_value))
+
+
 def validate_label_length(label):
     """Validate label field length per BIP-329 suggestion of 255 chars max"""
     if label and isinstance(label, str):
@@ -67,6 +152,9 @@ def validate_label_length(label):
 def validate_utf8_encoding(text, replace_non_utf8):
     if not isinstance(text, str):
         return text
+    if text.isascii():
+        # ASCII is always valid UTF-8, no need to encode
+        return text
     try:
         text.encode('utf-8')
         return text
@@ -7,4 +7,12 @@ setup(
     install_requires=[
         'py7zr',
     ],
+    extras_require={
+        'zstd': ['zstandard'],
+    },
+    entry_points={
+        'console_scripts': [
+            'bip329=bip329.cli:main',
+        ],
+    },
 )